@@ -0,0 +1,354 @@
+"""
+Cutting Stock Solver
+Gilmore-Gomory column generation and bin completion for 1D nesting of straight-cut parts on stock bars.
+"""
+
+from typing import List, Tuple, Optional
+import math
+import time
+import numpy as np
+
+# SciPy (HiGHS) solves the master LP and the final integer program - without it the caller keeps its greedy nesting
+try:
+    from scipy.optimize import linprog, milp, LinearConstraint, Bounds
+    HAS_SCIPY = True
+except ImportError:
+    HAS_SCIPY = False
+
+
+def bounded_knapsack(values: List[float], sizes: List[int], counts: List[int], capacity: int) -> Tuple[float, List[int]]:
+    """
+    Solve max sum(values[i] * n[i]) s.t. sum(sizes[i] * n[i]) <= capacity, 0 <= n[i] <= counts[i].
+
+    Each item type is split into power-of-two bundles (1, 2, 4, ..., rest) and the
+    resulting 0/1 knapsack is solved by a dynamic program over integer capacity.
+
+    Args:
+        values: Value of one item of each type
+        sizes: Integer size of one item of each type
+        counts: Maximum number of items of each type
+        capacity: Integer knapsack capacity
+
+    Returns:
+        (best value, number of items taken per type)
+    """
+    best = np.zeros(capacity + 1)
+    bundles = []  # (type index, bundle count, bundle size, take[capacity] row)
+
+    for i, (value, size, count) in enumerate(zip(values, sizes, counts)):
+        if value <= 0 or size > capacity:
+            continue
+        bundle = 1
+        while count > 0:
+            n = min(bundle, count)
+            count -= n
+            bundle *= 2
+            weight = size * n
+            if weight > capacity:
+                continue
+            candidate = best[:capacity + 1 - weight] + value * n
+            take = np.zeros(capacity + 1, dtype=bool)
+            take[weight:] = candidate > best[weight:]
+            best[weight:] = np.maximum(best[weight:], candidate)
+            bundles.append((i, n, weight, take))
+
+    # Walk the bundles backwards to recover which ones were taken at full capacity
+    taken = [0] * len(sizes)
+    remaining = capacity
+    for i, n, weight, take in reversed(bundles):
+        if take[remaining]:
+            taken[i] += n
+            remaining -= weight
+
+    return float(best[capacity]), taken
+
+
+def first_fit_decreasing(lengths: List[float], capacity: float) -> List[List[int]]:
+    """
+    Pack parts into bars of the given capacity, longest part first, each into the first bar it fits.
+
+    Returns:
+        List of bars, each a list of indexes into lengths
+    """
+    bars = []
+    used = []
+    for index in sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True):
+        length = lengths[index]
+        for b, bar_used in enumerate(used):
+            if bar_used + length <= capacity:
+                bars[b].append(index)
+                used[b] += length
+                break
+        else:
+            bars.append([index])
+            used.append(length)
+    return bars
+
+
+def bin_completion(lengths: List[float], capacity: float, max_nodes: int = 100000) -> Tuple[List[List[int]], bool]:
+    """
+    Pack parts into the fewest bars of one capacity with Korf's bin completion.
+
+    Bars are filled one at a time, each starting with the longest remaining part and
+    branching over the maximal sets of remaining parts that complete it, fullest first.
+    When no two remaining parts fit together next to the first, the longest part that
+    still fits dominates every other completion and is the only branch. Branches that can't beat
+    the best packing found are pruned by the total-length lower bound, and sets of
+    remaining parts already searched with as few bars are skipped.
+
+    Args:
+        lengths: Part lengths in mm
+        capacity: Bar capacity in mm
+        max_nodes: Search budget; the best packing found so far is returned when exceeded
+
+    Returns:
+        (bars as lists of indexes into lengths, whether the packing is proven optimal)
+    """
+    best_bars = first_fit_decreasing(lengths, capacity)
+    if not lengths:
+        return best_bars, True
+
+    indexes_by_length = {}
+    for index, length in enumerate(lengths):
+        indexes_by_length.setdefault(length, []).append(index)
+    sizes = sorted(indexes_by_length, reverse=True)
+    counts = [len(indexes_by_length[size]) for size in sizes]
+
+    def lower_bound(remaining_length):
+        return math.ceil(remaining_length / capacity - 1e-9)
+
+    best = {"count": len(best_bars), "bars": None}
+    if best["count"] == lower_bound(sum(lengths)):
+        return best_bars, True
+
+    searched = {}  # remaining counts -> fewest bars used when they were searched
+    nodes = [0]
+
+    def completions(first, space):
+        """Maximal sets of remaining parts (as per-type counts) that fit in space."""
+        chosen = [0] * len(sizes)
+        found = []
+
+        def extend(t, free):
+            if t == len(sizes):
+                # Maximal: no part left over fits in the remaining free space
+                if all(counts[u] == chosen[u] or sizes[u] > free for u in range(first, len(sizes))):
+                    found.append((space - free, chosen.copy()))
+                return
+            most = min(counts[t], int(free // sizes[t])) if counts[t] else 0
+            for k in range(most, -1, -1):
+                chosen[t] = k
+                extend(t + 1, free - k * sizes[t])
+            chosen[t] = 0
+
+        extend(first, space)
+        found.sort(key=lambda item: -item[0])
+        return found
+
+    def search(remaining_length, bars):
+        nodes[0] += 1
+        if nodes[0] > max_nodes:
+            return
+        if not any(counts):
+            if len(bars) < best["count"]:
+                best["count"] = len(bars)
+                best["bars"] = [bar.copy() for bar in bars]
+            return
+        if len(bars) + lower_bound(remaining_length) >= best["count"]:
+            return
+        key = tuple(counts)
+        if searched.get(key, best["count"]) <= len(bars):
+            return
+        searched[key] = len(bars)
+
+        first = next(t for t, count in enumerate(counts) if count)
+        counts[first] -= 1
+        space = capacity - sizes[first]
+        fitting = next((t for t in range(first, len(sizes)) if counts[t] and sizes[t] <= space), None)
+        # The two shortest remaining parts - if even they don't fit together, every completion is a single part
+        shortest = []
+        for t in range(len(sizes) - 1, first - 1, -1):
+            shortest.extend([sizes[t]] * min(counts[t], 2 - len(shortest)))
+            if len(shortest) == 2:
+                break
+        if fitting is None:
+            options = [(0.0, [0] * len(sizes))]
+        elif len(shortest) < 2 or shortest[0] + shortest[1] > space:
+            # No two parts fit next to the first one, so the longest part that fits dominates
+            pair = [0] * len(sizes)
+            pair[fitting] = 1
+            options = [(sizes[fitting], pair)]
+        else:
+            options = completions(first, space)
+
+        for fill, chosen in options:
+            for t, k in enumerate(chosen):
+                counts[t] -= k
+            chosen[first] += 1
+            bars.append(chosen)
+            search(remaining_length - sizes[first] - fill, bars)
+            bars.pop()
+            chosen[first] -= 1
+            for t, k in enumerate(chosen):
+                counts[t] += k
+            if nodes[0] > max_nodes or best["count"] == len(bars) + lower_bound(remaining_length):
+                break
+        counts[first] += 1
+
+    search(sum(lengths), [])
+
+    optimal = nodes[0] <= max_nodes
+    if best["bars"] is None:
+        return best_bars, optimal
+
+    # Turn the per-type counts of each bar back into part indexes
+    pools = [list(indexes_by_length[size]) for size in sizes]
+    bars = []
+    for chosen in best["bars"]:
+        bars.append([pools[t].pop() for t, k in enumerate(chosen) for _ in range(k)])
+    return bars, optimal
+
+
+def solve_cutting_stock(lengths: List[float], stock_lengths: List[float], tolerance: float = 0.1,
+                        max_iterations: int = 200, time_limit: float = 10.0,
+                        small_instance_limit: int = 60) -> Optional[List[Tuple[float, List[int]]]]:
+    """
+    Nest straight-cut parts on stock bars with minimum total stock length.
+
+    Patterns are generated by column generation: the master LP over the current
+    patterns gives a dual price per part length, and for every stock length a
+    bounded knapsack finds the pattern with the best total price. Patterns are
+    added until none has a negative reduced cost, then an integer program picks
+    how many bars of each pattern to cut. Parts are packed end to end with no
+    kerf between them (straight ends share the cut).
+
+    Up to small_instance_limit parts, bin completion first packs the fewest bars of
+    the longest stock. With a single stock length that packing is optimal and is
+    returned directly (no SciPy needed); otherwise it seeds the column generation.
+
+    Args:
+        lengths: Part lengths in mm
+        stock_lengths: Available stock lengths in mm
+        tolerance: Floating point tolerance in mm when checking a pattern fits its stock
+        max_iterations: Maximum number of column generation rounds
+        time_limit: Approximate time budget in seconds for the whole solve
+        small_instance_limit: Largest part count that is also solved by bin completion
+
+    Returns:
+        List of (stock_length, [indexes into lengths]) per bar, or None when SciPy is
+        not installed, a part doesn't fit in any stock, or the solver fails
+    """
+    if not lengths or not stock_lengths:
+        return None
+
+    stocks = sorted(set(stock_lengths), reverse=True)
+    if max(lengths) > stocks[0] + tolerance:
+        return None
+
+    def shortest_stock(bar):
+        # Sum the actual part lengths; bin completion tracks free space by subtraction, so allow float noise
+        used = sum(lengths[i] for i in bar)
+        return min((stock for stock in stocks if used <= stock + tolerance + 1e-6), default=stocks[0])
+
+    # Seed with the first-fit decreasing packing (or bin completion's, if it uses less stock),
+    # so the result is never worse than it
+    seed_bars = first_fit_decreasing(lengths, stocks[0] + tolerance)
+    if len(lengths) <= small_instance_limit:
+        completed_bars, optimal = bin_completion(lengths, stocks[0] + tolerance)
+        if len(stocks) == 1 and optimal:
+            return [(stocks[0], bar) for bar in completed_bars]
+        if sum(map(shortest_stock, completed_bars)) < sum(map(shortest_stock, seed_bars)):
+            seed_bars = completed_bars
+
+    if not HAS_SCIPY:
+        return None
+
+    # Group the parts by length - the LP works on demand per distinct length
+    indexes_by_length = {}
+    for index, length in enumerate(lengths):
+        indexes_by_length.setdefault(length, []).append(index)
+    type_lengths = sorted(indexes_by_length, reverse=True)
+    demand = np.array([len(indexes_by_length[length]) for length in type_lengths], dtype=float)
+    # Knapsack sizes are whole millimetres, rounded up so every generated pattern really fits
+    sizes = [math.ceil(length) for length in type_lengths]
+    capacities = [int(math.floor(stock + tolerance)) for stock in stocks]
+
+    # Start from the seed packing's patterns plus one single-length pattern per (length, stock) pair that fits
+    type_of_length = {length: t for t, length in enumerate(type_lengths)}
+    columns = []  # (stock index, counts per length type)
+    seen = set()
+    seed_columns = {}
+    for bar in seed_bars:
+        s = stocks.index(shortest_stock(bar))
+        counts = [0] * len(sizes)
+        for i in bar:
+            counts[type_of_length[lengths[i]]] += 1
+        key = (s, tuple(counts))
+        if key not in seen:
+            seen.add(key)
+            columns.append((s, counts))
+        seed_columns[key] = seed_columns.get(key, 0) + 1
+    for t, size in enumerate(sizes):
+        for s, capacity in enumerate(capacities):
+            if size <= capacity:
+                counts = [0] * len(sizes)
+                counts[t] = min(capacity // size, int(demand[t]))
+                if (s, tuple(counts)) not in seen:
+                    columns.append((s, counts))
+                    seen.add((s, tuple(counts)))
+
+    # Column generation gets half the time budget, the integer program the rest
+    start = time.monotonic()
+    deadline = start + time_limit / 2
+    for _ in range(max_iterations):
+        cost = np.array([stocks[s] for s, _ in columns])
+        matrix = np.array([counts for _, counts in columns], dtype=float).T
+        lp = linprog(cost, A_ub=-matrix, b_ub=-demand, bounds=(0, None), method="highs")
+        if lp.status != 0:
+            return None
+        duals = -lp.ineqlin.marginals
+
+        added = False
+        for s, capacity in enumerate(capacities):
+            value, counts = bounded_knapsack(duals, sizes, demand.astype(int).tolist(), capacity)
+            # Reduced cost stocks[s] - value must be negative for the pattern to improve the LP
+            if value > stocks[s] * (1 + 1e-9) and (s, tuple(counts)) not in seen:
+                columns.append((s, counts))
+                seen.add((s, tuple(counts)))
+                added = True
+        if not added or time.monotonic() > deadline:
+            break
+
+    cost = np.array([stocks[s] for s, _ in columns])
+    matrix = np.array([counts for _, counts in columns], dtype=float).T
+    result = milp(cost, integrality=np.ones(len(columns)), bounds=Bounds(0, np.inf),
+                  constraints=LinearConstraint(matrix, lb=demand, ub=np.inf),
+                  options={"time_limit": max(time_limit - (time.monotonic() - start), 1.0)})
+    # Fall back to the seed packing when the integer program found nothing better in time
+    bar_counts = np.array([seed_columns.get((s, tuple(counts)), 0) for s, counts in columns])
+    if result.x is not None:
+        milp_counts = np.round(result.x).astype(int)
+        if np.dot(cost, milp_counts) < np.dot(cost, bar_counts):
+            bar_counts = milp_counts
+
+    # Assign the actual parts to the chosen bars, dropping any over-production
+    bars = []
+    remaining = [list(reversed(indexes_by_length[length])) for length in type_lengths]
+    order = sorted(range(len(columns)), key=lambda c: (-stocks[columns[c][0]], -float(np.dot(columns[c][1], sizes))))
+    for c in order:
+        s, counts = columns[c]
+        for _ in range(bar_counts[c]):
+            bar = []
+            for t, count in enumerate(counts):
+                for _ in range(min(count, len(remaining[t]))):
+                    bar.append(remaining[t].pop())
+            if bar:
+                bars.append((stocks[s], bar))
+
+    if any(remaining):
+        return None
+
+    # Over-production can leave a bar that a shorter stock would also hold
+    bars = [(shortest_stock(bar), bar) for _, bar in bars]
+
+    return bars
@@ -1,17 +1,49 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, Response, StreamingResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from pathlib import Path
 import ifcopenshell
 import ifcopenshell.util.element
 import json
-from typing import Dict, List, Any
+import hashlib
+from typing import Dict, List, Any, NamedTuple, Set
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import accumulate
+from bisect import bisect_left
+from urllib.parse import unquote
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
 import os
 import asyncio
+import math
 import re
 import traceback
+import weakref
+
+# NumPy is optional here - nesting vectorizes its pair scan with it when available
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+# Numba is optional - when installed, the nesting pair scan kernel is JIT-compiled
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+# orjson is optional - when installed, large reports (nesting, debug dumps) are serialized with it
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
 
 # Try to import ifcopenshell.geom if available (for geometry operations)
 try:
@@ -20,7 +52,25 @@ try:
 except ImportError:
     HAS_GEOM = False
 
-app = FastAPI(title="IFC Steel Analysis API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Stop the nesting worker processes when the server shuts down."""
+    yield
+    reset_nesting_pool(wait=True)
+
+
+app = FastAPI(title="IFC Steel Analysis API", lifespan=lifespan)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed, otherwise with the stdlib json."""
+
+    def render(self, content: Any) -> bytes:
+        if not HAS_ORJSON:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
 
 # Global exception handlers to prevent server crashes
 @app.exception_handler(StarletteHTTPException)
@@ -72,38 +122,563 @@ STORAGE_DIR = Path(__file__).parent.parent / "storage"
 IFC_DIR = STORAGE_DIR / "ifc"
 REPORTS_DIR = STORAGE_DIR / "reports"
 GLTF_DIR = STORAGE_DIR / "gltf"
+NESTING_CACHE_DIR = STORAGE_DIR / "nesting_cache"
 
 # Create directories if they don't exist
 IFC_DIR.mkdir(parents=True, exist_ok=True)
 REPORTS_DIR.mkdir(parents=True, exist_ok=True)
 GLTF_DIR.mkdir(parents=True, exist_ok=True)
+NESTING_CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
 # Steel element types
 STEEL_TYPES = {"IfcBeam", "IfcColumn", "IfcMember", "IfcPlate"}
 FASTENER_TYPES = {"IfcFastener", "IfcMechanicalFastener"}
 PROXY_TYPES = {"IfcProxy", "IfcBuildingElementProxy"}
 
-# Control nesting logs - set to False to suppress [NESTING] log messages
-ENABLE_NESTING_LOGS = True
+# Profile depth patterns for the nesting fallback when CutPieceExtractor is not available
+_IPE_DEPTH_RE = re.compile(r'IPE\s*(\d+)')
+_HE_DEPTH_RE = re.compile(r'HE[ABM]\s*(\d+)')
+_DIAMETER_SYMBOL_RE = re.compile(r'Ø\s*(\d+\.?\d*)')
+_DIAMETER_KEYWORD_RE = re.compile(r'DIAMETER\s*(\d+\.?\d*)')
+_CHS_DEPTH_RE = re.compile(r'CHS\s*(\d+\.?\d*)')
+_NUMBER_RE = re.compile(r'(\d+\.?\d*)')
+
+# Nesting constants
+_TOLERANCE_MM = 0.1  # Minimal tolerance for floating point errors only - parts must fit within the stock
+_STEEL_KERF_MM = 3.0  # Standard kerf for steel cutting, added when two cuts can't share a boundary
+_MAX_COMPLEMENTARY_ANGLE_DIFF = 2.0  # Max angle magnitude difference (°) for two cuts to share a boundary
+
+# Complementary pairing type -> (part1 side, part2 side) as indexes into (start_angle, end_angle)
+_PAIRING_SIDES = {
+    "start_end": (0, 1),
+    "end_start": (1, 0),
+    "end_end": (1, 1),
+    "start_start": (0, 0),
+}
+
+# Control nesting logs - set to False (or NESTING_LOGS=0) to suppress [NESTING] log messages
+# Hot loops check this flag before calling nesting_log so their f-strings are never built when disabled
+ENABLE_NESTING_LOGS = os.environ.get("NESTING_LOGS", "1").strip().lower() not in ("0", "false", "no", "off")
+
+# Persist nesting reports on disk (set NESTING_CACHE=0 to always recompute)
+# Bump NESTING_CACHE_VERSION whenever a change to the nesting algorithm alters its output
+ENABLE_NESTING_CACHE = os.environ.get("NESTING_CACHE", "1").strip().lower() not in ("0", "false", "no", "off")
+NESTING_CACHE_VERSION = 1
+NESTING_CACHE_MAX_FILES = int(os.environ.get("NESTING_CACHE_MAX_FILES", "100") or 100)  # Oldest reports are evicted beyond this
+
+# Profiles are nested independently, so large requests spread them over worker processes
+# (NESTING_WORKERS=1 keeps nesting in the request process)
+NESTING_WORKERS = int(os.environ.get("NESTING_WORKERS", "0") or 0) or (os.cpu_count() or 1)
+_PARALLEL_NESTING_MIN_PARTS = 200  # Below this, process start-up and pickling outweigh the gain
+_nesting_pool = None
+
+
+def get_nesting_pool() -> ProcessPoolExecutor:
+    """Process pool for nest_profile, created on first use and shared across requests."""
+    global _nesting_pool
+    if _nesting_pool is None:
+        _nesting_pool = ProcessPoolExecutor(max_workers=NESTING_WORKERS)
+    return _nesting_pool
+
+
+def reset_nesting_pool(wait: bool = False) -> None:
+    """Shut down the shared nesting pool (if any); the next get_nesting_pool() starts a fresh one.
+    
+    Called when a worker died (the pool is then broken for good) and on server shutdown.
+    """
+    global _nesting_pool
+    pool, _nesting_pool = _nesting_pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=True)
+
+
+def nesting_cache_path(file_path: Path, settings: Dict[str, Any]) -> Path:
+    """Cache file for a nesting report, keyed by the IFC file (resolved path, mtime, size) and the request settings.
+    
+    A stat() instead of hashing the file content, so even a cache hit on a large model never
+    reads the whole file on the event loop (open_ifc keys its cache the same way).
+    """
+    stat = file_path.stat()
+    key = {
+        "file": str(file_path.resolve()),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "settings": settings,
+    }
+    key_hash = hashlib.sha1(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+    return NESTING_CACHE_DIR / f"nest_{key_hash}.json"
+
+
+def prune_nesting_cache(max_files: int = NESTING_CACHE_MAX_FILES) -> None:
+    """Delete the least recently used nesting reports beyond max_files (hits refresh a report's mtime)."""
+    entries = []
+    for path in NESTING_CACHE_DIR.glob("nest_*.json"):
+        try:
+            entries.append((path.stat().st_mtime, path))
+        except OSError:
+            pass  # Removed by a concurrent prune
+    if len(entries) <= max_files:
+        return
+    entries.sort(reverse=True)
+    for _, path in entries[max_files:]:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
 
-def nesting_log(*args, **kwargs):
-    """Print nesting log messages only if ENABLE_NESTING_LOGS is True."""
+def nesting_log(msg, *args, **kwargs):
+    """Print nesting log messages only if ENABLE_NESTING_LOGS is True.
+    
+    When args are given, msg is a %-style format string and is only formatted
+    if the message is actually printed.
+    """
     if ENABLE_NESTING_LOGS:
+        if args:
+            msg = msg % args
         # Handle Unicode encoding for Windows console by converting to safe ASCII first
-        safe_args = []
-        for arg in args:
-            if isinstance(arg, str):
-                # Replace any non-ASCII characters with '?'
-                safe_args.append(arg.encode('ascii', 'replace').decode('ascii'))
-            else:
-                safe_args.append(arg)
+        if isinstance(msg, str):
+            # Replace any non-ASCII characters with '?'
+            msg = msg.encode('ascii', 'replace').decode('ascii')
         try:
-            print(*safe_args, **kwargs)
+            print(msg, **kwargs)
         except Exception as e:
             # Ultimate fallback: just don't print
             pass
 
 
+# Control assembly lookup logs - the viewer calls /api/assembly-parts on every click, so its
+# [ASSEMBLY-PARTS] trace is off unless ASSEMBLY_LOGS=1
+ENABLE_ASSEMBLY_LOGS = os.environ.get("ASSEMBLY_LOGS", "0").strip().lower() not in ("0", "false", "no", "off")
+
+
+def assembly_log(msg, *args):
+    """Print assembly lookup log messages only if ENABLE_ASSEMBLY_LOGS is True (lazy %-formatting)."""
+    if ENABLE_ASSEMBLY_LOGS:
+        if args:
+            msg = msg % args
+        try:
+            print(msg.encode('ascii', 'replace').decode('ascii'))
+        except Exception:
+            pass
+
+
+def estimate_profile_depth_fallback(profile_name: str) -> float:
+    """Estimate profile depth/diameter in mm from the profile name.
+    
+    Used by nesting when CutPieceExtractor is not available.
+    """
+    estimated_profile_depth = 400.0  # Default
+    profile_name_upper = profile_name.upper()
+    # Try to extract depth/diameter from common patterns
+    if "IPE" in profile_name_upper:
+        match = _IPE_DEPTH_RE.search(profile_name_upper)
+        if match:
+            estimated_profile_depth = float(match.group(1))
+    elif "HEA" in profile_name_upper or "HEB" in profile_name_upper or "HEM" in profile_name_upper:
+        match = _HE_DEPTH_RE.search(profile_name_upper)
+        if match:
+            estimated_profile_depth = float(match.group(1))
+    elif "RHS" in profile_name_upper or "SHS" in profile_name_upper:
+        match = _NUMBER_RE.findall(profile_name_upper)
+        if match:
+            estimated_profile_depth = max([float(d) for d in match])
+    elif "Ø" in profile_name or "DIAMETER" in profile_name_upper or "CHS" in profile_name_upper:
+        # Try to extract diameter from circular profiles like Ø219.1*3
+        # First try with Ø symbol
+        match = _DIAMETER_SYMBOL_RE.search(profile_name)
+        if not match:
+            # Try DIAMETER keyword
+            match = _DIAMETER_KEYWORD_RE.search(profile_name_upper)
+        if not match:
+            # Try CHS format
+            match = _CHS_DEPTH_RE.search(profile_name_upper)
+        if not match:
+            # Fallback: extract first number (should be diameter)
+            match = _NUMBER_RE.search(profile_name)
+        if match:
+            estimated_profile_depth = float(match.group(1))
+    return estimated_profile_depth
+
+
+@lru_cache(maxsize=4096)
+def cached_tan(angle_rad: float) -> float:
+    """math.tan memoized by exact angle - parts in a model share a handful of miter angles."""
+    return math.tan(angle_rad)
+
+
+@lru_cache(maxsize=4)
+def _open_ifc_cached(path: str, mtime_ns: int):
+    """Parsed IFC file, memoized by path and modification time (re-uploads get a new entry)."""
+    return ifcopenshell.open(path)
+
+
+def open_ifc(file_path: Path):
+    """Open an IFC file for read-only endpoints, reusing the parse from earlier requests.
+    
+    Callers must not modify the returned file - it is shared across requests.
+    Use _open_ifc_cached.cache_clear() to drop all cached parses.
+    """
+    # Resolve path to absolute for Windows compatibility
+    resolved_path = file_path.resolve()
+    return _open_ifc_cached(str(resolved_path), resolved_path.stat().st_mtime_ns)
+
+
+# by_type results for the shared files from open_ifc - weakly keyed, so they go with the parsed file
+_by_type_cache: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def cached_by_type(ifc_file, type_name: str, include_subtypes: bool = True) -> tuple:
+    """ifc_file.by_type as a tuple, memoized per file - only for (unmodified) files from open_ifc."""
+    type_cache = _by_type_cache.get(ifc_file)
+    if type_cache is None:
+        type_cache = _by_type_cache[ifc_file] = {}
+    key = (type_name, include_subtypes)
+    entities = type_cache.get(key)
+    if entities is None:
+        entities = type_cache[key] = tuple(ifc_file.by_type(type_name, include_subtypes))
+    return entities
+
+
+def resolve_ifc_path(filename: str) -> Path:
+    """Absolute path of a stored IFC file from its URL-decoded name.
+    
+    Raises a 400 for names that resolve outside IFC_DIR (e.g. "../"), so user input cannot
+    reach other files. The resolved path is also what open_ifc keys its cache on.
+    """
+    ifc_dir = IFC_DIR.resolve()
+    file_path = (ifc_dir / filename).resolve()
+    if ifc_dir not in file_path.parents:
+        raise HTTPException(status_code=400, detail="Invalid filename")
+    return file_path
+
+
+def is_low_confidence_slope(angle: float | None, confidence: float) -> bool:
+    """Check if a cut angle is a low-confidence slope usable for complementary pairing.
+    
+    Uses the same convention detection as slope extraction: 60-120° is the ABS
+    convention (90° = straight), otherwise the DEV convention (0° = straight).
+    """
+    if angle is None:
+        return False
+    abs_angle = abs(angle)
+    if 60 <= abs_angle <= 120:
+        deviation = abs(angle - 90.0)
+    else:
+        deviation = abs_angle
+    return deviation > 5.0 and 0.2 < confidence <= 0.5
+
+
+@dataclass(slots=True, eq=False)
+class NestingPart:
+    """A linear part (beam/column/member) collected for nesting.
+    
+    Slotted to keep the per-part footprint small on large files. flipped and
+    complementary_pair are set during nesting and only serialized once set.
+    """
+    product_id: int
+    profile_name: str
+    original_profile_name: str | None
+    element_type: str
+    length: float
+    assembly_mark: str | None
+    element_name: str | None
+    reference: str | None
+    start_angle: float | None
+    end_angle: float | None
+    start_has_slope: bool
+    end_has_slope: bool
+    start_confidence: float
+    end_confidence: float
+    flipped: bool = False
+    complementary_pair: bool = False
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary for JSON serialization."""
+        data = {
+            "product_id": self.product_id,
+            "profile_name": self.profile_name,
+            "original_profile_name": self.original_profile_name,
+            "element_type": self.element_type,
+            "length": self.length,
+            "assembly_mark": self.assembly_mark,
+            "element_name": self.element_name,
+            "reference": self.reference,
+            "start_angle": self.start_angle,
+            "end_angle": self.end_angle,
+            "start_has_slope": self.start_has_slope,
+            "end_has_slope": self.end_has_slope,
+            "start_confidence": self.start_confidence,
+            "end_confidence": self.end_confidence
+        }
+        if self.complementary_pair:
+            data["slope_info"] = {"complementary_pair": True}
+        if self.flipped:
+            data["flipped"] = True
+        return data
+
+
+class PatternPart(NamedTuple):
+    """A part placed in a nesting cutting pattern.
+    
+    The slope fields are kept flat and only assembled into the slope_info dict
+    when the pattern is serialized.
+    """
+    part: NestingPart
+    cut_position: float
+    length: float
+    start_angle: float | None
+    end_angle: float | None
+    start_has_slope: bool
+    end_has_slope: bool
+    has_slope: bool
+    complementary_pair: bool
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary for JSON serialization."""
+        return {
+            "part": self.part.to_dict(),
+            "cut_position": self.cut_position,
+            "length": self.length,
+            "slope_info": {
+                "start_angle": self.start_angle,
+                "end_angle": self.end_angle,
+                "start_has_slope": self.start_has_slope,
+                "end_has_slope": self.end_has_slope,
+                "has_slope": self.has_slope,
+                "complementary_pair": self.complementary_pair
+            }
+        }
+
+
+def complementary_pairing_type(part1_start_angle, part1_end_angle, part1_start_slope, part1_end_slope,
+                               part2_start_angle, part2_end_angle, part2_start_slope, part2_end_slope) -> str | None:
+    """Return how two parts' sloped cuts complement each other, or None.
+    
+    Complementary means one part's cut matches another's cut with a similar angle
+    magnitude (within 5°), so both can be cut from the same stock bar sharing material.
+    Pairing types are checked in order: start_end, end_start, end_end, start_start
+    (start_start additionally requires opposite angle signs).
+    """
+    def angles_match(angle1, angle2):
+        return abs(abs(angle1) - abs(angle2)) < 5.0 and abs(angle1) > 1.0
+    
+    if part1_start_slope and part2_end_slope and part1_start_angle is not None and part2_end_angle is not None:
+        if angles_match(part1_start_angle, part2_end_angle):
+            return "start_end"
+    if part1_end_slope and part2_start_slope and part1_end_angle is not None and part2_start_angle is not None:
+        if angles_match(part1_end_angle, part2_start_angle):
+            return "end_start"
+    if part1_end_slope and part2_end_slope and part1_end_angle is not None and part2_end_angle is not None:
+        if angles_match(part1_end_angle, part2_end_angle):
+            return "end_end"
+    if part1_start_slope and part2_start_slope and part1_start_angle is not None and part2_start_angle is not None:
+        opposite_signs = (part1_start_angle > 0 and part2_start_angle < 0) or (part1_start_angle < 0 and part2_start_angle > 0)
+        if angles_match(part1_start_angle, part2_start_angle) and opposite_signs:
+            return "start_start"
+    return None
+
+
+_PAIRING_TYPES = (None, "start_end", "end_start", "end_end", "start_start")
+
+
+def complementary_codes_kernel(i, start_angles, end_angles, start_slopes, end_slopes):
+    """Scalar-loop form of the complementary test for part i against parts j > i.
+    
+    Returns an int8 array of indexes into _PAIRING_TYPES (0 = no match). Written as
+    plain loops so Numba can compile it; missing angles are NaN and never match.
+    """
+    n = start_angles.shape[0]
+    codes = np.zeros(n - i - 1, dtype=np.int8)
+    a1_start = start_angles[i]
+    a1_end = end_angles[i]
+    s1_start = start_slopes[i]
+    s1_end = end_slopes[i]
+    abs1_start = abs(a1_start)
+    abs1_end = abs(a1_end)
+    for j in range(i + 1, n):
+        a2_start = start_angles[j]
+        a2_end = end_angles[j]
+        if s1_start and end_slopes[j] and abs(abs1_start - abs(a2_end)) < 5.0 and abs1_start > 1.0:
+            codes[j - i - 1] = 1
+        elif s1_end and start_slopes[j] and abs(abs1_end - abs(a2_start)) < 5.0 and abs1_end > 1.0:
+            codes[j - i - 1] = 2
+        elif s1_end and end_slopes[j] and abs(abs1_end - abs(a2_end)) < 5.0 and abs1_end > 1.0:
+            codes[j - i - 1] = 3
+        elif (s1_start and start_slopes[j] and abs(abs1_start - abs(a2_start)) < 5.0 and abs1_start > 1.0
+              and ((a1_start > 0 and a2_start < 0) or (a1_start < 0 and a2_start > 0))):
+            codes[j - i - 1] = 4
+    return codes
+
+
+if HAS_NUMBA:
+    # No fastmath: it assumes no NaNs, and NaN marks a missing angle here
+    complementary_codes_kernel = njit(cache=True)(complementary_codes_kernel)
+
+
+def find_complementary_candidates(i: int, start_angles, end_angles, start_slopes, end_slopes) -> List[tuple]:
+    """Vectorized complementary_pairing_type() of part i against all parts j > i.
+    
+    Takes NumPy arrays (missing angles as NaN) and returns [(j, pairing_type), ...]
+    in ascending j order. Uses the JIT-compiled kernel when Numba is installed.
+    """
+    if HAS_NUMBA:
+        codes = complementary_codes_kernel(i, start_angles, end_angles, start_slopes, end_slopes)
+        hits = np.flatnonzero(codes)
+        return [(int(k) + i + 1, _PAIRING_TYPES[codes[k]]) for k in hits]
+    
+    a1_start = start_angles[i]
+    a1_end = end_angles[i]
+    a2_start = start_angles[i + 1:]
+    a2_end = end_angles[i + 1:]
+    s2_start = start_slopes[i + 1:]
+    s2_end = end_slopes[i + 1:]
+    
+    # NaN angles compare False, so missing angles never match
+    with np.errstate(invalid="ignore"):
+        start_end = start_slopes[i] & s2_end & (np.abs(abs(a1_start) - np.abs(a2_end)) < 5.0) & (abs(a1_start) > 1.0)
+        end_start = end_slopes[i] & s2_start & (np.abs(abs(a1_end) - np.abs(a2_start)) < 5.0) & (abs(a1_end) > 1.0)
+        end_end = end_slopes[i] & s2_end & (np.abs(abs(a1_end) - np.abs(a2_end)) < 5.0) & (abs(a1_end) > 1.0)
+        start_start = (start_slopes[i] & s2_start & (np.abs(abs(a1_start) - np.abs(a2_start)) < 5.0) & (abs(a1_start) > 1.0)
+                       & (((a1_start > 0) & (a2_start < 0)) | ((a1_start < 0) & (a2_start > 0))))
+    
+    codes = np.select([start_end, end_start, end_end, start_start], [1, 2, 3, 4], default=0)
+    hits = np.flatnonzero(codes)
+    return [(int(k) + i + 1, _PAIRING_TYPES[codes[k]]) for k in hits]
+
+
+def is_complementary_angle(angle1: float | None, angle2: float | None, tol: float = _MAX_COMPLEMENTARY_ANGLE_DIFF) -> bool:
+    """Check if two cut angles are complementary: opposite signs, magnitudes within tol.
+    
+    With opposite signs abs(a + b) equals abs(abs(a) - abs(b)), so one abs() covers both.
+    """
+    return angle1 is not None and angle2 is not None and angle1 * angle2 < 0 and abs(angle1 + angle2) <= tol
+
+
+def can_share_boundary(prev_end_has_slope: bool, prev_end_angle: float | None,
+                       start_has_slope: bool, start_angle: float | None) -> bool:
+    """Check if a part's start can share a cut boundary with the previous part's end.
+    
+    Both ends straight can always share; both sloped can share when the angles are complementary.
+    """
+    if not prev_end_has_slope:
+        return not start_has_slope
+    return start_has_slope and is_complementary_angle(prev_end_angle, start_angle)
+
+
+def boundary_share_mask(prev_end_has_slope: bool, prev_end_angle: float | None, start_slopes, start_angles):
+    """Vectorized check of which parts can share a cut boundary with the previous part's end.
+
+    Same rule as can_share_boundary(), but takes NumPy arrays (missing angles as NaN) for
+    the candidate side and returns a boolean mask.
+    """
+    if not prev_end_has_slope:
+        return ~start_slopes
+    if prev_end_angle is None:
+        return np.zeros(len(start_slopes), dtype=bool)
+    # NaN angles compare False, so missing angles never share
+    with np.errstate(invalid="ignore"):
+        return start_slopes & (prev_end_angle * start_angles < 0) & (np.abs(prev_end_angle + start_angles) <= _MAX_COMPLEMENTARY_ANGLE_DIFF)
+
+
+def first_fit_kernel(start, current_length, limit, has_prev, prev_end_has_slope, prev_end_angle,
+                     lengths, start_angles, end_angles, start_slopes, end_slopes, kerfs, flips):
+    """Scalar-loop form of the Step 2 scan for the first candidate from start on that fits.
+
+    Fills kerfs/flips (indexed from start) for every candidate checked and returns the index
+    of the one that fits, or len(lengths). Written as plain loops so Numba can compile it;
+    missing angles are NaN and never share a boundary.
+    """
+    n = lengths.shape[0]
+    for k in range(start, n):
+        kerf = 0.0
+        if has_prev:
+            if prev_end_has_slope:
+                share = (start_slopes[k] and prev_end_angle * start_angles[k] < 0
+                         and abs(prev_end_angle + start_angles[k]) <= _MAX_COMPLEMENTARY_ANGLE_DIFF)
+            else:
+                share = not start_slopes[k]
+            if not share:
+                if prev_end_has_slope:
+                    share = (end_slopes[k] and prev_end_angle * end_angles[k] < 0
+                             and abs(prev_end_angle + end_angles[k]) <= _MAX_COMPLEMENTARY_ANGLE_DIFF)
+                else:
+                    share = not end_slopes[k]
+                if share:
+                    flips[k - start] = True
+                else:
+                    kerf = _STEEL_KERF_MM
+        kerfs[k - start] = kerf
+        if current_length + lengths[k] + kerf <= limit:
+            return k
+    return n
+
+
+if HAS_NUMBA:
+    first_fit_kernel = njit(cache=True)(first_fit_kernel)
+
+
+def find_first_fit(start: int, current_length: float, limit: float, prev_part, fill_arrays) -> tuple:
+    """Find the first Step 2 candidate from start on whose length (plus kerf) fits within limit.
+
+    fill_arrays holds the candidates' (lengths, start_angles, end_angles, start_slopes, end_slopes)
+    as NumPy arrays. Returns (index, kerfs, flips) where index is len(lengths) when nothing fits,
+    kerfs[k] is the kerf candidate start + k would need and flips[k] marks candidates that share
+    the boundary with prev_part only when flipped (None without a previous part). Uses the
+    JIT-compiled kernel when Numba is installed.
+    """
+    lengths, start_angles, end_angles, start_slopes, end_slopes = fill_arrays
+    n = len(lengths)
+    if HAS_NUMBA:
+        kerfs = np.zeros(n - start)
+        flips = np.zeros(n - start, dtype=bool)
+        has_prev = prev_part is not None
+        prev_end_angle = np.nan if not has_prev or prev_part.end_angle is None else prev_part.end_angle
+        idx = first_fit_kernel(start, current_length, limit, has_prev, has_prev and prev_part.end_has_slope,
+                               prev_end_angle, lengths, start_angles, end_angles, start_slopes, end_slopes, kerfs, flips)
+        return idx, kerfs, flips if has_prev else None
+
+    flips = None
+    if prev_part is not None:
+        share_mask = boundary_share_mask(prev_part.end_has_slope, prev_part.end_angle, start_slopes[start:], start_angles[start:])
+        flips = ~share_mask & boundary_share_mask(prev_part.end_has_slope, prev_part.end_angle, end_slopes[start:], end_angles[start:])
+        kerfs = np.where(share_mask | flips, 0.0, _STEEL_KERF_MM)
+    else:
+        kerfs = np.zeros(n - start)
+    fit_hits = np.flatnonzero(current_length + lengths[start:] + kerfs <= limit)
+    idx = start + int(fit_hits[0]) if len(fit_hits) else n
+    return idx, kerfs, flips
+
+
+def get_part_display_id(part: NestingPart) -> Any:
+    """Identifier shown for a nesting part in logs and rejection reports."""
+    return part.product_id or part.reference or part.element_name or "unknown"
+
+
+def rejected_pattern_entries(pattern_parts: List[PatternPart], stock_length: float, reason: str) -> List[Dict[str, Any]]:
+    """Build rejected_parts entries for every part of a pattern that failed validation."""
+    entries = []
+    for pp in pattern_parts:
+        part_obj = pp.part
+        entries.append({
+            "product_id": part_obj.product_id,
+            "part_id": get_part_display_id(part_obj),
+            "reference": part_obj.reference,
+            "element_name": part_obj.element_name,
+            "length": pp.length,
+            "stock_length": stock_length,
+            "reason": reason
+        })
+    return entries
+
+
+def flip_part_ends(part: NestingPart) -> None:
+    """Swap a nesting part's start and end cut properties in place."""
+    part.start_angle, part.end_angle = part.end_angle, part.start_angle
+    part.start_has_slope, part.end_has_slope = part.end_has_slope, part.start_has_slope
+    part.flipped = True
+
+
 def sanitize_filename(filename: str) -> str:
     """Sanitize filename for Windows compatibility.
     
@@ -837,7 +1412,6 @@ async def upload_ifc(file: UploadFile = File(...)):
         except Exception as write_error:
             print(f"[UPLOAD] ERROR writing file: {write_error}")
             print(f"[UPLOAD] Error type: {type(write_error)}")
-            import traceback
             traceback.print_exc()
             raise
         
@@ -857,7 +1431,6 @@ async def upload_ifc(file: UploadFile = File(...)):
             except Exception as report_error:
                 print(f"[UPLOAD] ERROR saving report: {report_error}")
                 print(f"[UPLOAD] Error type: {type(report_error)}")
-                import traceback
                 traceback.print_exc()
                 raise
             
@@ -888,7 +1461,6 @@ async def upload_ifc(file: UploadFile = File(...)):
             except Exception as e:
                 conversion_error = str(e)
                 print(f"[UPLOAD] ERROR: glTF conversion failed: {e}")
-                import traceback
                 traceback.print_exc()
                 # Don't fail the upload, just log the error
             
@@ -916,7 +1488,6 @@ async def upload_ifc(file: UploadFile = File(...)):
                 file_path.unlink()
             error_msg = f"Error analyzing IFC: {str(e)}"
             print(f"[UPLOAD] {error_msg}")
-            import traceback
             print(f"[UPLOAD] Full traceback:")
             traceback.print_exc()
             raise HTTPException(status_code=500, detail=f"Failed to analyze IFC: {str(e)}")
@@ -925,7 +1496,6 @@ async def upload_ifc(file: UploadFile = File(...)):
     except Exception as e:
         error_msg = f"Upload failed: {str(e)}"
         print(f"[UPLOAD] {error_msg}")
-        import traceback
         print(f"[UPLOAD] Full traceback:")
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
@@ -934,7 +1504,6 @@ async def upload_ifc(file: UploadFile = File(...)):
 @app.get("/api/report/{filename}")
 async def get_report(filename: str):
     """Get report for a specific IFC file."""
-    from urllib.parse import unquote
     decoded_filename = unquote(filename)
     report_path = REPORTS_DIR / f"{decoded_filename}.json"
     
@@ -957,7 +1526,6 @@ async def get_report(filename: str):
 async def get_refined_geometry(filename: str, request: Request):
     """Get high-quality geometry for specific elements using IfcOpenShell with boolean operations."""
     try:
-        from urllib.parse import unquote
         import base64
         
         decoded_filename = unquote(filename)
@@ -1031,7 +1599,6 @@ async def get_refined_geometry(filename: str, request: Request):
     
     except Exception as e:
         print(f"[REFINE] Error: {e}")
-        import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1852,7 +2419,6 @@ def convert_ifc_to_gltf(ifc_path: Path, gltf_path: Path) -> bool:
         return True
     except Exception as e:
         print(f"Error in glTF conversion: {str(e)}")
-        import traceback
         traceback.print_exc()
         raise
 
@@ -1861,7 +2427,6 @@ def convert_ifc_to_gltf(ifc_path: Path, gltf_path: Path) -> bool:
 async def convert_to_gltf(filename: str):
     """Convert IFC file to glTF format."""
     # Decode URL-encoded filename (handles spaces and special characters)
-    from urllib.parse import unquote
     decoded_filename = unquote(filename)
     file_path = IFC_DIR / decoded_filename
     
@@ -1897,7 +2462,6 @@ async def convert_to_gltf(filename: str):
 async def get_gltf_file(filename: str):
     """Serve glTF/GLB file for viewer."""
     # Decode URL-encoded filename (handles spaces and special characters)
-    from urllib.parse import unquote
     decoded_filename = unquote(filename)
     file_path = GLTF_DIR / decoded_filename
     
@@ -2018,7 +2582,6 @@ def analyze_fastener_structure(ifc_path: Path):
 @app.get("/api/debug-fasteners/{filename}")
 async def debug_fasteners(filename: str):
     """Debug endpoint to analyze fastener structure in IFC file."""
-    from urllib.parse import unquote
     decoded_filename = unquote(filename)
     file_path = IFC_DIR / decoded_filename
     
@@ -2030,7 +2593,6 @@ async def debug_fasteners(filename: str):
         result = analyze_fastener_structure(file_path)
         return JSONResponse(result)
     except Exception as e:
-        import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
@@ -2038,7 +2600,6 @@ async def debug_fasteners(filename: str):
 @app.get("/api/debug-assembly/{filename}")
 async def debug_assembly_structure(filename: str):
     """Debug endpoint to understand how Tekla exports assembly information."""
-    from urllib.parse import unquote
     decoded_filename = unquote(filename)
     file_path = IFC_DIR / decoded_filename
     
@@ -2134,7 +2695,6 @@ async def debug_assembly_structure(filename: str):
             "sample_products": debug_info
         })
     except Exception as e:
-        import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Debug failed: {str(e)}")
 
@@ -2142,7 +2702,6 @@ async def debug_assembly_structure(filename: str):
 @app.get("/api/inspect-entity")
 async def inspect_entity(filename: str, entity_id: int):
     """Inspect a specific IFC entity by ID."""
-    from urllib.parse import unquote
     decoded_filename = unquote(filename)
     file_path = IFC_DIR / decoded_filename
     
@@ -2248,7 +2807,6 @@ async def inspect_entity(filename: str, entity_id: int):
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Inspection failed: {str(e)}")
 
@@ -2256,7 +2814,6 @@ async def inspect_entity(filename: str, entity_id: int):
 @app.get("/api/assembly-mapping/{filename}")
 async def get_assembly_mapping(filename: str):
     """Get assembly mapping for a specific IFC file."""
-    from urllib.parse import unquote
     decoded_filename = unquote(filename)
     file_path = IFC_DIR / decoded_filename
     
@@ -2328,125 +2885,1571 @@ async def get_assembly_mapping(filename: str):
         
         return JSONResponse(mapping)
     except Exception as e:
-        import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Failed to get assembly mapping: {str(e)}")
 
 
-@app.get("/api/nesting/{filename}")
-async def generate_nesting(filename: str, stock_lengths: str, profiles: str):
-    """Generate nesting optimization report for selected profiles with slope-aware cutting.
+def nest_profile(profile_name: str, parts: List[NestingPart], estimated_profile_depth: float,
+                 stock_lengths_list: List[float], use_column_generation: bool = False) -> tuple:
+    """Nest the parts of one profile onto the given stock lengths (sorted ascending).
     
-    Args:
-        filename: IFC filename
-        stock_lengths: Comma-separated list of stock lengths in mm (e.g., "6000,12000")
-        profiles: Comma-separated list of profile names to nest (e.g., "IPE200,HEA300")
+    Profiles are independent, so this runs at module level where generate_nesting can hand
+    it to worker processes. Returns (profile nesting report, total stock length used).
     """
-    import sys
-    import traceback
+    nesting_log("[NESTING] Processing %s parts for profile %s", len(parts), profile_name)
     
-    # Force output to be flushed immediately
-    sys.stdout.flush()
-    sys.stderr.flush()
+    if ENABLE_NESTING_LOGS:
+        # Count parts by slope characteristics (only needed for the log)
+        parts_with_slopes_count = sum(1 for p in parts if p.start_has_slope or p.end_has_slope)
+        nesting_log("[NESTING]   Parts with slopes: %s", parts_with_slopes_count)
+        nesting_log("[NESTING]   Parts without slopes: %s", len(parts) - parts_with_slopes_count)
+        
+        # Debug: Log slope information for each part (especially for IPE600)
+        if profile_name == "IPE600":
+            nesting_log("[NESTING]   IPE600 parts details:")
+            for p in parts:
+                nesting_log("[NESTING]     Part %s: length=%.1fmm, start_slope=%s (%s°), end_slope=%s (%s°)",
+                            p.product_id, p.length, p.start_has_slope, p.start_angle,
+                            p.end_has_slope, p.end_angle)
     
-    nesting_log("=" * 60, flush=True)
-    nesting_log("[NESTING] ===== NESTING REQUEST RECEIVED =====", flush=True)
-    nesting_log(f"[NESTING] Filename: {filename}", flush=True)
-    nesting_log(f"[NESTING] Stock lengths: {stock_lengths}", flush=True)
-    nesting_log(f"[NESTING] Profiles: {profiles}", flush=True)
-    nesting_log("=" * 60, flush=True)
+    # Longest-first order used by every stock fitting loop, sorted once per profile
+    sorted_stocks_desc = stock_lengths_list[::-1]
+    max_stock_len = sorted_stocks_desc[0]
+    min_stock_len = stock_lengths_list[0]
     
-    try:
-        from urllib.parse import unquote
-        decoded_filename = unquote(filename)
-        file_path = IFC_DIR / decoded_filename
-        
-        if not file_path.exists():
-            raise HTTPException(status_code=404, detail="IFC file not found")
-        nesting_log(f"[NESTING] Starting slope-aware nesting generation for {filename}")
-        nesting_log(f"[NESTING] Stock lengths: {stock_lengths}")
-        nesting_log(f"[NESTING] Selected profiles: {profiles}")
-        
-        # Parse stock lengths and sort in ascending order (shortest first)
-        # This ensures we prioritize using shorter bars (6m) before longer ones (12m) to minimize waste
-        stock_lengths_list = sorted([float(x.strip()) for x in stock_lengths.split(',') if x.strip()], reverse=False)
-        if not stock_lengths_list:
-            raise HTTPException(status_code=400, detail="At least one stock length is required")
+    # Bin packing algorithm with slope-aware pairing
+    cutting_patterns = []
+    # Keyed by the JSON form of the stock length (str) so the report can use it as-is
+    stock_lengths_used: Dict[str, int] = {}
+    # Profile totals, accumulated as patterns are created instead of re-summed afterwards
+    # (int 0 start like the sum() they replace, so a profile without patterns still reports 0)
+    total_waste_profile = 0
+    total_stock_length_for_profile = 0
+    total_parts_in_patterns = 0
+    rejected_parts = []  # Track parts that cannot be nested (exceed stock length)
+    
+    remaining_parts = parts.copy()
+    # Parts sorted by length descending once per profile (stable, so ties keep input order);
+    # each iteration takes the parts that fit from this order instead of re-sorting
+    parts_by_length = sorted(parts, key=lambda p: p.length, reverse=True)
+    neg_lengths_by_length = [-p.length for p in parts_by_length]  # ascending, for bisect
+    max_iterations = min(len(parts) * 3, 500)  # Reduced safety limit to prevent infinite loops
+    iteration_count = 0
+    
+    # Straight ends always share the cut boundary, so a profile without sloped cuts is a plain
+    # cutting stock problem that column generation can solve for minimum total stock length
+    if use_column_generation and not any(p.start_has_slope or p.end_has_slope for p in parts):
+        from cutting_stock import solve_cutting_stock
+        bars = solve_cutting_stock([p.length for p in parts], stock_lengths_list, _TOLERANCE_MM)
+        if bars is None:
+            nesting_log("[NESTING] Column generation not available for profile %s - using greedy nesting", profile_name)
+        else:
+            nesting_log("[NESTING] Column generation nested %s parts of profile %s on %s bars", len(parts), profile_name, len(bars))
+            for best_stock, part_indexes in bars:
+                pattern_parts = []
+                current_length = 0.0
+                for index in part_indexes:
+                    part = parts[index]
+                    pattern_parts.append(PatternPart(
+                        part=part,
+                        cut_position=current_length,
+                        length=part.length,
+                        start_angle=part.start_angle,
+                        end_angle=part.end_angle,
+                        start_has_slope=False,
+                        end_has_slope=False,
+                        has_slope=False,
+                        complementary_pair=part.complementary_pair
+                    ))
+                    current_length += part.length
+                waste = best_stock - min(current_length, best_stock)
+                cutting_patterns.append({
+                    "stock_length": best_stock,
+                    "parts": [pp.to_dict() for pp in pattern_parts],
+                    "waste": waste,
+                    "waste_percentage": (waste / best_stock * 100) if best_stock > 0 else 0
+                })
+                stock_key = str(best_stock)
+                stock_lengths_used[stock_key] = stock_lengths_used.get(stock_key, 0) + 1
+                total_waste_profile += waste
+                total_stock_length_for_profile += best_stock
+                total_parts_in_patterns += len(pattern_parts)
+            remaining_parts = []
+    
+    while remaining_parts and iteration_count < max_iterations:
+        iteration_count += 1
+        nesting_log("[NESTING] === WHILE LOOP ITERATION %s - %s parts remaining ===", iteration_count, len(remaining_parts))
+        
+        # Find best stock length for remaining parts
+        # Strategy: Use 6M bars only if all remaining parts that fit in 6M can be packed into 6M
+        # Otherwise, use 12M bars to minimize waste
+        best_stock = None
+        
+        # Read the remaining parts' lengths once per iteration; the stock selection below
+        # only needs their maximum and sum
+        remaining_lengths = [p.length for p in remaining_parts]
+        
+        # Find the largest remaining part
+        largest_part_length = max(remaining_lengths)
+        
+        # Get the shortest and longest stock lengths
+        shortest_stock = min_stock_len
+        longest_stock = max_stock_len
+        
+        # First, check if any parts exceed the longest stock - these cannot be nested
+        if largest_part_length > longest_stock:
+            # Parts exceed longest stock - cannot nest these parts
+            # Partition remaining_parts in a single pass instead of filtering and then
+            # calling remaining_parts.remove() (O(N) each) for every oversized part
+            oversized_parts = []
+            fitting_parts = []
+            for p in remaining_parts:
+                (oversized_parts if p.length > longest_stock else fitting_parts).append(p)
+            nesting_log("[NESTING] ERROR: %s parts exceed longest stock (%.0fmm):", len(oversized_parts), longest_stock)
+            for p in oversized_parts:
+                product_id = p.product_id
+                part_id = get_part_display_id(p)
+                # Get reference and element_name, handling None and empty strings
+                reference = p.reference
+                if reference and isinstance(reference, str) and not reference.strip():
+                    reference = None
+                element_name = p.element_name
+                if element_name and isinstance(element_name, str) and not element_name.strip():
+                    element_name = None
+                nesting_log("[NESTING]   - Part %s: %.1fmm > %.0fmm, reference=%s, element_name=%s", part_id, p.length, longest_stock, reference, element_name)
+                # Add to rejected parts list
+                rejected_parts.append({
+                    "product_id": product_id,
+                    "part_id": part_id,
+                    "reference": reference,
+                    "element_name": element_name,
+                    "length": p.length,
+                    "stock_length": longest_stock,
+                    "reason": f"Part length ({p.length:.1f}mm) exceeds longest available stock ({longest_stock:.0f}mm)"
+                })
+            # Remove oversized parts from remaining_parts to prevent infinite loop
+            remaining_parts = fitting_parts
+            remaining_lengths = [p.length for p in remaining_parts]
+            # If all parts were oversized, break
+            if not remaining_parts:
+                nesting_log("[NESTING] All parts exceed stock length. Cannot nest.")
+                break
+            # Recalculate largest part length after removing oversized parts
+            if remaining_parts:
+                largest_part_length = max(remaining_lengths)
+        
+        # Find the best stock for remaining parts
+        # STRATEGY: Choose the stock length that minimizes waste
+        # CRITICAL: Check if parts fit TOGETHER in one bar, not just individually
+        nesting_log("[NESTING] === ENTERING NEW STOCK SELECTION LOGIC (Iteration %s) ===", iteration_count)
+        best_stock = None
+        total_length_all_remaining = sum(remaining_lengths)
+        
+        # Get stock lengths (assuming 6m and 12m are available)
+        shortest_stock = min_stock_len
+        longest_stock = max_stock_len
+        
+        # CRITICAL: Check if all parts fit TOGETHER in one bar (not just individually)
+        # Check if total length fits in longest stock (12m)
+        all_fit_together_in_longest = total_length_all_remaining <= longest_stock
+        
+        # Check if total length fits in shortest stock (6m)
+        all_fit_together_in_shortest = total_length_all_remaining <= shortest_stock
+        
+        # Also check if individual parts fit (for validation) - they all do when the largest one does
+        all_parts_individually_fit_longest = largest_part_length <= longest_stock
+        all_parts_individually_fit_shortest = largest_part_length <= shortest_stock
+        
+        # DEBUG: Log the decision process
+        if ENABLE_NESTING_LOGS:
+            nesting_log("[NESTING] === STOCK SELECTION DEBUG ===")
+            nesting_log("[NESTING] Remaining parts (%s): %s", len(remaining_parts), ', '.join(f"{p.product_id or 'unknown'}({p.length:.0f}mm)" for p in remaining_parts))
+            nesting_log("[NESTING] Total length: %.1fmm", total_length_all_remaining)
+            nesting_log("[NESTING] Shortest stock: %.0fmm, Longest stock: %.0fmm", shortest_stock, longest_stock)
+            nesting_log("[NESTING] All fit together in %.0fmm: %s (%.1fmm <= %.0fmm)", longest_stock, all_fit_together_in_longest, total_length_all_remaining, longest_stock)
+            nesting_log("[NESTING] All fit together in %.0fmm: %s (%.1fmm <= %.0fmm)", shortest_stock, all_fit_together_in_shortest, total_length_all_remaining, shortest_stock)
+            nesting_log("[NESTING] All parts individually fit in %.0fmm: %s", longest_stock, all_parts_individually_fit_longest)
+            nesting_log("[NESTING] All parts individually fit in %.0fmm: %s", shortest_stock, all_parts_individually_fit_shortest)
+        
+        # NEW: Evaluate all stock lengths where ALL remaining parts fit together
+        # STRATEGY: Prefer longer stocks first (12m before 6m)
+        # Only use shorter stocks when leftover parts are <= shorter stock length
+        candidate_stocks = []
+        for stock_len in sorted_stocks_desc:  # Check longer stocks first
+            all_fit_together_in_stock = total_length_all_remaining <= stock_len
+            all_parts_individually_fit_stock = largest_part_length <= stock_len
+            if all_fit_together_in_stock and all_parts_individually_fit_stock:
+                waste = stock_len - total_length_all_remaining
+                waste_pct = (waste / stock_len * 100) if stock_len > 0 else 0
+                candidate_stocks.append((stock_len, waste, waste_pct))
+
+        if candidate_stocks:
+            # NEW STRATEGY: Prefer longer stocks first (12m before 6m)
+            # Sort by stock length descending (longer first), then by waste ascending
+            # This ensures we fill longer bars first, only using shorter bars for leftovers
+            candidate_stocks.sort(key=lambda x: (-x[0], x[1]))  # Negative for descending stock length
+            best_stock, best_waste, best_waste_pct = candidate_stocks[0]
+            
+            # Check if we should use a shorter stock instead
+            # Only use shorter stock if ALL remaining parts fit in shorter stock
+            if len(candidate_stocks) > 1:
+                longer_stock = candidate_stocks[0][0]  # Already sorted descending (longest first)
+                shorter_stock = candidate_stocks[-1][0]  # Shortest candidate
+                
+                # If ALL remaining parts fit in shorter stock, use shorter stock to minimize waste
+                if total_length_all_remaining <= shorter_stock:
+                    # All parts fit in shorter stock - use it to minimize waste
+                    best_stock = shorter_stock
+                    best_waste = shorter_stock - total_length_all_remaining
+                    best_waste_pct = (best_waste / shorter_stock * 100) if shorter_stock > 0 else 0
+                    nesting_log(
+                        "[NESTING] DECISION: Using %.0fmm stock (shorter preferred for leftovers): "
+                        "all %s parts fit in shorter stock "
+                        "(total: %.1fmm, "
+                        "waste: %.1fmm, %.1f%%)",
+                        best_stock, len(remaining_parts), total_length_all_remaining, best_waste, best_waste_pct
+                    )
+                else:
+                    # Not all parts fit in shorter stock - use longer stock and fill it
+                    best_stock = longer_stock
+                    nesting_log(
+                        "[NESTING] DECISION: Using %.0fmm stock (longer preferred): "
+                        "all %s parts fit together "
+                        "(total: %.1fmm, "
+                        "waste: %.1fmm, %.1f%%)",
+                        best_stock, len(remaining_parts), total_length_all_remaining, best_waste, best_waste_pct
+                    )
+            else:
+                # Only one candidate stock
+                nesting_log(
+                    "[NESTING] DECISION: Using %.0fmm stock: "
+                    "all %s parts fit together "
+                    "(total: %.1fmm, "
+                    "waste: %.1fmm, %.1f%%)",
+                    best_stock, len(remaining_parts), total_length_all_remaining, best_waste, best_waste_pct
+                )
         
-        # Parse selected profiles and normalize them (remove element_type prefix if present)
-        # This merges parts with same profile name regardless of type (beam/column/member)
-        def extract_base_profile_name(profile_key: str) -> str:
-            """Extract base profile name, removing element_type prefix if present.
-            
-            Examples:
-            - "beam_IPE100" -> "IPE100"
-            - "column_IPE100" -> "IPE100"
-            - "IfcBeam_IPE100" -> "IPE100"
-            - "IPE100" -> "IPE100"
-            """
-            if not profile_key:
-                return profile_key
+        # If no stock fits all parts together in one bar, choose the best stock for the largest part by minimum waste
+        if best_stock is None:
+            nesting_log("[NESTING] WARNING: No stock selected yet - parts don't all fit together in one bar")
+            nesting_log("[NESTING]   - all_fit_together_in_longest: %s", all_fit_together_in_longest)
+            nesting_log("[NESTING]   - all_parts_individually_fit_longest: %s", all_parts_individually_fit_longest)
+            nesting_log("[NESTING]   - all_fit_together_in_shortest: %s", all_fit_together_in_shortest)
+            nesting_log("[NESTING]   - all_parts_individually_fit_shortest: %s", all_parts_individually_fit_shortest)
+            
+            candidate_for_largest = []
+            for stock_len in sorted_stocks_desc:  # Check longer stocks first
+                if largest_part_length <= stock_len:
+                    waste_for_largest = stock_len - largest_part_length
+                    waste_pct_for_largest = (waste_for_largest / stock_len * 100) if stock_len > 0 else 0
+                    candidate_for_largest.append((stock_len, waste_for_largest, waste_pct_for_largest))
+            
+            if candidate_for_largest:
+                # Sort by stock length descending (longer first), then by waste ascending
+                # This prefers longer stocks first, only using shorter stocks when needed
+                candidate_for_largest.sort(key=lambda x: (-x[0], x[1]))  # Negative for descending stock length
+                best_stock, best_waste_largest, best_waste_pct_largest = candidate_for_largest[0]
+                nesting_log(
+                    "[NESTING] FALLBACK: Using %.0fmm stock for largest part "
+                    "(%.1fmm, waste: %.1fmm, "
+                    "%.1f%%) - longer stock preferred",
+                    best_stock, largest_part_length, best_waste_largest, best_waste_pct_largest
+                )
+            else:
+                nesting_log(
+                    "[NESTING] ERROR: No stock length fits the largest part (%.1fmm). "
+                    "Available stocks: %s",
+                    largest_part_length, stock_lengths_list
+                )
+                # Skip this iteration - parts will remain in remaining_parts
+                break
+        
+        # Final safety check
+        if best_stock is None:
+            nesting_log("[NESTING] ERROR: No stock length fits the largest part (%.1fmm). Available stocks: %s", largest_part_length, stock_lengths_list)
+            # Skip this iteration - parts will remain in remaining_parts
+            break
+        
+        # CRITICAL: Filter out parts that exceed best_stock BEFORE pairing
+        # This prevents oversized parts from being nested
+        # Valid parts sorted by length descending so longest pieces are placed first:
+        # the parts fitting best_stock are a suffix of parts_by_length, found by binary search
+        remaining_ids = {id(p) for p in remaining_parts}
+        first_fitting = bisect_left(neg_lengths_by_length, -best_stock)
+        valid_parts_for_this_stock = [p for p in parts_by_length[first_fitting:] if id(p) in remaining_ids]
+        if not valid_parts_for_this_stock:
+            nesting_log("[NESTING] No parts fit in selected stock %.0fmm. Skipping this iteration.", best_stock)
+            break
+        
+        # Create a pattern for this stock bar
+        pattern_parts = []
+        current_length = 0.0  # Tracks actual material used (accounts for shared cuts)
+        total_parts_length = 0.0  # Tracks sum of individual part lengths (for waste calculation)
+        longest_part_length = 0.0  # Longest part added to the pattern, so validation doesn't re-walk it
+        cut_position = 0.0
+        parts_to_remove = []
+        parts_to_remove_ids = set()  # id() of parts in parts_to_remove, for O(1) membership checks
+        pending_complementary_pair = None  # Track a complementary pair that needs to be paired in this pattern
+        stock_to_use = best_stock  # Initialize stock_to_use to best_stock (will be overridden for complementary pairs if needed)
+        
+        # Strategy: Try to pair parts with complementary slopes first
+        # When pairing, check ALL available stock lengths to find the best fit
+        # Then fill remaining space with other parts
+        
+        # PRE-STEP: Identify complementary chains (sequences of parts that can nest together)
+        # This algorithm builds chains by finding parts that can connect regardless of order
+        # This is for DISPLAY purposes only - actual pairing logic below remains unchanged
+        ANGLE_MATCH_TOL = 5.0
+        MIN_SLOPE_ANGLE = 1.0
+        
+        # Helper function to check if two slopes match (are complementary)
+        def slopes_match(angle1, angle2):
+            if angle1 is None or angle2 is None:
+                return False
+            angle_diff = abs(abs(angle1) - abs(angle2))
+            return angle_diff < ANGLE_MATCH_TOL and abs(angle1) > MIN_SLOPE_ANGLE
+        
+        # Build a graph of which parts can connect to which
+        # part_connections[i] = list of (j, connection_type) where j can connect to i
+        # connection_type: 'start-start', 'start-end', 'end-start', 'end-end'
+        part_connections = {i: [] for i in range(len(valid_parts_for_this_stock))}
+        
+        for i in range(len(valid_parts_for_this_stock)):
+            part_i = valid_parts_for_this_stock[i]
+            i_start_slope = part_i.start_has_slope
+            i_end_slope = part_i.end_has_slope
+            i_start_angle = part_i.start_angle
+            i_end_angle = part_i.end_angle
+            
+            for j in range(i + 1, len(valid_parts_for_this_stock)):
+                part_j = valid_parts_for_this_stock[j]
+                j_start_slope = part_j.start_has_slope
+                j_end_slope = part_j.end_has_slope
+                j_start_angle = part_j.start_angle
+                j_end_angle = part_j.end_angle
+                
+                # Check all possible connection types
+                if i_start_slope and j_start_slope and slopes_match(i_start_angle, j_start_angle):
+                    part_connections[i].append((j, 'start-start'))
+                    part_connections[j].append((i, 'start-start'))
+                if i_start_slope and j_end_slope and slopes_match(i_start_angle, j_end_angle):
+                    part_connections[i].append((j, 'start-end'))
+                    part_connections[j].append((i, 'end-start'))
+                if i_end_slope and j_start_slope and slopes_match(i_end_angle, j_start_angle):
+                    part_connections[i].append((j, 'end-start'))
+                    part_connections[j].append((i, 'start-end'))
+                if i_end_slope and j_end_slope and slopes_match(i_end_angle, j_end_angle):
+                    part_connections[i].append((j, 'end-end'))
+                    part_connections[j].append((i, 'end-end'))
+        
+        # Find the longest chains using greedy approach
+        # Start from parts with only one connection (chain ends) or any unvisited part
+        used_in_chains = set()
+        all_chains = []
+        
+        # Priority: start with parts that have only 1 connection (likely chain ends)
+        start_candidates = sorted(range(len(valid_parts_for_this_stock)),
+                                key=lambda x: len(part_connections[x]))
+        
+        for start_idx in start_candidates:
+            if start_idx in used_in_chains:
+                continue
+            if len(part_connections[start_idx]) == 0:
+                continue
             
-            # Check if it has a prefix like "beam_", "column_", "member_"
-            for prefix in ["beam_", "column_", "member_"]:
-                if profile_key.startswith(prefix):
-                    return profile_key[len(prefix):]
+            # Build chain starting from this part
+            chain = [start_idx]
+            used_in_chains.add(start_idx)
             
-            # Also check for "IfcBeam_", "IfcColumn_", "IfcMember_" prefixes
-            for prefix in ["IfcBeam_", "IfcColumn_", "IfcMember_"]:
-                if profile_key.startswith(prefix):
-                    return profile_key[len(prefix):]
+            # Extend chain as long as possible
+            while True:
+                current_idx = chain[-1]
+                # Find next part to add (not already in chain)
+                next_candidates = [(idx, conn_type) for idx, conn_type in part_connections[current_idx]
+                                  if idx not in used_in_chains]
+                
+                if not next_candidates:
+                    break
+                
+                # Pick the first available connection
+                next_idx, conn_type = next_candidates[0]
+                chain.append(next_idx)
+                used_in_chains.add(next_idx)
+            
+            if len(chain) >= 2:
+                all_chains.append(chain)
+                nesting_log("[NESTING] Found complementary chain of %s parts: %s", len(chain), chain)
+        
+        # Mark all parts in chains with complementary_pair flag (for frontend display)
+        complementary_chain_parts = set()
+        for chain in all_chains:
+            for idx in chain:
+                complementary_chain_parts.add(idx)
+                valid_parts_for_this_stock[idx].complementary_pair = True
+        
+        # Step 1: Try to find complementary slope pairs (only from valid parts)
+        # For IPE600 and other large profiles, prioritize finding complementary pairs first
+        # First, find all complementary pairs and check which stock length they fit in
+        complementary_pairs = []
+        # Only consider valid parts that fit in best_stock
+        if len(valid_parts_for_this_stock) >= 2:
+            # Flatten the fields used by the pairing scan into parallel lists (SoA) once,
+            # instead of re-reading part dicts and re-deriving slope flags for every pair
+            n_valid = len(valid_parts_for_this_stock)
+            soa_length = [p.length for p in valid_parts_for_this_stock]
+            # Every part dict is built by the extraction loop above with all slope fields populated,
+            # so they are indexed directly instead of going through .get() fallbacks
+            soa_start_angle = [p.start_angle for p in valid_parts_for_this_stock]
+            soa_end_angle = [p.end_angle for p in valid_parts_for_this_stock]
+            # Combined slope flags: high confidence, or low confidence (0.2 < confidence <= 0.5, deviation > 5°)
+            # The low-confidence variant catches real slopes on short parts that can still be paired
+            soa_start_slope = [
+                p.start_has_slope or is_low_confidence_slope(p.start_angle, p.start_confidence)
+                for p in valid_parts_for_this_stock
+            ]
+            soa_end_slope = [
+                p.end_has_slope or is_low_confidence_slope(p.end_angle, p.end_confidence)
+                for p in valid_parts_for_this_stock
+            ]
+            soa_has_slope = [start or end for start, end in zip(soa_start_slope, soa_end_slope)]
+            pair_used = [False] * n_valid
+            soa_arrays = None
+            if HAS_NUMPY:
+                soa_arrays = (
+                    np.array([np.nan if a is None else a for a in soa_start_angle], dtype=np.float64),
+                    np.array([np.nan if a is None else a for a in soa_end_angle], dtype=np.float64),
+                    np.array(soa_start_slope, dtype=bool),
+                    np.array(soa_end_slope, dtype=bool),
+                )
             
-            return profile_key
-        
-        raw_selected_profiles = [x.strip() for x in profiles.split(',') if x.strip()]
-        if not raw_selected_profiles:
-            raise HTTPException(status_code=400, detail="At least one profile is required")
-        
-        # Normalize profile names and create a mapping from base name to all variants
-        base_profile_names = set()
-        profile_name_mapping = {}  # base_name -> list of original names
-        
-        for raw_profile in raw_selected_profiles:
-            base_name = extract_base_profile_name(raw_profile)
-            base_profile_names.add(base_name)
-            if base_name not in profile_name_mapping:
-                profile_name_mapping[base_name] = []
-            profile_name_mapping[base_name].append(raw_profile)
-        
-        selected_profiles = list(base_profile_names)
-        
-        nesting_log(f"[NESTING] Parsed stock lengths: {stock_lengths_list}")
-        nesting_log(f"[NESTING] Raw selected profiles: {raw_selected_profiles}")
-        nesting_log(f"[NESTING] Normalized base profile names: {selected_profiles}")
-        nesting_log(f"[NESTING] Profile name mapping: {profile_name_mapping}")
-        
-        # Open IFC file - resolve path to absolute for Windows compatibility
-        resolved_path = file_path.resolve()
-        ifc_file = ifcopenshell.open(str(resolved_path))
-        nesting_log(f"[NESTING] Opened IFC file: {decoded_filename}")
-        
-        # Import cut piece extractor for slope detection
-        extractor = None
-        try:
-            nesting_log(f"[NESTING] Attempting to import CutPieceExtractor...")
-            from cut_piece_extractor import CutPieceExtractor
-            nesting_log(f"[NESTING] CutPieceExtractor imported successfully")
-            extractor = CutPieceExtractor(ifc_file)
+            stock_full = False
+            for i in range(n_valid):
+                # CRITICAL CHECK: Ensure current_length hasn't already exceeded best_stock
+                # This prevents trying to add more pairs when current_length is already too high
+                if current_length > best_stock + _TOLERANCE_MM:
+                    if ENABLE_NESTING_LOGS:
+                        nesting_log("[NESTING] BREAK OUTER LOOP: current_length %.1fmm already exceeds stock %.0fmm - stopping complementary pair search", current_length, best_stock)
+                    break  # Break out of outer loop to prevent adding more pairs
+                
+                if pair_used[i]:
+                    continue
+                
+                # Skip parts without slopes for pairing (neither high confidence nor low confidence)
+                if not soa_has_slope[i]:
+                    continue
+                part1_start_slope_any = soa_start_slope[i]
+                part1_end_slope_any = soa_end_slope[i]
+                
+                part1 = valid_parts_for_this_stock[i]
+                part1_start_angle = soa_start_angle[i]
+                part1_end_angle = soa_end_angle[i]
+                part1_angles = (part1_start_angle, part1_end_angle)
+                
+                # Find all parts after part1 with a complementary slope in one pass
+                if soa_arrays is not None:
+                    pair_candidates = find_complementary_candidates(i, *soa_arrays)
+                else:
+                    pair_candidates = []
+                    for j in range(i + 1, n_valid):
+                        candidate_type = complementary_pairing_type(
+                            part1_start_angle, part1_end_angle, part1_start_slope_any, part1_end_slope_any,
+                            soa_start_angle[j], soa_end_angle[j], soa_start_slope[j], soa_end_slope[j]
+                        )
+                        if candidate_type is not None:
+                            pair_candidates.append((j, candidate_type))
+                
+                # Try to pair with a complementary part (only from valid parts)
+                for j, pairing_type in pair_candidates:
+                    if pair_used[j]:
+                        continue
+                    
+                    part2_start_slope_any = soa_start_slope[j]
+                    part2_end_slope_any = soa_end_slope[j]
+                    part2_start_angle = soa_start_angle[j]
+                    part2_end_angle = soa_end_angle[j]
+                    
+                    # Complementary pair found - try to pair them
+                    # For complementary slopes, calculate the actual length needed
+                    # The sloped cuts share the same cut area, so total length is less than sum
+                    part2 = valid_parts_for_this_stock[j]
+                    length1 = soa_length[i]
+                    length2 = soa_length[j]
+                    
+                    # The shared length is capped at 90% of the smaller part, so the pair needs at least
+                    # max + 10% of min - skip the depth/angle work when even that can't fit any stock
+                    if max(length1, length2) + 0.1 * min(length1, length2) > max_stock_len:
+                        continue
+                    
+                    # Get the angle for the complementary cut
+                    # The angle depends on the pairing type:
+                    # - end_start: use part1_end_angle and part2_start_angle
+                    # - start_end: use part1_start_angle and part2_end_angle
+                    # - end_end: use part1_end_angle and part2_end_angle
+                    # - start_start: use part1_start_angle and part2_start_angle
+                    pairing_sides = _PAIRING_SIDES.get(pairing_type)
+                    if pairing_sides is not None:
+                        angle1_val = part1_angles[pairing_sides[0]]
+                        angle2_val = (part2_start_angle, part2_end_angle)[pairing_sides[1]]
+                    else:
+                        # Fallback: use any available angle
+                        angle1_val = part1_start_angle if part1_start_angle is not None else part1_end_angle
+                        angle2_val = part2_start_angle if part2_start_angle is not None else part2_end_angle
+                    
+                    # Use the angle that's actually being paired (should be the same for complementary cuts)
+                    angle_for_calculation = angle1_val if angle1_val is not None else angle2_val
+                    
+                    # For complementary slopes, estimate the overlap
+                    # The overlap depends on the angle and profile depth
+                    # For IPE profiles, approximate depth is typically 200-600mm
+                    # For a 41.72° cut, the overlap is approximately: depth / tan(angle)
+                    # But since we're cutting from the same stock, the actual length needed
+                    # is approximately: length1 + length2 - (cut_depth / sin(angle))
+                    
+                    # Profile depth was estimated once for this profile group (see estimated_profile_depth above)
+                    
+                    # GENERIC CALCULATION: Works for ALL profile types (IPE, HEA, RHS, SHS, CHS, Pipes, etc.)
+                    # For complementary slopes, calculate the shared material length
+                    # This is a simple geometric calculation that works universally
+                    
+                    if ENABLE_NESTING_LOGS:
+                        nesting_log("[NESTING] Profile detection: name='%s', depth=%.1fmm", profile_name, estimated_profile_depth)
+                    
+                    # Initialize shared_linear_slopes_length
+                    shared_linear_slopes_length = 0.0
+                    
+                    if angle_for_calculation is not None and abs(angle_for_calculation) > 1.0:
+                        # abs() is kept so angles past 90° keep their original tan() sign; the 1° guard above
+                        # already implies angle_rad > 0.01, so no second threshold check is needed
+                        angle_rad = math.radians(abs(angle_for_calculation))
+                        
+                        # CORRECTED FORMULA: For complementary cuts, the shared material is the linear overlap
+                        # along the cutting axis (the green X in the user's diagram)
+                        # Generic formula for ALL profile types: shared_length = depth * tan(angle)
+                        # This gives the linear projection along the cutting axis for the shared material
+                        
+                        # Use depth * tan(angle) for all profile types (IPE, HEA, RHS, SHS, circular, etc.)
+                        shared_linear_slopes_length = estimated_profile_depth * cached_tan(angle_rad)
+                        
+                        # Safety check: shared length cannot exceed the smaller part length
+                        max_shared = min(length1, length2) * 0.9  # Max 90% of smaller part
+                        if shared_linear_slopes_length > max_shared:
+                            shared_linear_slopes_length = max_shared
+                            if ENABLE_NESTING_LOGS:
+                                nesting_log("[NESTING] Capped shared length to %.1fmm (90%% of smaller part)", shared_linear_slopes_length)
+                        
+                        # Calculate combined length using actual geometric shared length
+                        # IMPORTANT: Do NOT adjust shared length to fit stock - use only geometric calculation
+                        combined_length = length1 + length2 - shared_linear_slopes_length
+                        
+                        if combined_length < 0:
+                            # Safety: if shared length is larger than sum, cap it
+                            max_shared = min(length1, length2) * 0.5
+                            if shared_linear_slopes_length > max_shared:
+                                if ENABLE_NESTING_LOGS:
+                                    nesting_log("[NESTING] Warning: Shared length (%.1fmm) too large, capping to %.1fmm", shared_linear_slopes_length, max_shared)
+                                shared_linear_slopes_length = max_shared
+                                combined_length = length1 + length2 - shared_linear_slopes_length
+                        
+                        if ENABLE_NESTING_LOGS:
+                            nesting_log("[NESTING] Complementary slopes: angle=%.1f°, depth=%.1fmm", angle_for_calculation, estimated_profile_depth)
+                            nesting_log("[NESTING]   Part 1: %.1fmm, Part 2: %.1fmm", length1, length2)
+                            nesting_log("[NESTING]   Shared: %.1fmm (depth * tan(angle) = %.1f * tan(%.1f°))", shared_linear_slopes_length, estimated_profile_depth, angle_for_calculation)
+                            nesting_log("[NESTING]   Combined: %.1f + %.1f - %.1f = %.1fmm", length1, length2, shared_linear_slopes_length, combined_length)
+                    else:
+                        # Fallback: use linear sum if angle is not available
+                        combined_length = length1 + length2
+                        # shared_linear_slopes_length is already 0.0 from initialization
+                    
+                    if ENABLE_NESTING_LOGS:
+                        angle1_str = f"{angle1_val:.1f}°" if angle1_val is not None else "N/A"
+                        angle2_str = f"{angle2_val:.1f}°" if angle2_val is not None else "N/A"
+                    
+                    # Check ALL available stock lengths to see if this pair fits
+                    # Use minimal tolerance only for floating point rounding errors
+                    # CRITICAL: Parts must fit within stock length - no tolerance for exceeding stock
+                    best_stock_for_pair = None
+                    
+                    # FIXED: Find the LONGEST stock that fits to minimize number of bars
+                    # Prefer longer stock (12M) when pair fits, to minimize number of bars
+                    for stock_len in sorted_stocks_desc:  # Check longer stocks first (12M before 6M)
+                        if combined_length <= stock_len + _TOLERANCE_MM:
+                            # Additional strict check: combined_length must not exceed stock_len
+                            if combined_length > stock_len:
+                                if ENABLE_NESTING_LOGS:
+                                    nesting_log("[NESTING] REJECTING pair: combined_length %.1fmm exceeds stock %.0fmm (tolerance %.1fmm is only for rounding)", combined_length, stock_len, _TOLERANCE_MM)
+                                continue
+                            best_stock_for_pair = stock_len
+                            waste = stock_len - combined_length
+                            waste_pct = (waste / stock_len * 100) if stock_len > 0 else 0
+                            if ENABLE_NESTING_LOGS:
+                                nesting_log("[NESTING] Pair fits in %.1fmm stock: %.1fmm <= %.1fmm (waste: %.1fmm, %.1f%%) - preferring longer stock to minimize bars", stock_len, combined_length, stock_len, waste, waste_pct)
+                            break  # Use the longest stock that fits
+                    
+                    if best_stock_for_pair:
+                        # Calculate waste, but ensure it's not negative (due to tolerance)
+                        waste_for_pair = max(0.0, best_stock_for_pair - combined_length)
+                        # shared_linear_slopes_length is always initialized (0.0 at minimum)
+                        saved_material = shared_linear_slopes_length
+                        if ENABLE_NESTING_LOGS:
+                            nesting_log("[NESTING] Found complementary slopes (%s): part %s (%s) with part %s (%s) - actual length needed: %.1fmm (saved %.1fmm from shared cut), fits in stock: %.1fmm (waste: %.1fmm)", pairing_type, part1.product_id, angle1_str, part2.product_id, angle2_str, combined_length, saved_material, best_stock_for_pair, waste_for_pair)
+                    else:
+                        if ENABLE_NESTING_LOGS:
+                            nesting_log("[NESTING] Found complementary slopes (%s): part %s (%s) with part %s (%s) - actual length needed: %.1fmm, doesn't fit in any stock length (max available: %.1fmm)", pairing_type, part1.product_id, angle1_str, part2.product_id, angle2_str, combined_length, max_stock_len)
+                    
+                    # FIXED: For complementary pairs, use the stock selected by best_stock (prefers shorter)
+                    # Respect the stock selection logic that prefers shorter stock when all parts fit
+                    if best_stock_for_pair:
+                        # Pair fits in a stock length - use best_stock (which prefers shorter when all fit)
+                        stock_to_use = best_stock
+                        if current_length == 0.0:
+                            # Pattern is empty - use best_stock (already selected to prefer shorter)
+                            # Only use pair's stock if it's the same as best_stock or if pair doesn't fit in best_stock
+                            if combined_length <= best_stock:
+                                # Pair fits in best_stock - use best_stock (prefers shorter)
+                                if ENABLE_NESTING_LOGS:
+                                    nesting_log("[NESTING] Using stock %.1fmm for complementary pair (respects shorter stock preference)", best_stock)
+                            else:
+                                # Pair doesn't fit in best_stock - use pair's stock (but this shouldn't happen if best_stock is correct)
+                                stock_to_use = best_stock_for_pair
+                                if ENABLE_NESTING_LOGS:
+                                    nesting_log("[NESTING] WARNING: Pair needs %.1fmm but best_stock is %.1fmm", best_stock_for_pair, best_stock)
+                        else:
+                            # Pattern has parts - use best_stock (already selected)
+                            stock_to_use = best_stock
+                    else:
+                        # Pair doesn't fit in any stock - use best_stock (will be rejected later)
+                        stock_to_use = best_stock
+                    
+                    # For complementary slopes, prioritize pairing even if it means starting a new pattern
+                    # This is especially important for IPE600, IPE400 and other large profiles
+                    # CRITICAL: NO TOLERANCE - must fit exactly within stock length
+                    # CRITICAL CHECK: Ensure current_length hasn't already exceeded best_stock
+                    # Maximum optimization: 0mm margin - only use tolerance for floating point errors
+                    if current_length > best_stock + _TOLERANCE_MM:
+                        if ENABLE_NESTING_LOGS:
+                            nesting_log("[NESTING] SKIP PAIR: current_length %.1fmm already exceeds stock %.0fmm - cannot add more pairs", current_length, best_stock)
+                        break  # Break out of complementary pair processing
+                    
+                    # STRICT VALIDATION: Check if pair actually fits in stock (no tolerance)
+                    if best_stock_for_pair and combined_length <= best_stock_for_pair + _TOLERANCE_MM:
+                        # Additional validation: ensure pair fits in the stock we're using
+                        if combined_length > stock_to_use:
+                            if ENABLE_NESTING_LOGS:
+                                nesting_log("[NESTING] REJECTING pair: combined_length %.1fmm exceeds stock_to_use %.1fmm", combined_length, stock_to_use)
+                            continue  # Skip this pair
+                        
+                        # The pair fits in a stock bar - ALWAYS prioritize pairing complementary slopes
+                        # This is critical - never split complementary pairs
+                        if current_length == 0.0:
+                            # Pattern is empty - ALWAYS pair complementary parts (this is the most common case)
+                            if ENABLE_NESTING_LOGS:
+                                nesting_log("[NESTING] Pattern is empty - pairing complementary parts in %.1fmm stock", best_stock_for_pair)
+                        elif current_length + combined_length <= best_stock + _TOLERANCE_MM:
+                            # Pair fits in current pattern - allow exact fit (0mm margin for maximum optimization)
+                            # BUT: Ensure that after adding, current_length won't exceed best_stock
+                            # Use strict check: current_length + combined_length must be <= best_stock (not best_stock + tolerance)
+                            if current_length + combined_length > best_stock:
+                                # Even with tolerance, this would exceed stock - reject it
+                                if ENABLE_NESTING_LOGS:
+                                    nesting_log("[NESTING] REJECTING pair: current_length %.1fmm + combined_length %.1fmm = %.1fmm > %.0fmm (exceeds stock)", current_length, combined_length, current_length + combined_length, best_stock)
+                                continue  # Skip this pair
+                            if ENABLE_NESTING_LOGS:
+                                nesting_log("[NESTING] Complementary pair fits in current pattern, pairing them")
+                        else:
+                            # Pair doesn't fit in current pattern - must start new pattern to pair them
+                            if ENABLE_NESTING_LOGS:
+                                nesting_log("[NESTING] Complementary pair doesn't fit in current pattern (%.1fmm + %.1fmm > %.0fmm). Starting new pattern to pair them.", current_length, combined_length, best_stock)
+                            break
+                        
+                        # CRITICAL VALIDATION: Double-check that adding this pair won't exceed stock
+                        # Use best_stock (the actual stock length for this pattern) not stock_to_use
+                        length_after_pair = current_length + combined_length
+                        if length_after_pair > best_stock + _TOLERANCE_MM:
+                            if ENABLE_NESTING_LOGS:
+                                nesting_log("[NESTING] REJECTING pair: Would exceed stock (%.1fmm > %.0fmm)", length_after_pair, best_stock)
+                            continue  # Skip this pair
+                        
+                        # If we get here, the pair fits and should be added
+                        if ENABLE_NESTING_LOGS:
+                            nesting_log("[NESTING] Both parts fit in stock bar (%.0fmm), pairing them (current: %.1fmm + combined: %.1fmm = %.1fmm)", best_stock, current_length, combined_length, length_after_pair)
+                        # Add both parts as a complementary pair
+                        rollback_mark = len(pattern_parts)
+                        pattern_parts.append(PatternPart(
+                            part=part1,
+                            cut_position=cut_position,
+                            length=length1,
+                            start_angle=part1_start_angle,
+                            end_angle=part1_end_angle,
+                            start_has_slope=part1_start_slope_any,
+                            end_has_slope=part1_end_slope_any,
+                            has_slope=soa_has_slope[i],
+                            complementary_pair=True
+                        ))
+                        # Store the current_length before adding the pair
+                        length_before_pair = current_length
+                        
+                        cut_position += length1
+                        
+                        # For complementary slopes, part2 starts at the shared cut position
+                        # This means part2's cut_position should account for the shared linear slopes length
+                        part2_cut_position = cut_position - shared_linear_slopes_length
+                        
+                        pattern_parts.append(PatternPart(
+                            part=part2,
+                            cut_position=part2_cut_position,
+                            length=length2,
+                            start_angle=part2_start_angle,
+                            end_angle=part2_end_angle,
+                            start_has_slope=part2_start_slope_any,
+                            end_has_slope=part2_end_slope_any,
+                            has_slope=soa_has_slope[j],
+                            complementary_pair=True
+                        ))
+                        # Update cut_position to reflect where we actually are after both parts
+                        # This is part1 end + part2 length - shared_linear_slopes_length (which equals combined_length)
+                        cut_position = part2_cut_position + length2
+                        
+                        # Use combined_length directly to update current_length - this ensures accuracy
+                        # combined_length already accounts for: length1 + length2 - shared_linear_slopes_length
+                        current_length = length_before_pair + combined_length
+                        
+                        # STRICT CHECK: current_length must NEVER exceed best_stock
+                        # Use a very small epsilon to account for floating point precision only
+                        epsilon = 0.01
+                        if current_length > best_stock + epsilon:
+                            # This should never happen if validation is correct, but catch it just in case
+                            if ENABLE_NESTING_LOGS:
+                                nesting_log("[NESTING] REJECTION: current_length %.1fmm exceeds stock %.0fmm (epsilon: %.2fmm) - removing pair", current_length, best_stock, epsilon)
+                            # Remove the parts we just added
+                            del pattern_parts[rollback_mark:]
+                            current_length = length_before_pair
+                            cut_position = length_before_pair  # Reset cut_position too
+                            continue  # Skip this pair
+                        
+                        total_parts_length += length1 + length2  # Track individual part lengths (for display)
+                        longest_part_length = max(longest_part_length, length1, length2)
+                        
+                        if ENABLE_NESTING_LOGS:
+                            nesting_log("[NESTING] Added complementary pair: length_before = %.1fmm, combined_length = %.1fmm, current_length = %.1fmm", length_before_pair, combined_length, current_length)
+                            nesting_log("[NESTING]   Verification: part1=%.1fmm + part2=%.1fmm - shared=%.1fmm = %.1fmm", part1.length, part2.length, shared_linear_slopes_length, combined_length)
+                        
+                        parts_to_remove.extend([part1, part2])
+                        parts_to_remove_ids.update((id(part1), id(part2)))
+                        pair_used[i] = pair_used[j] = True
+                        if ENABLE_NESTING_LOGS:
+                            nesting_log("[NESTING] Successfully paired complementary slopes - waste saved by using complementary cuts")
+                        
+                        # A pair is always longer than either of its parts (shared length is capped at 90% of the
+                        # smaller part), so once the free space is below the shortest unpaired sloped part no
+                        # further pair can fit and the rest of the scan can be skipped
+                        min_remaining_length = min(
+                            (soa_length[k] for k in range(n_valid) if soa_has_slope[k] and not pair_used[k]),
+                            default=math.inf
+                        )
+                        if best_stock - current_length < min_remaining_length:
+                            stock_full = True
+                        break  # Found a pair, move to next part
+                    else:
+                        if ENABLE_NESTING_LOGS:
+                            nesting_log("[NESTING] Complementary parts don't fit in any stock length (combined_length=%.1fmm, max_stock=%.1fmm)", combined_length, max_stock_len)
+                        # Don't break - continue looking for other pairs that might fit
+                
+                if stock_full:
+                    if ENABLE_NESTING_LOGS:
+                        nesting_log("[NESTING] BREAK OUTER LOOP: remaining space %.1fmm is shorter than any unpaired sloped part - stopping complementary pair search", best_stock - current_length)
+                    break
+    
+        # Step 2: Fill remaining space with other parts (including non-sloped parts)
+        # IMPORTANT: Step 1 already tried to find complementary pairs
+        # Now process ALL remaining parts to ensure complete nesting for IPE500, IPE600, Ø219.1*3, etc.
+        # No skipping - Step 1 handled pairing, Step 2 handles everything else
+        # Only process valid parts that fit in best_stock
+        
+        # CRITICAL FIX: Choose optimal starting part to maximize boundary sharing (flushing)
+        # For parts with straight cuts, find the part that allows the most other parts to share boundaries
+        # This ensures maximum flushing even if the starting part isn't the longest
+        remaining_parts_sorted = [p for p in valid_parts_for_this_stock if id(p) not in parts_to_remove_ids]
+        
+        # If pattern is empty (no parts added yet), choose the best starting part
+        if len(pattern_parts) == 0 and len(remaining_parts_sorted) > 0:
+            # Only calculate flush score for small lists to avoid O(n²) performance issues
+            # Try look-ahead: simulate patterns with different starting parts and pick the best
+            # Use first 20 parts for look-ahead even if list is longer (to make it work for large profiles)
+            parts_to_consider = remaining_parts_sorted[:20] if len(remaining_parts_sorted) > 20 else remaining_parts_sorted
+            
+            if len(parts_to_consider) >= 3:
+                # LOOK-AHEAD STRATEGY: Try different starting parts and simulate the pattern
+                # Pick the configuration that results in minimum waste
+                nesting_log("[NESTING] Using look-ahead strategy on %s parts: trying up to 5 different starting configurations", len(parts_to_consider))
+                
+                best_configuration = None
+                best_waste = float('inf')
+                candidates_to_try = min(5, len(parts_to_consider))  # Try top 5 candidates
+                
+                # First, filter out parts with START slopes (they're bad starting parts)
+                straight_start_parts = [p for p in parts_to_consider if not p.start_has_slope]
+                slope_start_parts = [p for p in parts_to_consider if p.start_has_slope]
+                
+                # Prioritize trying straight-start parts
+                candidates = (straight_start_parts[:candidates_to_try] + slope_start_parts)[:candidates_to_try]
+                
+                for trial_start_part in candidates:
+                    # Simulate: how many parts can we fit if we start with this part?
+                    simulated_length = trial_start_part.length
+                    simulated_parts = [trial_start_part]
+                    simulated_ids = {id(trial_start_part)}
+                    simulated_remaining = [p for p in parts_to_consider if p is not trial_start_part]
+                    
+                    prev_end_slope = trial_start_part.end_has_slope
+                    prev_end_angle = trial_start_part.end_angle
+                    
+                    # CRITICAL: Sort simulated_remaining to prioritize parts that can flush with prev part
+                    can_flush_sim = []
+                    cannot_flush_sim = []
+                    for p in simulated_remaining:
+                        p_start_slope = p.start_has_slope
+                        p_start_angle = p.start_angle
+                        can_share = False
+                        if not prev_end_slope and not p_start_slope:
+                            can_share = True
+                        elif prev_end_slope and p_start_slope:
+                            if prev_end_angle is not None and p_start_angle is not None:
+                                angle_diff = abs(abs(prev_end_angle) - abs(p_start_angle))
+                                if angle_diff <= _MAX_COMPLEMENTARY_ANGLE_DIFF:
+                                    can_share = True
+                        if can_share:
+                            can_flush_sim.append(p)
+                        else:
+                            cannot_flush_sim.append(p)
+                    
+                    # Prioritize flushable parts, then sort each group by length descending
+                    can_flush_sim.sort(key=lambda x: x.length, reverse=True)
+                    cannot_flush_sim.sort(key=lambda x: x.length, reverse=True)
+                    simulated_remaining_sorted = can_flush_sim + cannot_flush_sim
+                    
+                    # Greedily add parts that can flush with previous part
+                    max_parts_to_try = 10
+                    parts_added = 0
+                    while parts_added < max_parts_to_try and simulated_remaining_sorted:
+                        # Re-sort remaining parts to prioritize those that flush with current prev_part
+                        can_flush_now = []
+                        cannot_flush_now = []
+                        for p in simulated_remaining_sorted:
+                            if id(p) in simulated_ids:
+                                continue
+                            p_start_slope = p.start_has_slope
+                            p_start_angle = p.start_angle
+                            p_end_slope = p.end_has_slope
+                            p_end_angle = p.end_angle
+                            
+                            # Check if part can share in current orientation
+                            can_share = False
+                            if not prev_end_slope and not p_start_slope:
+                                can_share = True
+                            elif prev_end_slope and p_start_slope:
+                                if prev_end_angle is not None and p_start_angle is not None:
+                                    angle_diff = abs(abs(prev_end_angle) - abs(p_start_angle))
+                                    if angle_diff <= _MAX_COMPLEMENTARY_ANGLE_DIFF:
+                                        can_share = True
+                            
+                            # If can't share, check if FLIPPING would help
+                            if not can_share:
+                                # Check flipped orientation (swap start with end)
+                                flipped_start_slope = p_end_slope
+                                flipped_start_angle = p_end_angle
+                                if not prev_end_slope and not flipped_start_slope:
+                                    can_share = True  # Flipping helps!
+                                elif prev_end_slope and flipped_start_slope:
+                                    if prev_end_angle is not None and flipped_start_angle is not None:
+                                        angle_diff = abs(abs(prev_end_angle) - abs(flipped_start_angle))
+                                        if angle_diff <= _MAX_COMPLEMENTARY_ANGLE_DIFF:
+                                            can_share = True  # Flipping helps!
+                            
+                            if can_share:
+                                can_flush_now.append(p)
+                            else:
+                                cannot_flush_now.append(p)
+                        
+                        # Try flushable parts first
+                        next_candidates = can_flush_now + cannot_flush_now
+                        if not next_candidates:
+                            break
+                        
+                        next_part = next_candidates[0]
+                        next_start_slope = next_part.start_has_slope
+                        
+                        # Calculate kerf
+                        kerf = _STEEL_KERF_MM  # Default kerf
+                        if can_flush_now:  # next_part is can_flush_now[0] whenever any part can flush
+                            kerf = 0.0  # Can flush, no kerf
+                        
+                        new_length = simulated_length + next_part.length + kerf
+                        if new_length <= best_stock:
+                            simulated_length = new_length
+                            simulated_parts.append(next_part)
+                            simulated_ids.add(id(next_part))
+                            prev_end_slope = next_part.end_has_slope
+                            prev_end_angle = next_part.end_angle
+                            parts_added += 1
+                        else:
+                            break  # Can't fit more parts
+                    
+                    # Calculate waste for this configuration
+                    waste = best_stock - simulated_length
+                    nesting_log("[NESTING] Trial start with part (length=%.0fmm): %s parts, waste=%.0fmm", trial_start_part.length, len(simulated_parts), waste)
+                    
+                    # Pick configuration with minimum waste (or maximum parts if waste is similar)
+                    if waste < best_waste or (abs(waste - best_waste) < 10 and len(simulated_parts) > len(best_configuration) if best_configuration else False):
+                        best_waste = waste
+                        best_configuration = simulated_parts
+                
+                # Use the best configuration found - reorder remaining_parts_sorted to follow it
+                if best_configuration:
+                    best_start_part = best_configuration[0]
+                    nesting_log("[NESTING] Look-ahead selected: Start with part (length=%.0fmm), predicted %s parts, waste=%.0fmm", best_start_part.length, len(best_configuration), best_waste)
+                    
+                    # CRITICAL: Reorder remaining_parts_sorted to follow the best configuration order
+                    # Put the simulated parts in order, then add the rest sorted by length
+                    # Use both id() and length matching for robustness
+                    config_ids = {id(p): p for p in best_configuration}
+                    remaining_not_in_config = []
+                    for p in remaining_parts_sorted:
+                        if id(p) not in config_ids:
+                            remaining_not_in_config.append(p)
+                    remaining_not_in_config.sort(key=lambda p: p.length, reverse=True)
+                    remaining_parts_sorted = list(best_configuration) + remaining_not_in_config
+                    nesting_log("[NESTING] *** LOOK-AHEAD APPLIED *** Reordered parts: %s from optimal config (lengths: %s...), then %s others by length", len(best_configuration), [p.length for p in best_configuration[:5]], len(remaining_not_in_config))
+                else:
+                    best_start_part = None
+                
+                best_flush_score = 100  # Set high score so we don't re-sort below
+                best_start_part = "LOOKAHEAD_APPLIED"  # Marker to skip re-sorting below
+            
+            elif len(remaining_parts_sorted) <= 50:
+                # Calculate "flush score" for each part as a potential starting part
+                # Flush score = how many other parts can share boundaries with this part
+                best_start_part = None
+                best_flush_score = -1
+                
+                for candidate_idx, candidate in enumerate(remaining_parts_sorted):
+                    flush_score = 0
+                    candidate_start_slope = candidate.start_has_slope
+                    candidate_start_angle = candidate.start_angle
+                    candidate_end_slope = candidate.end_has_slope
+                    candidate_end_angle = candidate.end_angle
+                    
+                    # CRITICAL: Heavily penalize parts with START slope as first part
+                    # A sloped start creates waste at the beginning of the bar
+                    if candidate_start_slope:
+                        # Check if this start slope has a complementary match that could be placed BEFORE it
+                        # (which is impossible since this would be the first part)
+                        # So any start slope on first part = guaranteed waste
+                        flush_score = -1000  # Heavy penalty
+                        nesting_log("[NESTING] Candidate part has START slope - penalizing heavily as first part (creates waste)")
+                    else:
+                        # Check how many other parts can share boundary with this candidate's end
+                        for other_idx, other in enumerate(remaining_parts_sorted):
+                            if candidate_idx == other_idx:
+                                continue
+                            
+                            other_start_slope = other.start_has_slope
+                            other_start_angle = other.start_angle
+                            
+                            # Check if they can share boundary
+                            can_share = False
+                            if not candidate_end_slope and not other_start_slope:
+                                # Both straight - can share
+                                can_share = True
+                            elif candidate_end_slope and other_start_slope:
+                                # Both sloped - check if complementary
+                                if candidate_end_angle is not None and other_start_angle is not None:
+                                    angle_diff = abs(abs(candidate_end_angle) - abs(other_start_angle))
+                                    if angle_diff <= _MAX_COMPLEMENTARY_ANGLE_DIFF:
+                                        can_share = True
+                            
+                            if can_share:
+                                flush_score += 1
+                    
+                    # Prefer parts with higher flush score, use length as tiebreaker
+                    if flush_score > best_flush_score or (flush_score == best_flush_score and (best_start_part is None or candidate.length > best_start_part.length)):
+                        best_flush_score = flush_score
+                        best_start_part = candidate
+                
+                # Reorder to put best starting part first
+                if best_start_part is not None and best_flush_score > 0:
+                    remaining_parts_sorted.remove(best_start_part)
+                    remaining_parts_sorted.insert(0, best_start_part)
+                    nesting_log("[NESTING] Step 2: Chose optimal starting part (flush_score=%s) to maximize boundary sharing", best_flush_score)
+                else:
+                    # Fallback: sort by length descending
+                    remaining_parts_sorted.sort(key=lambda p: p.length, reverse=True)
+                    nesting_log("[NESTING] Step 2: Using length-based sorting (no flush optimization needed)")
+            else:
+                # For large lists, skip flush score calculation and just sort by length
+                remaining_parts_sorted.sort(key=lambda p: p.length, reverse=True)
+                nesting_log("[NESTING] Step 2: Large part count (%s), using simple length-based sorting for performance", len(remaining_parts_sorted))
+                best_flush_score = 0  # Mark that we sorted
+        else:
+            # Pattern already has parts, prioritize parts that can flush with the last part
+            if len(pattern_parts) > 0 and len(remaining_parts_sorted) > 0:
+                prev_part = pattern_parts[-1]
+                prev_end_has_slope = prev_part.end_has_slope
+                prev_end_angle = prev_part.end_angle
+                
+                # Separate parts that can flush from those that can't
+                can_flush = []
+                cannot_flush = []
+                
+                for p in remaining_parts_sorted:
+                    curr_start_has_slope = p.start_has_slope
+                    curr_start_angle = p.start_angle
+                    
+                    # Check if this part can share boundary with previous part
+                    shares_boundary = False
+                    if not prev_end_has_slope and not curr_start_has_slope:
+                        shares_boundary = True  # Both straight
+                    elif prev_end_has_slope and curr_start_has_slope:
+                        if prev_end_angle is not None and curr_start_angle is not None:
+                            angle_diff = abs(abs(prev_end_angle) - abs(curr_start_angle))
+                            if angle_diff <= _MAX_COMPLEMENTARY_ANGLE_DIFF:
+                                shares_boundary = True  # Complementary slopes
+                    
+                    if shares_boundary:
+                        can_flush.append(p)
+                    else:
+                        cannot_flush.append(p)
+                
+                # Further separate cannot_flush into those with unpaired end slopes (should go last)
+                # Parts with unpaired END slopes should be placed last so their slope counts as end waste
+                cannot_flush_with_unpaired_end = []
+                cannot_flush_normal = []
+                
+                for p in cannot_flush:
+                    p_end_slope = p.end_has_slope
+                    p_end_angle = p.end_angle
+                    
+                    if p_end_slope:
+                        # Check if this end slope has a complement in remaining parts
+                        has_complement = False
+                        for other in remaining_parts_sorted:
+                            if p is other:
+                                continue
+                            other_start_slope = other.start_has_slope
+                            other_start_angle = other.start_angle
+                            if other_start_slope and p_end_angle is not None and other_start_angle is not None:
+                                angle_diff = abs(abs(p_end_angle) - abs(other_start_angle))
+                                if angle_diff <= _MAX_COMPLEMENTARY_ANGLE_DIFF:
+                                    has_complement = True
+                                    break
+                        
+                        if not has_complement:
+                            cannot_flush_with_unpaired_end.append(p)
+                        else:
+                            cannot_flush_normal.append(p)
+                    else:
+                        cannot_flush_normal.append(p)
+                
+                # Sort each group by length descending, then prioritize flushable parts
+                can_flush.sort(key=lambda p: p.length, reverse=True)
+                cannot_flush_normal.sort(key=lambda p: p.length, reverse=True)
+                cannot_flush_with_unpaired_end.sort(key=lambda p: p.length, reverse=True)
+                
+                # Order: flushable first, then normal non-flushable, then unpaired end slopes last
+                remaining_parts_sorted = can_flush + cannot_flush_normal + cannot_flush_with_unpaired_end
+                
+                nesting_log("[NESTING] Step 2: Prioritized %s flushable, %s normal, %s unpaired-end-slope parts (last)", len(can_flush), len(cannot_flush_normal), len(cannot_flush_with_unpaired_end))
+            else:
+                # No previous part, just sort by length
+                remaining_parts_sorted.sort(key=lambda p: p.length, reverse=True)
+                nesting_log("[NESTING] Step 2: Sorted %s remaining parts by length descending", len(remaining_parts_sorted))
+        
+        # Parallel arrays of the candidates' lengths and cut slopes, so that the next part that fits
+        # is found with one vectorized pass instead of testing the parts one by one
+        n_fill = len(remaining_parts_sorted)
+        # Slopes of each candidate as (start_angle, end_angle, start_has_slope, end_has_slope), read once
+        fill_slopes = [(p.start_angle, p.end_angle, p.start_has_slope, p.end_has_slope) for p in remaining_parts_sorted]
+        fill_arrays = None
+        if HAS_NUMPY and n_fill > 1:
+            fill_arrays = (
+                np.array([p.length for p in remaining_parts_sorted], dtype=np.float64),
+                np.array([np.nan if p.start_angle is None else p.start_angle for p in remaining_parts_sorted], dtype=np.float64),
+                np.array([np.nan if p.end_angle is None else p.end_angle for p in remaining_parts_sorted], dtype=np.float64),
+                np.array([p.start_has_slope for p in remaining_parts_sorted], dtype=bool),
+                np.array([p.end_has_slope for p in remaining_parts_sorted], dtype=bool),
+            )
+        
+        valid_part_ids = {id(p) for p in valid_parts_for_this_stock}
+        # fill_suffix_min[k] = shortest candidate from position k on; once even that one can't fit
+        # in the space left, nothing later in the scan can either
+        fill_suffix_min = list(accumulate(reversed([p.length for p in remaining_parts_sorted]), min))[::-1]
+        fill_idx = 0
+        while fill_idx < n_fill:
+            if current_length + fill_suffix_min[fill_idx] > best_stock + _TOLERANCE_MM:
+                # The part-by-part check still flips parts whose reversed end shares the boundary
+                # with the previous part (unless the stock is already overfull), so apply those flips before stopping
+                if pattern_parts and current_length <= best_stock + _TOLERANCE_MM:
+                    prev_part = pattern_parts[-1]
+                    prev_end_has_slope = prev_part.end_has_slope
+                    prev_end_angle = prev_part.end_angle
+                    for k in range(fill_idx, n_fill):
+                        tail_start_angle, tail_end_angle, tail_start_has_slope, tail_end_has_slope = fill_slopes[k]
+                        if (not can_share_boundary(prev_end_has_slope, prev_end_angle, tail_start_has_slope, tail_start_angle)
+                                and can_share_boundary(prev_end_has_slope, prev_end_angle, tail_end_has_slope, tail_end_angle)):
+                            flip_part_ends(remaining_parts_sorted[k])
+                nesting_log("[NESTING] No remaining part fits in the %.1fmm left - stopping part filling", best_stock - current_length)
+                break
+            if fill_arrays is not None and current_length <= best_stock + _TOLERANCE_MM:
+                next_idx, kerf_arr, flip_mask = find_first_fit(fill_idx, current_length, best_stock + _TOLERANCE_MM,
+                                                                pattern_parts[-1] if pattern_parts else None, fill_arrays)
+
+                # Parts skipped over are still flipped when that lets them share the boundary,
+                # just as the part-by-part check below does before finding they don't fit
+                if flip_mask is not None:
+                    for k in np.flatnonzero(flip_mask[:next_idx - fill_idx]):
+                        flip_part_ends(remaining_parts_sorted[fill_idx + k])
+                if ENABLE_NESTING_LOGS:
+                    for k in range(next_idx - fill_idx):
+                        skipped_part = remaining_parts_sorted[fill_idx + k]
+                        if flip_mask is not None:
+                            if flip_mask[k]:
+                                nesting_log("[NESTING] Flipping part to enable boundary sharing (swap start<->end)")
+                            elif kerf_arr[k]:
+                                nesting_log("[NESTING] Parts cannot share boundary - adding %.1fmm kerf", kerf_arr[k])
+                        part_id = get_part_display_id(skipped_part)
+                        nesting_log("[NESTING] Part %s (%.1fmm) + kerf (%.1fmm) doesn't fit: %.1fmm + %.1fmm + %.1fmm = %.1fmm > %.0fmm (tolerance: %.1fmm)", part_id, skipped_part.length, kerf_arr[k], current_length, skipped_part.length, kerf_arr[k], current_length + skipped_part.length + kerf_arr[k], best_stock, _TOLERANCE_MM)
+                
+                if next_idx >= n_fill:
+                    break
+                fill_idx = next_idx
+            
+            part = remaining_parts_sorted[fill_idx]
+            curr_start_angle, curr_end_angle, curr_start_has_slope, curr_end_has_slope = fill_slopes[fill_idx]
+            fill_idx += 1
+            if id(part) in parts_to_remove_ids:
+                continue
+            
+            # Process the part - only add if it fits in the stock
+            # FIXED: Don't add parts that exceed stock length - they should have been filtered earlier
+            # Only process parts from valid_parts_for_this_stock
+            if id(part) not in valid_part_ids:
+                # Part was filtered out (exceeds stock) - skip it
+                continue
+            
+            # CRITICAL SAFETY CHECK: Ensure current_length hasn't already exceeded stock
+            # This prevents adding more parts when current_length is already too high
+            # Maximum optimization: 0mm margin - only use tolerance for floating point errors
+            # If current_length exceeds best_stock (even slightly), stop immediately
+            if current_length > best_stock + _TOLERANCE_MM:
+                nesting_log("[NESTING] SAFETY BREAK: current_length %.1fmm already exceeds stock %.0fmm (tolerance: %.1fmm) - stopping pattern", current_length, best_stock, _TOLERANCE_MM)
+                break
+            
+            # CRITICAL FIX: For individual parts (not paired), always use full part length
+            part_length = part.length
+            
+            # CRITICAL: Check if this part can share boundary with previous part
+            # If boundaries can't be shared (non-complementary slopes), add kerf
+            kerf_mm = 0.0  # Default: no kerf if boundaries can be shared
+            
+            if len(pattern_parts) > 0:
+                # Check if previous part's end and current part's start can share boundary
+                prev_part = pattern_parts[-1]
+                prev_end_has_slope = prev_part.end_has_slope
+                prev_end_angle = prev_part.end_angle
+                
+                # Both straight, or complementary slopes (opposite signs, similar magnitude)
+                can_share = can_share_boundary(prev_end_has_slope, prev_end_angle, curr_start_has_slope, curr_start_angle)
+                
+                # If boundaries can't be shared, CHECK IF FLIPPING THE PART WOULD HELP
+                if not can_share:
+                    # Try flipping the part: swap start and end
+                    # Check if flipped part CAN share boundary with previous part
+                    can_share_if_flipped = can_share_boundary(prev_end_has_slope, prev_end_angle, curr_end_has_slope, curr_end_angle)
+                    
+                    # If flipping helps, FLIP THE PART!
+                    if can_share_if_flipped:
+                        nesting_log("[NESTING] Flipping part to enable boundary sharing (swap start<->end)")
+                        # Swap start and end properties
+                        flip_part_ends(part)
+                        # Update the cached slopes for this iteration
+                        curr_start_angle, curr_end_angle = curr_end_angle, curr_start_angle
+                        curr_start_has_slope, curr_end_has_slope = curr_end_has_slope, curr_start_has_slope
+                        can_share = True  # Now it can share!
+                        kerf_mm = 0.0
+                    else:
+                        # Can't flip to help, add kerf
+                        kerf_mm = _STEEL_KERF_MM
+                        nesting_log("[NESTING] Parts cannot share boundary - adding %.1fmm kerf", kerf_mm)
+                else:
+                    # Already can share, no kerf needed
+                    kerf_mm = 0.0
+            else:
+                # No previous part, no kerf needed
+                kerf_mm = 0.0
+            
+            # STRICT VALIDATION: Check if adding this part (with kerf if needed) would exceed stock
+            new_length = current_length + part_length + kerf_mm  # Add kerf if boundaries can't be shared
+            
+            # VALIDATION: Check if adding this part would exceed stock length
+            # Use current_length (actual material used) not total_parts_length (sum of individual lengths)
+            # current_length accounts for shared cuts from complementary slopes
+            if new_length > best_stock + _TOLERANCE_MM:
+                # Part doesn't fit - skip it and continue checking smaller parts
+                # CRITICAL: Don't break! Continue trying smaller parts to maximize bar utilization
+                part_id = get_part_display_id(part)
+                nesting_log("[NESTING] Part %s (%.1fmm) + kerf (%.1fmm) doesn't fit: %.1fmm + %.1fmm + %.1fmm = %.1fmm > %.0fmm (tolerance: %.1fmm)", part_id, part_length, kerf_mm, current_length, part_length, kerf_mm, new_length, best_stock, _TOLERANCE_MM)
+                continue  # Try next part instead of breaking
+            
+            # Part fits - add it
+            # Check if part has complementary_pair flag from pre-processing
+            comp_pair_flag = part.complementary_pair
+            
+            pattern_parts.append(PatternPart(
+                part=part,
+                cut_position=cut_position,
+                length=part_length,  # Store full part length
+                start_angle=curr_start_angle,
+                end_angle=curr_end_angle,
+                start_has_slope=curr_start_has_slope,
+                end_has_slope=curr_end_has_slope,
+                has_slope=curr_start_has_slope or curr_end_has_slope,
+                complementary_pair=comp_pair_flag
+            ))
+            # CRITICAL: Add kerf to current_length if boundaries can't be shared
+            current_length = new_length  # Includes part_length + kerf_mm
+            total_parts_length += part_length  # Track individual part length (without kerf)
+            longest_part_length = max(longest_part_length, part_length)
+            cut_position += part_length + kerf_mm  # Position includes kerf
+            parts_to_remove.append(part)
+            parts_to_remove_ids.add(id(part))
+            
+            part_id = get_part_display_id(part)
+            nesting_log("[NESTING] Added part %s (%.1fmm) + kerf (%.1fmm) to pattern - current_length: %.1fmm / %.0fmm, parts in pattern: %s", part_id, part_length, kerf_mm, current_length, best_stock, len(pattern_parts))
+            
+            # FINAL CHECK: Ensure current_length hasn't exceeded stock (safety check)
+            # Use tolerance to allow exact fits (when current_length == best_stock)
+            if current_length > best_stock + _TOLERANCE_MM:
+                nesting_log("[NESTING] ERROR: After adding part %s, current_length %.1fmm exceeds stock %.0fmm - removing part", part_id, current_length, best_stock)
+                # Remove the part we just added (always the last entry of both lists)
+                pattern_parts.pop()
+                current_length -= (part_length + kerf_mm)
+                total_parts_length -= part_length
+                parts_to_remove.pop()
+                parts_to_remove_ids.discard(id(part))
+                break  # Stop adding more parts
+            elif abs(current_length - best_stock) <= _TOLERANCE_MM:
+                # Bar is exactly full (within tolerance) - stop adding more parts but keep this part
+                nesting_log("[NESTING] Bar is exactly full after adding part %s - current_length: %.1fmm == %.0fmm (within tolerance), stopping part filling", part_id, current_length, best_stock)
+                break  # Stop adding more parts, but keep the part we just added
+        
+        # Remove used parts in a single pass (id() lookups instead of list scans with dict equality)
+        if parts_to_remove_ids:
+            remaining_parts = [p for p in remaining_parts if id(p) not in parts_to_remove_ids]
+        
+        if not parts_to_remove:
+            # No parts were processed - this shouldn't happen if stock selection is correct
+            # Check if there are parts that don't fit
+            if remaining_parts:
+                first_part = remaining_parts[0]
+                if first_part.length > best_stock:
+                    nesting_log("[NESTING] ERROR: Cannot process part %s (length: %.1fmm) - exceeds stock %.0fmm", first_part.product_id, first_part.length, best_stock)
+                    # Remove it to prevent infinite loop
+                    remaining_parts.remove(first_part)
+                else:
+                    nesting_log("[NESTING] WARNING: No parts processed in iteration despite parts fitting in stock")
+                    # Break to prevent infinite loop
+                    break
+            else:
+                # No parts remaining - break normally
+                break
+        
+        # CRITICAL: Validate pattern before creating it
+        # 1. Must have at least one part
+        # 2. All parts must fit in stock length (individually)
+        # 3. TOTAL length of all parts must not exceed stock length
+        if not pattern_parts:
+            nesting_log("[NESTING] WARNING: Pattern has no parts - skipping pattern creation")
+            continue
+        
+        # Validate all parts fit in stock (individually)
+        # The running longest_part_length makes this O(1) unless some part is actually too long;
+        # part details are only read in the rejection branches below
+        invalid_parts = []
+        if longest_part_length > best_stock:
+            invalid_parts = [pp for pp in pattern_parts if pp.length > best_stock]
+        
+        # CRITICAL: Validate TOTAL length doesn't exceed stock
+        # Check if pattern has shared boundaries (complementary pairs)
+        # If current_length < total_parts_length, there are shared boundaries that saved material
+        has_shared_boundaries = current_length < total_parts_length - _TOLERANCE_MM
+        
+        # PRIMARY VALIDATION: Always check current_length (actual material used)
+        # This is the correct check for patterns with shared boundaries
+        if current_length > best_stock + _TOLERANCE_MM:
+            nesting_log("[NESTING] ERROR: Pattern total length %.1fmm exceeds stock %.0fmm", current_length, best_stock)
+            # List all parts in the pattern
+            if ENABLE_NESTING_LOGS:
+                nesting_log("[NESTING]   Parts in pattern: %s", ', '.join(f"{get_part_display_id(pp.part)} ({pp.length:.1f}mm)" for pp in pattern_parts))
+            nesting_log("[NESTING]   Total current_length: %.1fmm", current_length)
+            nesting_log("[NESTING]   Total parts_length: %.1fmm", total_parts_length)
+            nesting_log("[NESTING]   Stock: %.0fmm", best_stock)
+            nesting_log("[NESTING]   Difference: %.1fmm", current_length - best_stock)
+            nesting_log("[NESTING] REJECTING this pattern - total length exceeds stock")
+            
+            # Add all parts to rejected list
+            # (they were already taken out of remaining_parts with parts_to_remove above)
+            rejected_parts.extend(rejected_pattern_entries(
+                pattern_parts, best_stock,
+                f"Pattern total length ({current_length:.1f}mm) exceeds stock ({best_stock:.0f}mm)"
+            ))
+            continue  # Skip creating this pattern
+        
+        # SECONDARY VALIDATION: Check total_parts_length only if there are NO shared boundaries
+        # This catches the bug where parts are incorrectly combined without shared boundaries
+        # If has_shared_boundaries is True, we already validated current_length above, so skip this check
+        if not has_shared_boundaries and total_parts_length > best_stock + _TOLERANCE_MM:
+            nesting_log("[NESTING] ERROR: Pattern total parts length %.1fmm exceeds stock %.0fmm (no shared boundaries to reduce material)", total_parts_length, best_stock)
+            if ENABLE_NESTING_LOGS:
+                nesting_log("[NESTING]   Parts in pattern: %s", ', '.join(f"{get_part_display_id(pp.part)} ({pp.length:.1f}mm)" for pp in pattern_parts))
+            nesting_log("[NESTING]   Total parts_length (sum of all individual parts): %.1fmm", total_parts_length)
+            nesting_log("[NESTING]   Current_length (no shared savings): %.1fmm", current_length)
+            nesting_log("[NESTING]   Stock: %.0fmm", best_stock)
+            nesting_log("[NESTING]   Difference: %.1fmm", total_parts_length - best_stock)
+            nesting_log("[NESTING] REJECTING this pattern - total parts length exceeds stock (no shared boundaries)")
+            
+            # Add all parts to rejected list
+            # (they were already taken out of remaining_parts with parts_to_remove above)
+            rejected_parts.extend(rejected_pattern_entries(
+                pattern_parts, best_stock,
+                f"Pattern total parts length ({total_parts_length:.1f}mm) exceeds stock ({best_stock:.0f}mm) - no shared boundaries"
+            ))
+            continue  # Skip creating this pattern
+        
+        # ADDITIONAL VALIDATION: Check if current_length is unreasonably larger than total_parts_length
+        # This catches calculation errors where kerf is added incorrectly
+        max_expected_kerf = (len(pattern_parts) - 1) * _STEEL_KERF_MM  # Maximum kerf if NO boundaries can share
+        if current_length > total_parts_length + max_expected_kerf + 10.0:  # Allow 10mm tolerance
+            nesting_log("[NESTING] ERROR: current_length (%.1fmm) is unreasonably larger than total_parts_length (%.1fmm)", current_length, total_parts_length)
+            nesting_log("[NESTING]   - Expected max difference (all kerf, no sharing): %.1fmm", max_expected_kerf)
+            nesting_log("[NESTING]   - Actual difference: %.1fmm", current_length - total_parts_length)
+            nesting_log("[NESTING]   - This suggests a calculation error - rejecting pattern")
+            
+            # Add all parts to rejected list
+            # (they were already taken out of remaining_parts with parts_to_remove above)
+            rejected_parts.extend(rejected_pattern_entries(
+                pattern_parts, best_stock,
+                f"Pattern calculation error: current_length ({current_length:.1f}mm) unreasonably exceeds total_parts_length ({total_parts_length:.1f}mm)"
+            ))
+            continue  # Skip creating this pattern
+        
+        if invalid_parts:
+            nesting_log("[NESTING] ERROR: Pattern contains %s parts that exceed stock length %.0fmm:", len(invalid_parts), best_stock)
+            for pp in invalid_parts:
+                nesting_log("[NESTING]   - Part %s: %.1fmm > %.0fmm", get_part_display_id(pp.part), pp.length, best_stock)
+                # Add to rejected parts list
+                rejected_parts.extend(rejected_pattern_entries(
+                    [pp], best_stock,
+                    f"Part length ({pp.length:.1f}mm) exceeds selected stock ({best_stock:.0f}mm)"
+                ))
+            nesting_log("[NESTING] REJECTING this pattern - parts exceed stock length")
+            # The pattern's parts were already taken out of remaining_parts with parts_to_remove above
+            continue  # Skip creating this pattern
+        
+        # Calculate waste exactly: stock length minus actual material used (accounting for shared cuts)
+        # Use current_length (actual material used with shared cut overlap subtracted) for waste calculation
+        # When parts have complementary slopes, the shared cut overlap reduces the actual material needed
+        # If actual material used equals stock length, waste is 0
+        # No tolerances - calculate the exact unused material in the stock bar
+        actual_material_used = min(current_length, best_stock)  # Cap at stock length for oversized parts
+        waste = best_stock - actual_material_used  # Exact calculation: stock minus actual material used (with shared cuts)
+        waste_percentage = (waste / best_stock * 100) if best_stock > 0 else 0
+        
+        nesting_log("[NESTING] Pattern waste calculation: best_stock=%.1fmm, current_length=%.1fmm, actual_material_used=%.1fmm, waste=%.1fmm (%.2f%%)", best_stock, current_length, actual_material_used, waste, waste_percentage)
+        
+        # DEBUG: Log detailed pattern information to diagnose issues
+        nesting_log("[NESTING] Pattern validation details:")
+        nesting_log("[NESTING]   - Number of parts: %s", len(pattern_parts))
+        nesting_log("[NESTING]   - Total parts_length (sum of individual parts): %.1fmm", total_parts_length)
+        nesting_log("[NESTING]   - Current_length (with kerf/shared savings): %.1fmm", current_length)
+        nesting_log("[NESTING]   - Difference: %.1fmm", current_length - total_parts_length)
+        nesting_log("[NESTING]   - Stock length: %.1fmm", best_stock)
+        if current_length > total_parts_length:
+            expected_kerf = (len(pattern_parts) - 1) * _STEEL_KERF_MM  # Maximum kerf if no boundaries can share
+            nesting_log("[NESTING]   - WARNING: current_length > total_parts_length by %.1fmm", current_length - total_parts_length)
+            nesting_log("[NESTING]   - Expected max kerf (if no sharing): %.1fmm", expected_kerf)
+            nesting_log("[NESTING]   - Actual difference: %.1fmm", current_length - total_parts_length)
+            if (current_length - total_parts_length) > expected_kerf + 10.0:  # Allow 10mm tolerance
+                nesting_log("[NESTING]   - ERROR: Difference is too large - possible calculation error!")
+        
+        cutting_patterns.append({
+            "stock_length": best_stock,
+            "parts": [pp.to_dict() for pp in pattern_parts],
+            "waste": waste,
+            "waste_percentage": waste_percentage
+        })
+        
+        # Track stock usage
+        stock_key = str(best_stock)
+        stock_lengths_used[stock_key] = stock_lengths_used.get(stock_key, 0) + 1
+        total_waste_profile += waste
+        total_stock_length_for_profile += best_stock
+        total_parts_in_patterns += len(pattern_parts)
+    
+    # Calculate totals for this profile
+    # Count actual parts in cutting patterns (not original parts list, as some may be paired);
+    # accumulated as each pattern is appended, so no extra pass over cutting_patterns
+    total_parts_profile = total_parts_in_patterns if total_parts_in_patterns > 0 else len(parts)
+    total_length_profile = sum(p.length for p in parts)
+    total_waste_percentage_profile = (total_waste_profile / total_stock_length_for_profile * 100) if total_stock_length_for_profile > 0 else 0
+    
+    profile_nesting = {
+        "profile_name": profile_name,
+        "total_parts": total_parts_profile,
+        "total_length": total_length_profile,
+        "stock_lengths_used": stock_lengths_used,
+        "cutting_patterns": cutting_patterns,
+        "total_waste": total_waste_profile,
+        "total_waste_percentage": total_waste_percentage_profile,
+        "rejected_parts": rejected_parts  # Parts that cannot be nested (exceed stock length)
+    }
+    return profile_nesting, total_stock_length_for_profile
+
+
+@app.get("/api/nesting/{filename}")
+async def generate_nesting(filename: str, stock_lengths: str, profiles: str, use_column_generation: bool = False):
+    """Generate nesting optimization report for selected profiles with slope-aware cutting.
+    
+    Args:
+        filename: IFC filename
+        stock_lengths: Comma-separated list of stock lengths in mm (e.g., "6000,12000")
+        profiles: Comma-separated list of profile names to nest (e.g., "IPE200,HEA300")
+        use_column_generation: Nest profiles whose parts all have straight cuts with the
+            cutting stock solver instead of the greedy - column generation (requires SciPy),
+            with bin completion for profiles of up to 60 parts
+    """
+    import sys
+    
+    # Force output to be flushed immediately
+    sys.stdout.flush()
+    sys.stderr.flush()
+    
+    nesting_log("=" * 60, flush=True)
+    nesting_log("[NESTING] ===== NESTING REQUEST RECEIVED =====", flush=True)
+    nesting_log(f"[NESTING] Filename: {filename}", flush=True)
+    nesting_log(f"[NESTING] Stock lengths: {stock_lengths}", flush=True)
+    nesting_log(f"[NESTING] Profiles: {profiles}", flush=True)
+    nesting_log("=" * 60, flush=True)
+    
+    try:
+        decoded_filename = unquote(filename)
+        file_path = IFC_DIR / decoded_filename
+        
+        if not file_path.exists():
+            raise HTTPException(status_code=404, detail="IFC file not found")
+        nesting_log(f"[NESTING] Starting slope-aware nesting generation for {filename}")
+        nesting_log(f"[NESTING] Stock lengths: {stock_lengths}")
+        nesting_log(f"[NESTING] Selected profiles: {profiles}")
+        
+        # Parse stock lengths and sort in ascending order (shortest first)
+        # This ensures we prioritize using shorter bars (6m) before longer ones (12m) to minimize waste
+        stock_lengths_list = sorted([float(x.strip()) for x in stock_lengths.split(',') if x.strip()], reverse=False)
+        if not stock_lengths_list:
+            raise HTTPException(status_code=400, detail="At least one stock length is required")
+        
+        # Parse selected profiles and normalize them (remove element_type prefix if present)
+        # This merges parts with same profile name regardless of type (beam/column/member)
+        def extract_base_profile_name(profile_key: str) -> str:
+            """Extract base profile name, removing element_type prefix if present.
+            
+            Examples:
+            - "beam_IPE100" -> "IPE100"
+            - "column_IPE100" -> "IPE100"
+            - "IfcBeam_IPE100" -> "IPE100"
+            - "IPE100" -> "IPE100"
+            """
+            if not profile_key:
+                return profile_key
+            
+            # Check if it has a prefix like "beam_", "column_", "member_"
+            for prefix in ["beam_", "column_", "member_"]:
+                if profile_key.startswith(prefix):
+                    return profile_key[len(prefix):]
+            
+            # Also check for "IfcBeam_", "IfcColumn_", "IfcMember_" prefixes
+            for prefix in ["IfcBeam_", "IfcColumn_", "IfcMember_"]:
+                if profile_key.startswith(prefix):
+                    return profile_key[len(prefix):]
+            
+            return profile_key
+        
+        raw_selected_profiles = [x.strip() for x in profiles.split(',') if x.strip()]
+        if not raw_selected_profiles:
+            raise HTTPException(status_code=400, detail="At least one profile is required")
+        
+        # Normalize profile names and create a mapping from base name to all variants
+        base_profile_names = set()
+        profile_name_mapping = {}  # base_name -> list of original names
+        
+        for raw_profile in raw_selected_profiles:
+            base_name = extract_base_profile_name(raw_profile)
+            base_profile_names.add(base_name)
+            if base_name not in profile_name_mapping:
+                profile_name_mapping[base_name] = []
+            profile_name_mapping[base_name].append(raw_profile)
+        
+        selected_profiles = list(base_profile_names)
+        
+        nesting_log(f"[NESTING] Parsed stock lengths: {stock_lengths_list}")
+        nesting_log(f"[NESTING] Raw selected profiles: {raw_selected_profiles}")
+        nesting_log(f"[NESTING] Normalized base profile names: {selected_profiles}")
+        nesting_log(f"[NESTING] Profile name mapping: {profile_name_mapping}")
+        
+        # Same file content + same settings = same report, so serve it from the on-disk cache
+        cache_path = None
+        if ENABLE_NESTING_CACHE:
+            cache_path = nesting_cache_path(file_path, {
+                "version": NESTING_CACHE_VERSION,
+                "filename": decoded_filename,
+                "stock_lengths": stock_lengths_list,
+                "profiles": sorted(selected_profiles),
+                "use_column_generation": use_column_generation,
+            })
+            if cache_path.exists():
+                try:
+                    cached_body = cache_path.read_bytes()
+                except OSError:
+                    cached_body = None
+                if cached_body:
+                    try:
+                        os.utime(cache_path)  # Mark as recently used for prune_nesting_cache
+                    except OSError:
+                        pass
+                    nesting_log(f"[NESTING] Returning cached nesting report {cache_path.name}")
+                    return Response(content=cached_body, media_type="application/json")
+        
+        # Open IFC file - resolve path to absolute for Windows compatibility
+        resolved_path = file_path.resolve()
+        ifc_file = ifcopenshell.open(str(resolved_path))
+        nesting_log(f"[NESTING] Opened IFC file: {decoded_filename}")
+        
+        # Import cut piece extractor for slope detection
+        extractor = None
+        try:
+            nesting_log(f"[NESTING] Attempting to import CutPieceExtractor...")
+            from cut_piece_extractor import CutPieceExtractor
+            nesting_log(f"[NESTING] CutPieceExtractor imported successfully")
+            extractor = CutPieceExtractor(ifc_file)
             nesting_log(f"[NESTING] CutPieceExtractor initialized successfully for slope-aware nesting")
         except ImportError as e:
             nesting_log(f"[NESTING] Warning: cut_piece_extractor not available (ImportError: {e}), falling back to basic nesting")
-            import traceback
             traceback.print_exc()
             extractor = None
         except Exception as e:
             nesting_log(f"[NESTING] Warning: Could not initialize CutPieceExtractor: {e}, falling back to basic nesting")
-            import traceback
             traceback.print_exc()
             extractor = None
         
         # Extract parts for selected profiles with slope information
-        parts_by_profile: Dict[str, List[Dict[str, Any]]] = {}
+        parts_by_profile: Dict[str, List[NestingPart]] = {}
         
         for element in ifc_file.by_type("IfcProduct"):
             element_type = element.is_a()
@@ -2464,7 +4467,7 @@ async def generate_nesting(filename: str, stock_lengths: str, profiles: str):
             
             # Debug logging for first few elements
             if len(parts_by_profile) < 3 or base_profile_name in selected_profiles:
-                nesting_log(f"[NESTING] Element {element.id()}: type={element_type}, profile_from_element={profile_name_from_element}, base_profile={base_profile_name}, in_selected={base_profile_name in selected_profiles}")
+                nesting_log("[NESTING] Element %s: type=%s, profile_from_element=%s, base_profile=%s, in_selected=%s", element.id(), element_type, profile_name_from_element, base_profile_name, base_profile_name in selected_profiles)
             
             # Skip if base profile name is not in selected profiles
             if base_profile_name not in selected_profiles:
@@ -2482,12 +4485,12 @@ async def generate_nesting(filename: str, stock_lengths: str, profiles: str):
             
             if extractor:
                 try:
-                    nesting_log(f"[NESTING] Attempting to extract cut piece for element {element.id()}")
+                    nesting_log("[NESTING] Attempting to extract cut piece for element %s", element.id())
                     cut_piece = extractor.extract_cut_piece(element)
                     if cut_piece:
-                        nesting_log(f"[NESTING] Successfully extracted cut piece for element {element.id()}")
+                        nesting_log("[NESTING] Successfully extracted cut piece for element %s", element.id())
                         length_mm = cut_piece.length
-                        nesting_log(f"[NESTING]   Length: {length_mm:.1f}mm")
+                        nesting_log("[NESTING]   Length: %.1fmm", length_mm)
                         
                         if cut_piece.end_cuts["start"]:
                             start_angle = cut_piece.end_cuts["start"].angle_deg
@@ -2515,16 +4518,16 @@ async def generate_nesting(filename: str, stock_lengths: str, profiles: str):
                             
                             # Log if slope was rejected due to low confidence
                             if deviation_from_straight > 1.0 and start_confidence <= 0.3:
-                                nesting_log(f"[NESTING]   START slope rejected: deviation={deviation_from_straight:.2f}° but confidence={start_confidence:.2f} (< 0.3)")
+                                nesting_log("[NESTING]   START slope rejected: deviation=%.2f° but confidence=%.2f (< 0.3)", deviation_from_straight, start_confidence)
                             
                             # Debug for b32/b30
                             part_ref = element.Name if hasattr(element, 'Name') else str(element.id())
                             if 'b32' in str(part_ref).lower() or 'b30' in str(part_ref).lower():
-                                nesting_log(f"[B32-B30-DEBUG] {part_ref} START: angle={start_angle:.2f}°, deviation={deviation_from_straight:.2f}°, confidence={start_confidence:.2f}, has_slope={start_has_slope}, length={length_mm:.1f}mm")
+                                nesting_log("[B32-B30-DEBUG] %s START: angle=%.2f°, deviation=%.2f°, confidence=%.2f, has_slope=%s, length=%.1fmm", part_ref, start_angle, deviation_from_straight, start_confidence, start_has_slope, length_mm)
                             
-                            nesting_log(f"[NESTING]   Start cut: {start_angle:.2f}° (deviation from straight: {deviation_from_straight:.2f}°, has_slope={start_has_slope}, confidence={start_confidence:.2f})")
+                            nesting_log("[NESTING]   Start cut: %.2f° (deviation from straight: %.2f°, has_slope=%s, confidence=%.2f)", start_angle, deviation_from_straight, start_has_slope, start_confidence)
                         else:
-                            nesting_log(f"[NESTING]   Start cut: None")
+                            nesting_log("[NESTING]   Start cut: None")
                         
                         if cut_piece.end_cuts["end"]:
                             end_angle = cut_piece.end_cuts["end"].angle_deg
@@ -2552,7 +4555,7 @@ async def generate_nesting(filename: str, stock_lengths: str, profiles: str):
                             
                             # Log if slope was rejected due to low confidence
                             if deviation_from_straight > 1.0 and end_confidence <= 0.3:
-                                nesting_log(f"[NESTING]   END slope rejected: deviation={deviation_from_straight:.2f}° but confidence={end_confidence:.2f} (< 0.3)")
+                                nesting_log("[NESTING]   END slope rejected: deviation=%.2f° but confidence=%.2f (< 0.3)", deviation_from_straight, end_confidence)
                             
                             # Special case: Short parts with BOTH ends having similar low-confidence angles
                             # This often indicates potential complementary pairing
@@ -2568,35 +4571,34 @@ async def generate_nesting(filename: str, stock_lengths: str, profiles: str):
                                     # Enable only the LARGER angle as the slope (the other is likely an artifact or shared boundary)
                                     if start_deviation_value > end_deviation_value:
                                         start_has_slope = True
-                                        nesting_log(f"[NESTING]   Short part ({length_mm:.1f}mm) with similar angles - using START ({start_deviation_value:.1f}°) over END ({end_deviation_value:.1f}°)")
+                                        nesting_log("[NESTING]   Short part (%.1fmm) with similar angles - using START (%.1f°) over END (%.1f°)", length_mm, start_deviation_value, end_deviation_value)
                                     else:
                                         end_has_slope = True
-                                        nesting_log(f"[NESTING]   Short part ({length_mm:.1f}mm) with similar angles - using END ({end_deviation_value:.1f}°) over START ({start_deviation_value:.1f}°)")
+                                        nesting_log("[NESTING]   Short part (%.1fmm) with similar angles - using END (%.1f°) over START (%.1f°)", length_mm, end_deviation_value, start_deviation_value)
                                 elif start_deviation_value > end_deviation_value:
                                     # Start has larger angle - make it the slope
                                     start_has_slope = True
-                                    nesting_log(f"[NESTING]   Short part: Using START as slope ({start_deviation_value:.1f}° > {end_deviation_value:.1f}°)")
+                                    nesting_log("[NESTING]   Short part: Using START as slope (%.1f° > %.1f°)", start_deviation_value, end_deviation_value)
                                 else:
                                     # End has larger angle - make it the slope  
                                     end_has_slope = True
-                                    nesting_log(f"[NESTING]   Short part: Using END as slope ({end_deviation_value:.1f}° > {start_deviation_value:.1f}°)")
+                                    nesting_log("[NESTING]   Short part: Using END as slope (%.1f° > %.1f°)", end_deviation_value, start_deviation_value)
                             
                             # Debug for b32/b30
                             part_ref = element.Name if hasattr(element, 'Name') else str(element.id())
                             if 'b32' in str(part_ref).lower() or 'b30' in str(part_ref).lower():
-                                nesting_log(f"[B32-B30-DEBUG] {part_ref} END: angle={end_angle:.2f}°, deviation={deviation_from_straight:.2f}°, confidence={end_confidence:.2f}, has_slope={end_has_slope}, length={length_mm:.1f}mm")
+                                nesting_log("[B32-B30-DEBUG] %s END: angle=%.2f°, deviation=%.2f°, confidence=%.2f, has_slope=%s, length=%.1fmm", part_ref, end_angle, deviation_from_straight, end_confidence, end_has_slope, length_mm)
                             
-                            nesting_log(f"[NESTING]   End cut: {end_angle:.2f}° (deviation from straight: {deviation_from_straight:.2f}°, has_slope={end_has_slope}, confidence={end_confidence:.2f})")
+                            nesting_log("[NESTING]   End cut: %.2f° (deviation from straight: %.2f°, has_slope=%s, confidence=%.2f)", end_angle, deviation_from_straight, end_has_slope, end_confidence)
                         else:
-                            nesting_log(f"[NESTING]   End cut: None")
+                            nesting_log("[NESTING]   End cut: None")
                     else:
-                        nesting_log(f"[NESTING] Cut piece extraction returned None for element {element.id()}")
+                        nesting_log("[NESTING] Cut piece extraction returned None for element %s", element.id())
                 except Exception as e:
-                    nesting_log(f"[NESTING] Error extracting cut piece for element {element.id()}: {e}")
-                    import traceback
+                    nesting_log("[NESTING] Error extracting cut piece for element %s: %s", element.id(), e)
                     traceback.print_exc()
             else:
-                nesting_log(f"[NESTING] No extractor available for element {element.id()}")
+                nesting_log("[NESTING] No extractor available for element %s", element.id())
             
             # Fallback: get length from geometry or properties if cut_piece extraction failed
             if length_mm == 0:
@@ -2620,14 +4622,9 @@ async def generate_nesting(filename: str, stock_lengths: str, profiles: str):
                     # If still no length, try to calculate from geometry
                     if length_mm == 0 and HAS_GEOM:
                         try:
-                            try:
-                                import numpy as np
-                                has_numpy = True
-                            except ImportError:
-                                has_numpy = False
-                                nesting_log(f"[NESTING] NumPy not available, skipping geometry-based length calculation")
-                            
-                            if has_numpy:
+                            if not HAS_NUMPY:
+                                nesting_log("[NESTING] NumPy not available, skipping geometry-based length calculation")
+                            else:
                                 settings = ifcopenshell.geom.settings()
                                 settings.set(settings.USE_WORLD_COORDS, True)
                                 shape = ifcopenshell.geom.create_shape(settings, element)
@@ -2643,7 +4640,7 @@ async def generate_nesting(filename: str, stock_lengths: str, profiles: str):
                                         # For linear elements, the length is typically the largest dimension
                                         length_mm = float(np.max(dimensions)) * 1000.0  # Convert to mm
                         except Exception as geom_error:
-                            nesting_log(f"[NESTING] Geometry extraction failed for element {element.id()}: {geom_error}")
+                            nesting_log("[NESTING] Geometry extraction failed for element %s: %s", element.id(), geom_error)
                     
                     # If still no length, use a default estimate based on weight
                     if length_mm == 0:
@@ -2656,7 +4653,7 @@ async def generate_nesting(filename: str, stock_lengths: str, profiles: str):
                             length_mm = 1000.0  # Default 1m
                     
                 except Exception as e:
-                    nesting_log(f"[NESTING] Error getting length for element {element.id()}: {e}")
+                    nesting_log("[NESTING] Error getting length for element %s: %s", element.id(), e)
                     length_mm = 1000.0  # Default fallback
             
             # Get assembly mark
@@ -2669,1669 +4666,122 @@ async def generate_nesting(filename: str, stock_lengths: str, profiles: str):
             elif hasattr(element, 'Name') and element.Name:
                 element_name = str(element.Name)
             
-            # Get Reference from property sets (this is what shows in the right-click panel)
-            reference = None
-            try:
-                psets = ifcopenshell.util.element.get_psets(element)
-                # Search through all property sets for "Reference" (case-insensitive)
-                for pset_name, props in psets.items():
-                    props_dict = dict(props)
-                    # Try exact match first
-                    if 'Reference' in props_dict:
-                        ref_value = props_dict['Reference']
-                        if ref_value and str(ref_value).strip() and str(ref_value).upper() not in ['NONE', 'NULL', 'N/A', '']:
-                            reference = str(ref_value).strip()
-                            break
-                    # Try case-insensitive match
-                    for key, value in props_dict.items():
-                        if key.lower() == 'reference':
-                            if value and str(value).strip() and str(value).upper() not in ['NONE', 'NULL', 'N/A', '']:
-                                reference = str(value).strip()
-                                break
-                    if reference:
-                        break
-            except Exception as e:
-                nesting_log(f"[NESTING] Error getting Reference from property sets for element {element.id()}: {e}")
-                pass
-            
-            # Store part with slope information
-            # Use base_profile_name for grouping (merges beam/column/member with same profile)
-            if base_profile_name not in parts_by_profile:
-                parts_by_profile[base_profile_name] = []
-                nesting_log(f"[NESTING] Created new profile group: {base_profile_name}")
-            
-            part_data = {
-                "product_id": element.id(),
-                "profile_name": base_profile_name,  # Use base name for nesting grouping
-                "original_profile_name": profile_name_from_element,  # Keep original from element for reference
-                "element_type": element_type,
-                "length": length_mm,
-                "assembly_mark": assembly_mark if assembly_mark != "N/A" else None,
-                "element_name": element_name,
-                "reference": reference,
-                "start_angle": float(start_angle) if start_angle is not None else None,
-                "end_angle": float(end_angle) if end_angle is not None else None,
-                "start_has_slope": bool(start_has_slope),
-                "end_has_slope": bool(end_has_slope),
-                "start_confidence": float(start_confidence),
-                "end_confidence": float(end_confidence)
-                # Note: cut_piece.to_dict() removed to avoid JSON serialization issues with numpy arrays
-            }
-            
-            parts_by_profile[base_profile_name].append(part_data)
-        
-        # Log parts found and show merging summary
-        nesting_log(f"[NESTING] Found parts by profile (after merging by base profile name):")
-        for prof_name, prof_parts in parts_by_profile.items():
-            # Count element types in this merged group
-            element_types = {}
-            for part in prof_parts:
-                elem_type = part.get("element_type", "Unknown")
-                element_types[elem_type] = element_types.get(elem_type, 0) + 1
-            
-            type_summary = ", ".join([f"{k}: {v}" for k, v in element_types.items()])
-            nesting_log(f"[NESTING]   {prof_name}: {len(prof_parts)} parts total (merged from: {type_summary})")
-        
-        # Check if we found any parts
-        if not parts_by_profile:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"No parts found for selected profiles: {selected_profiles}. Make sure the profiles exist in the IFC file."
-            )
-        
-        # Generate nesting for each profile
-        profile_nestings = []
-        total_stock_bars = 0
-        total_waste = 0.0
-        total_parts = 0
-        
-        for profile_name, parts in parts_by_profile.items():
-            if not parts:
-                nesting_log(f"[NESTING] Warning: No parts found for profile {profile_name}")
-                continue
-            
-            nesting_log(f"[NESTING] Processing {len(parts)} parts for profile {profile_name}")
-            
-            # Separate parts by slope characteristics
-            parts_with_slopes = [p for p in parts if p.get("start_has_slope") or p.get("end_has_slope")]
-            parts_without_slopes = [p for p in parts if not p.get("start_has_slope") and not p.get("end_has_slope")]
-            
-            nesting_log(f"[NESTING]   Parts with slopes: {len(parts_with_slopes)}")
-            nesting_log(f"[NESTING]   Parts without slopes: {len(parts_without_slopes)}")
-            
-            # Debug: Log slope information for each part (especially for IPE600)
-            if profile_name == "IPE600":
-                nesting_log(f"[NESTING]   IPE600 parts details:")
-                for p in parts:
-                    nesting_log(f"[NESTING]     Part {p.get('product_id')}: length={p.get('length'):.1f}mm, "
-                          f"start_slope={p.get('start_has_slope')} ({p.get('start_angle')}°), "
-                          f"end_slope={p.get('end_has_slope')} ({p.get('end_angle')}°)")
-            
-            # Bin packing algorithm with slope-aware pairing
-            cutting_patterns = []
-            stock_lengths_used: Dict[float, int] = {}
-            rejected_parts = []  # Track parts that cannot be nested (exceed stock length)
-            
-            remaining_parts = parts.copy()
-            max_iterations = min(len(parts) * 3, 500)  # Reduced safety limit to prevent infinite loops
-            iteration_count = 0
-            
-            while remaining_parts and iteration_count < max_iterations:
-                iteration_count += 1
-                nesting_log(f"[NESTING] === WHILE LOOP ITERATION {iteration_count} - {len(remaining_parts)} parts remaining ===")
-                
-                # Find best stock length for remaining parts
-                # Strategy: Use 6M bars only if all remaining parts that fit in 6M can be packed into 6M
-                # Otherwise, use 12M bars to minimize waste
-                best_stock = None
-                
-                # Find the largest remaining part
-                largest_part_length = max(p["length"] for p in remaining_parts)
-                
-                # Get the shortest and longest stock lengths
-                shortest_stock = min(stock_lengths_list)
-                longest_stock = max(stock_lengths_list)
-                
-                # First, check if any parts exceed the longest stock - these cannot be nested
-                if largest_part_length > longest_stock:
-                    # Parts exceed longest stock - cannot nest these parts
-                    oversized_parts = [p for p in remaining_parts if p["length"] > longest_stock]
-                    nesting_log(f"[NESTING] ERROR: {len(oversized_parts)} parts exceed longest stock ({longest_stock:.0f}mm):")
-                    for p in oversized_parts:
-                        product_id = p.get('product_id')
-                        part_id = product_id or p.get('reference') or p.get('element_name') or 'unknown'
-                        # Get reference and element_name, handling None and empty strings
-                        reference = p.get('reference')
-                        if reference and isinstance(reference, str) and not reference.strip():
-                            reference = None
-                        element_name = p.get('element_name')
-                        if element_name and isinstance(element_name, str) and not element_name.strip():
-                            element_name = None
-                        nesting_log(f"[NESTING]   - Part {part_id}: {p['length']:.1f}mm > {longest_stock:.0f}mm, reference={reference}, element_name={element_name}")
-                        # Add to rejected parts list
-                        rejected_parts.append({
-                            "product_id": product_id,
-                            "part_id": part_id,
-                            "reference": reference,
-                            "element_name": element_name,
-                            "length": p['length'],
-                            "stock_length": longest_stock,
-                            "reason": f"Part length ({p['length']:.1f}mm) exceeds longest available stock ({longest_stock:.0f}mm)"
-                        })
-                    # Remove oversized parts from remaining_parts to prevent infinite loop
-                    for p in oversized_parts:
-                        if p in remaining_parts:
-                            remaining_parts.remove(p)
-                    # If all parts were oversized, break
-                    if not remaining_parts:
-                        nesting_log(f"[NESTING] All parts exceed stock length. Cannot nest.")
-                        break
-                    # Recalculate largest part length after removing oversized parts
-                    if remaining_parts:
-                        largest_part_length = max(p["length"] for p in remaining_parts)
-                
-                # Find the best stock for remaining parts
-                # STRATEGY: Choose the stock length that minimizes waste
-                # CRITICAL: Check if parts fit TOGETHER in one bar, not just individually
-                nesting_log(f"[NESTING] === ENTERING NEW STOCK SELECTION LOGIC (Iteration {iteration_count}) ===")
-                best_stock = None
-                total_length_all_remaining = sum(p["length"] for p in remaining_parts)
-                
-                # Get stock lengths (assuming 6m and 12m are available)
-                shortest_stock = min(stock_lengths_list)
-                longest_stock = max(stock_lengths_list)
-                
-                # CRITICAL: Check if all parts fit TOGETHER in one bar (not just individually)
-                # Check if total length fits in longest stock (12m)
-                all_fit_together_in_longest = total_length_all_remaining <= longest_stock
-                
-                # Check if total length fits in shortest stock (6m)
-                all_fit_together_in_shortest = total_length_all_remaining <= shortest_stock
-                
-                # Also check if individual parts fit (for validation)
-                parts_fitting_longest = [p for p in remaining_parts if p["length"] <= longest_stock]
-                all_parts_individually_fit_longest = len(parts_fitting_longest) == len(remaining_parts)
-                
-                parts_fitting_shortest = [p for p in remaining_parts if p["length"] <= shortest_stock]
-                all_parts_individually_fit_shortest = len(parts_fitting_shortest) == len(remaining_parts)
-                
-                # DEBUG: Log the decision process
-                nesting_log(f"[NESTING] === STOCK SELECTION DEBUG ===")
-                part_details = []
-                for p in remaining_parts:
-                    part_id = p.get("product_id") or "unknown"
-                    part_details.append(f"{part_id}({p['length']:.0f}mm)")
-                nesting_log(f"[NESTING] Remaining parts ({len(remaining_parts)}): {', '.join(part_details)}")
-                nesting_log(f"[NESTING] Total length: {total_length_all_remaining:.1f}mm")
-                nesting_log(f"[NESTING] Shortest stock: {shortest_stock:.0f}mm, Longest stock: {longest_stock:.0f}mm")
-                nesting_log(f"[NESTING] All fit together in {longest_stock:.0f}mm: {all_fit_together_in_longest} ({total_length_all_remaining:.1f}mm <= {longest_stock:.0f}mm)")
-                nesting_log(f"[NESTING] All fit together in {shortest_stock:.0f}mm: {all_fit_together_in_shortest} ({total_length_all_remaining:.1f}mm <= {shortest_stock:.0f}mm)")
-                nesting_log(f"[NESTING] All parts individually fit in {longest_stock:.0f}mm: {all_parts_individually_fit_longest}")
-                nesting_log(f"[NESTING] All parts individually fit in {shortest_stock:.0f}mm: {all_parts_individually_fit_shortest}")
-                
-                # NEW: Evaluate all stock lengths where ALL remaining parts fit together
-                # STRATEGY: Prefer longer stocks first (12m before 6m)
-                # Only use shorter stocks when leftover parts are <= shorter stock length
-                candidate_stocks = []
-                for stock_len in sorted(stock_lengths_list, reverse=True):  # Check longer stocks first
-                    all_fit_together_in_stock = total_length_all_remaining <= stock_len
-                    all_parts_individually_fit_stock = all(
-                        p["length"] <= stock_len for p in remaining_parts
-                    )
-                    if all_fit_together_in_stock and all_parts_individually_fit_stock:
-                        waste = stock_len - total_length_all_remaining
-                        waste_pct = (waste / stock_len * 100) if stock_len > 0 else 0
-                        candidate_stocks.append((stock_len, waste, waste_pct))
-
-                if candidate_stocks:
-                    # NEW STRATEGY: Prefer longer stocks first (12m before 6m)
-                    # Sort by stock length descending (longer first), then by waste ascending
-                    # This ensures we fill longer bars first, only using shorter bars for leftovers
-                    candidate_stocks.sort(key=lambda x: (-x[0], x[1]))  # Negative for descending stock length
-                    best_stock, best_waste, best_waste_pct = candidate_stocks[0]
-                    
-                    # Check if we should use a shorter stock instead
-                    # Only use shorter stock if ALL remaining parts fit in shorter stock
-                    if len(candidate_stocks) > 1:
-                        longer_stock = candidate_stocks[0][0]  # Already sorted descending (longest first)
-                        shorter_stock = candidate_stocks[-1][0]  # Shortest candidate
-                        
-                        # If ALL remaining parts fit in shorter stock, use shorter stock to minimize waste
-                        if total_length_all_remaining <= shorter_stock:
-                            # All parts fit in shorter stock - use it to minimize waste
-                            best_stock = shorter_stock
-                            best_waste = shorter_stock - total_length_all_remaining
-                            best_waste_pct = (best_waste / shorter_stock * 100) if shorter_stock > 0 else 0
-                            print(
-                                f"[NESTING] DECISION: Using {best_stock:.0f}mm stock (shorter preferred for leftovers): "
-                                f"all {len(remaining_parts)} parts fit in shorter stock "
-                                f"(total: {total_length_all_remaining:.1f}mm, "
-                                f"waste: {best_waste:.1f}mm, {best_waste_pct:.1f}%)"
-                            )
-                        else:
-                            # Not all parts fit in shorter stock - use longer stock and fill it
-                            best_stock = longer_stock
-                            print(
-                                f"[NESTING] DECISION: Using {best_stock:.0f}mm stock (longer preferred): "
-                                f"all {len(remaining_parts)} parts fit together "
-                                f"(total: {total_length_all_remaining:.1f}mm, "
-                                f"waste: {best_waste:.1f}mm, {best_waste_pct:.1f}%)"
-                            )
-                    else:
-                        # Only one candidate stock
-                        print(
-                            f"[NESTING] DECISION: Using {best_stock:.0f}mm stock: "
-                            f"all {len(remaining_parts)} parts fit together "
-                            f"(total: {total_length_all_remaining:.1f}mm, "
-                            f"waste: {best_waste:.1f}mm, {best_waste_pct:.1f}%)"
-                        )
-                
-                # If no stock fits all parts together in one bar, choose the best stock for the largest part by minimum waste
-                if best_stock is None:
-                    nesting_log(f"[NESTING] WARNING: No stock selected yet - parts don't all fit together in one bar")
-                    nesting_log(f"[NESTING]   - all_fit_together_in_longest: {all_fit_together_in_longest}")
-                    nesting_log(f"[NESTING]   - all_parts_individually_fit_longest: {all_parts_individually_fit_longest}")
-                    nesting_log(f"[NESTING]   - all_fit_together_in_shortest: {all_fit_together_in_shortest}")
-                    nesting_log(f"[NESTING]   - all_parts_individually_fit_shortest: {all_parts_individually_fit_shortest}")
-                    
-                    candidate_for_largest = []
-                    for stock_len in sorted(stock_lengths_list, reverse=True):  # Check longer stocks first
-                        if largest_part_length <= stock_len:
-                            waste_for_largest = stock_len - largest_part_length
-                            waste_pct_for_largest = (waste_for_largest / stock_len * 100) if stock_len > 0 else 0
-                            candidate_for_largest.append((stock_len, waste_for_largest, waste_pct_for_largest))
-                    
-                    if candidate_for_largest:
-                        # Sort by stock length descending (longer first), then by waste ascending
-                        # This prefers longer stocks first, only using shorter stocks when needed
-                        candidate_for_largest.sort(key=lambda x: (-x[0], x[1]))  # Negative for descending stock length
-                        best_stock, best_waste_largest, best_waste_pct_largest = candidate_for_largest[0]
-                        print(
-                            f"[NESTING] FALLBACK: Using {best_stock:.0f}mm stock for largest part "
-                            f"({largest_part_length:.1f}mm, waste: {best_waste_largest:.1f}mm, "
-                            f"{best_waste_pct_largest:.1f}%) - longer stock preferred"
-                        )
-                    else:
-                        print(
-                            f"[NESTING] ERROR: No stock length fits the largest part ({largest_part_length:.1f}mm). "
-                            f"Available stocks: {stock_lengths_list}"
-                        )
-                        # Skip this iteration - parts will remain in remaining_parts
-                        break
-                
-                # Final safety check
-                if best_stock is None:
-                    nesting_log(f"[NESTING] ERROR: No stock length fits the largest part ({largest_part_length:.1f}mm). Available stocks: {stock_lengths_list}")
-                    # Skip this iteration - parts will remain in remaining_parts
-                    break
-                
-                # CRITICAL: Filter out parts that exceed best_stock BEFORE pairing
-                # This prevents oversized parts from being nested
-                valid_parts_for_this_stock = [p for p in remaining_parts if p["length"] <= best_stock]
-                if not valid_parts_for_this_stock:
-                    nesting_log(f"[NESTING] No parts fit in selected stock {best_stock:.0f}mm. Skipping this iteration.")
-                    break
-                
-                # Sort valid parts by length descending so longest pieces are placed first
-                valid_parts_for_this_stock.sort(key=lambda p: p["length"], reverse=True)
-                
-                # Create a pattern for this stock bar
-                pattern_parts = []
-                current_length = 0.0  # Tracks actual material used (accounts for shared cuts)
-                total_parts_length = 0.0  # Tracks sum of individual part lengths (for waste calculation)
-                cut_position = 0.0
-                parts_to_remove = []
-                tolerance_mm = 0.1  # Minimal tolerance for floating point errors only - define early for use in loops
-                pending_complementary_pair = None  # Track a complementary pair that needs to be paired in this pattern
-                stock_to_use = best_stock  # Initialize stock_to_use to best_stock (will be overridden for complementary pairs if needed)
-                
-                # Strategy: Try to pair parts with complementary slopes first
-                # When pairing, check ALL available stock lengths to find the best fit
-                # Then fill remaining space with other parts
-                
-                # PRE-STEP: Identify complementary chains (sequences of parts that can nest together)
-                # This algorithm builds chains by finding parts that can connect regardless of order
-                # This is for DISPLAY purposes only - actual pairing logic below remains unchanged
-                ANGLE_MATCH_TOL = 5.0
-                MIN_SLOPE_ANGLE = 1.0
-                
-                # Helper function to check if two slopes match (are complementary)
-                def slopes_match(angle1, angle2):
-                    if angle1 is None or angle2 is None:
-                        return False
-                    angle_diff = abs(abs(angle1) - abs(angle2))
-                    return angle_diff < ANGLE_MATCH_TOL and abs(angle1) > MIN_SLOPE_ANGLE
-                
-                # Build a graph of which parts can connect to which
-                # part_connections[i] = list of (j, connection_type) where j can connect to i
-                # connection_type: 'start-start', 'start-end', 'end-start', 'end-end'
-                part_connections = {i: [] for i in range(len(valid_parts_for_this_stock))}
-                
-                for i in range(len(valid_parts_for_this_stock)):
-                    part_i = valid_parts_for_this_stock[i]
-                    i_start_slope = part_i.get("start_has_slope", False)
-                    i_end_slope = part_i.get("end_has_slope", False)
-                    i_start_angle = part_i.get("start_angle")
-                    i_end_angle = part_i.get("end_angle")
-                    
-                    for j in range(i + 1, len(valid_parts_for_this_stock)):
-                        part_j = valid_parts_for_this_stock[j]
-                        j_start_slope = part_j.get("start_has_slope", False)
-                        j_end_slope = part_j.get("end_has_slope", False)
-                        j_start_angle = part_j.get("start_angle")
-                        j_end_angle = part_j.get("end_angle")
-                        
-                        # Check all possible connection types
-                        if i_start_slope and j_start_slope and slopes_match(i_start_angle, j_start_angle):
-                            part_connections[i].append((j, 'start-start'))
-                            part_connections[j].append((i, 'start-start'))
-                        if i_start_slope and j_end_slope and slopes_match(i_start_angle, j_end_angle):
-                            part_connections[i].append((j, 'start-end'))
-                            part_connections[j].append((i, 'end-start'))
-                        if i_end_slope and j_start_slope and slopes_match(i_end_angle, j_start_angle):
-                            part_connections[i].append((j, 'end-start'))
-                            part_connections[j].append((i, 'start-end'))
-                        if i_end_slope and j_end_slope and slopes_match(i_end_angle, j_end_angle):
-                            part_connections[i].append((j, 'end-end'))
-                            part_connections[j].append((i, 'end-end'))
-                
-                # Find the longest chains using greedy approach
-                # Start from parts with only one connection (chain ends) or any unvisited part
-                used_in_chains = set()
-                all_chains = []
-                
-                # Priority: start with parts that have only 1 connection (likely chain ends)
-                start_candidates = sorted(range(len(valid_parts_for_this_stock)),
-                                        key=lambda x: len(part_connections[x]))
-                
-                for start_idx in start_candidates:
-                    if start_idx in used_in_chains:
-                        continue
-                    if len(part_connections[start_idx]) == 0:
-                        continue
-                    
-                    # Build chain starting from this part
-                    chain = [start_idx]
-                    used_in_chains.add(start_idx)
-                    
-                    # Extend chain as long as possible
-                    while True:
-                        current_idx = chain[-1]
-                        # Find next part to add (not already in chain)
-                        next_candidates = [(idx, conn_type) for idx, conn_type in part_connections[current_idx]
-                                          if idx not in used_in_chains]
-                        
-                        if not next_candidates:
-                            break
-                        
-                        # Pick the first available connection
-                        next_idx, conn_type = next_candidates[0]
-                        chain.append(next_idx)
-                        used_in_chains.add(next_idx)
-                    
-                    if len(chain) >= 2:
-                        all_chains.append(chain)
-                        nesting_log(f"[NESTING] Found complementary chain of {len(chain)} parts: {chain}")
-                
-                # Mark all parts in chains with complementary_pair flag (for frontend display)
-                complementary_chain_parts = set()
-                for chain in all_chains:
-                    for idx in chain:
-                        complementary_chain_parts.add(idx)
-                        part = valid_parts_for_this_stock[idx]
-                        if "slope_info" not in part:
-                            part["slope_info"] = {}
-                        part["slope_info"]["complementary_pair"] = True
-                
-                # Step 1: Try to find complementary slope pairs (only from valid parts)
-                # For IPE600 and other large profiles, prioritize finding complementary pairs first
-                # First, find all complementary pairs and check which stock length they fit in
-                complementary_pairs = []
-                # Only consider valid parts that fit in best_stock
-                if len(valid_parts_for_this_stock) >= 2:
-                    for i, part1 in enumerate(valid_parts_for_this_stock):
-                        # CRITICAL CHECK: Ensure current_length hasn't already exceeded best_stock
-                        # This prevents trying to add more pairs when current_length is already too high
-                        if current_length > best_stock + tolerance_mm:
-                            nesting_log(f"[NESTING] BREAK OUTER LOOP: current_length {current_length:.1f}mm already exceeds stock {best_stock:.0f}mm - stopping complementary pair search")
-                            break  # Break out of outer loop to prevent adding more pairs
-                        
-                        if part1 in parts_to_remove:
-                            continue
-                        
-                        # Check if part1 has a slope (high confidence)
-                        part1_start_slope = part1.get("start_has_slope", False)
-                        part1_end_slope = part1.get("end_has_slope", False)
-                        part1_start_angle = part1.get("start_angle")
-                        part1_end_angle = part1.get("end_angle")
-                        part1_start_conf = part1.get("start_confidence", 0.0)
-                        part1_end_conf = part1.get("end_confidence", 0.0)
-                        
-                        # For complementary pairing, also check low-confidence slopes (confidence > 0.2, angle > 5°)
-                        # This catches real slopes on short parts that have low confidence but can still be paired
-                        part1_start_low_conf_slope = False
-                        part1_end_low_conf_slope = False
-                        if part1_start_angle is not None and not part1_start_slope:
-                            abs_angle = abs(part1_start_angle)
-                            # Calculate deviation same way as high-confidence detection
-                            if 60 <= abs_angle <= 120:
-                                deviation = abs(part1_start_angle - 90.0)
-                            else:
-                                deviation = abs_angle
-                            # Low confidence threshold: 0.2 < confidence <= 0.5, deviation > 5° (more conservative)
-                            if deviation > 5.0 and 0.2 < part1_start_conf <= 0.5:
-                                part1_start_low_conf_slope = True
-                        
-                        if part1_end_angle is not None and not part1_end_slope:
-                            abs_angle = abs(part1_end_angle)
-                            if 60 <= abs_angle <= 120:
-                                deviation = abs(part1_end_angle - 90.0)
-                            else:
-                                deviation = abs_angle
-                            if deviation > 5.0 and 0.2 < part1_end_conf <= 0.5:
-                                part1_end_low_conf_slope = True
-                        
-                        # Skip if no slopes at all (neither high confidence nor low confidence)
-                        if not (part1_start_slope or part1_end_slope or part1_start_low_conf_slope or part1_end_low_conf_slope):
-                            continue  # Skip parts without slopes for pairing
-                        
-                        # Use combined slope flags (high or low confidence)
-                        part1_start_slope_any = part1_start_slope or part1_start_low_conf_slope
-                        part1_end_slope_any = part1_end_slope or part1_end_low_conf_slope
-                        
-                        # Try to find a complementary part (only from valid parts)
-                        for j, part2 in enumerate(valid_parts_for_this_stock[i+1:], start=i+1):
-                            if part2 in parts_to_remove:
-                                continue
-                            
-                            # Check if part2 has a complementary slope (high confidence)
-                            part2_start_slope = part2.get("start_has_slope", False)
-                            part2_end_slope = part2.get("end_has_slope", False)
-                            part2_start_angle = part2.get("start_angle")
-                            part2_end_angle = part2.get("end_angle")
-                            part2_start_conf = part2.get("start_confidence", 0.0)
-                            part2_end_conf = part2.get("end_confidence", 0.0)
-                            
-                            # Check for low-confidence slopes on part2
-                            part2_start_low_conf_slope = False
-                            part2_end_low_conf_slope = False
-                            if part2_start_angle is not None and not part2_start_slope:
-                                abs_angle = abs(part2_start_angle)
-                                if 60 <= abs_angle <= 120:
-                                    deviation = abs(part2_start_angle - 90.0)
-                                else:
-                                    deviation = abs_angle
-                                if deviation > 5.0 and 0.2 < part2_start_conf <= 0.5:
-                                    part2_start_low_conf_slope = True
-                            
-                            if part2_end_angle is not None and not part2_end_slope:
-                                abs_angle = abs(part2_end_angle)
-                                if 60 <= abs_angle <= 120:
-                                    deviation = abs(part2_end_angle - 90.0)
-                                else:
-                                    deviation = abs_angle
-                                if deviation > 5.0 and 0.2 < part2_end_conf <= 0.5:
-                                    part2_end_low_conf_slope = True
-                            
-                            # Use combined slope flags (high or low confidence)
-                            part2_start_slope_any = part2_start_slope or part2_start_low_conf_slope
-                            part2_end_slope_any = part2_end_slope or part2_end_low_conf_slope
-                            
-                            # Check for complementary slopes
-                            # Complementary means: one part's start slope matches another's end slope (or vice versa)
-                            # with opposite angles (e.g., 45° and -45°, or 30° and -30°)
-                            # When cutting from the same stock bar, complementary slopes can be paired to minimize waste
-                            is_complementary = False
-                            pairing_type = None
-                            
-                            # Case 1: part1 start slope with part2 end slope (use combined flags for low-confidence detection)
-                            if part1_start_slope_any and part2_end_slope_any and part1_start_angle is not None and part2_end_angle is not None:
-                                # For complementary cuts, angles should be opposite (e.g., 45° and -45°)
-                                # Or we can use same angle if cutting from opposite ends
-                                angle1_abs = abs(part1_start_angle)
-                                angle2_abs = abs(part2_end_angle)
-                                angle_diff = abs(angle1_abs - angle2_abs)
-                                
-                                # Check if angles are similar (within 5 degrees) - they can be paired
-                                # The actual complementarity depends on how they're oriented in the stock bar
-                                if angle_diff < 5.0 and angle1_abs > 1.0:  # Both have significant slopes
-                                    is_complementary = True
-                                    pairing_type = "start_end"
-                            
-                            # Case 2: part1 end slope with part2 start slope (use combined flags)
-                            if not is_complementary and part1_end_slope_any and part2_start_slope_any and part1_end_angle is not None and part2_start_angle is not None:
-                                angle1_abs = abs(part1_end_angle)
-                                angle2_abs = abs(part2_start_angle)
-                                angle_diff = abs(angle1_abs - angle2_abs)
-                                
-                                if angle_diff < 5.0 and angle1_abs > 1.0:  # Both have significant slopes
-                                    is_complementary = True
-                                    pairing_type = "end_start"
-                            
-                            # Case 2b: part1 end slope with part2 end slope (use combined flags)
-                            # This handles cases where both parts have end cuts that can be complementary
-                            if not is_complementary and part1_end_slope_any and part2_end_slope_any and part1_end_angle is not None and part2_end_angle is not None:
-                                angle1_abs = abs(part1_end_angle)
-                                angle2_abs = abs(part2_end_angle)
-                                angle_diff = abs(angle1_abs - angle2_abs)
-                                
-                                # If both have similar end cut angles, they can be paired
-                                # One part's end cut becomes the start cut for the pair
-                                if angle_diff < 5.0 and angle1_abs > 1.0:  # Both have significant slopes
-                                    is_complementary = True
-                                    pairing_type = "end_end"
-                            
-                            # Case 3: Both parts have slopes on both ends - check all combinations (use combined flags)
-                            if not is_complementary:
-                                # Try part1 start with part2 start (if angles are opposite)
-                                if part1_start_slope_any and part2_start_slope_any and part1_start_angle is not None and part2_start_angle is not None:
-                                    angle1_abs = abs(part1_start_angle)
-                                    angle2_abs = abs(part2_start_angle)
-                                    angle_diff = abs(angle1_abs - angle2_abs)
-                                    # Check if angles are opposite (one positive, one negative, similar magnitude)
-                                    if angle_diff < 5.0 and angle1_abs > 1.0:
-                                        # Check if they have opposite signs (complementary)
-                                        if (part1_start_angle > 0 and part2_start_angle < 0) or (part1_start_angle < 0 and part2_start_angle > 0):
-                                            is_complementary = True
-                                            pairing_type = "start_start"
-                                
-                                # Try part1 end with part2 end (use combined flags)
-                                # When both parts have end cuts with similar angles, one can be reversed
-                                # to create a complementary pair (end of part1 becomes start of part2)
-                                if not is_complementary and part1_end_slope_any and part2_end_slope_any and part1_end_angle is not None and part2_end_angle is not None:
-                                    angle1_abs = abs(part1_end_angle)
-                                    angle2_abs = abs(part2_end_angle)
-                                    angle_diff = abs(angle1_abs - angle2_abs)
-                                    # If angles are similar (within 5°), they can be paired
-                                    # One part's end cut can serve as the other's start cut
-                                    if angle_diff < 5.0 and angle1_abs > 1.0:
-                                        is_complementary = True
-                                        pairing_type = "end_end"
-                            
-                            # If complementary, try to pair them
-                            if is_complementary:
-                                # For complementary slopes, calculate the actual length needed
-                                # The sloped cuts share the same cut area, so total length is less than sum
-                                length1 = part1["length"]
-                                length2 = part2["length"]
-                                
-                                # Get the angle for the complementary cut
-                                # The angle depends on the pairing type:
-                                # - end_start: use part1_end_angle and part2_start_angle
-                                # - start_end: use part1_start_angle and part2_end_angle
-                                # - end_end: use part1_end_angle and part2_end_angle
-                                # - start_start: use part1_start_angle and part2_start_angle
-                                if pairing_type == "end_start":
-                                    angle1_val = part1_end_angle
-                                    angle2_val = part2_start_angle
-                                elif pairing_type == "start_end":
-                                    angle1_val = part1_start_angle
-                                    angle2_val = part2_end_angle
-                                elif pairing_type == "end_end":
-                                    angle1_val = part1_end_angle
-                                    angle2_val = part2_end_angle
-                                elif pairing_type == "start_start":
-                                    angle1_val = part1_start_angle
-                                    angle2_val = part2_start_angle
-                                else:
-                                    # Fallback: use any available angle
-                                    angle1_val = part1_start_angle if part1_start_angle is not None else part1_end_angle
-                                    angle2_val = part2_start_angle if part2_start_angle is not None else part2_end_angle
-                                
-                                # Use the angle that's actually being paired (should be the same for complementary cuts)
-                                angle_for_calculation = angle1_val if angle1_val is not None else angle2_val
-                                
-                                # For complementary slopes, estimate the overlap
-                                # The overlap depends on the angle and profile depth
-                                # For IPE profiles, approximate depth is typically 200-600mm
-                                # For a 41.72° cut, the overlap is approximately: depth / tan(angle)
-                                # But since we're cutting from the same stock, the actual length needed
-                                # is approximately: length1 + length2 - (cut_depth / sin(angle))
-                                
-                                # Estimate profile depth from profile name - generic for all profile types
-                                # Use CutPieceExtractor's method for generic profile depth estimation
-                                # This handles all profile types: IPE, HEA, RHS, SHS, CHS, Pipes (Ø), etc.
-                                profile_name = part1.get("profile_name", "UNKNOWN")
-                                if extractor:
-                                    estimated_profile_depth = extractor._get_estimated_profile_depth(profile_name)
-                                else:
-                                    # Fallback: use simple regex-based detection if extractor is not available
-                                    estimated_profile_depth = 400.0  # Default
-                                    profile_name_upper = profile_name.upper()
-                                    import re
-                                    # Try to extract depth/diameter from common patterns
-                                    if "IPE" in profile_name_upper:
-                                        match = re.search(r'IPE\s*(\d+)', profile_name_upper)
-                                        if match:
-                                            estimated_profile_depth = float(match.group(1))
-                                    elif "HEA" in profile_name_upper or "HEB" in profile_name_upper or "HEM" in profile_name_upper:
-                                        match = re.search(r'HE[ABM]\s*(\d+)', profile_name_upper)
-                                        if match:
-                                            estimated_profile_depth = float(match.group(1))
-                                    elif "RHS" in profile_name_upper or "SHS" in profile_name_upper:
-                                        match = re.findall(r'(\d+\.?\d*)', profile_name_upper)
-                                        if match:
-                                            estimated_profile_depth = max([float(d) for d in match])
-                                    elif "Ø" in profile_name or "DIAMETER" in profile_name_upper or "CHS" in profile_name_upper:
-                                        # Try to extract diameter from circular profiles like Ø219.1*3
-                                        # First try with Ø symbol
-                                        match = re.search(r'Ø\s*(\d+\.?\d*)', profile_name)
-                                        if not match:
-                                            # Try DIAMETER keyword
-                                            match = re.search(r'DIAMETER\s*(\d+\.?\d*)', profile_name_upper)
-                                        if not match:
-                                            # Try CHS format
-                                            match = re.search(r'CHS\s*(\d+\.?\d*)', profile_name_upper)
-                                        if not match:
-                                            # Fallback: extract first number (should be diameter)
-                                            match = re.search(r'(\d+\.?\d*)', profile_name)
-                                        if match:
-                                            estimated_profile_depth = float(match.group(1))
-                                
-                                # GENERIC CALCULATION: Works for ALL profile types (IPE, HEA, RHS, SHS, CHS, Pipes, etc.)
-                                # For complementary slopes, calculate the shared material length
-                                # This is a simple geometric calculation that works universally
-                                
-                                nesting_log(f"[NESTING] Profile detection: name='{profile_name}', depth={estimated_profile_depth:.1f}mm")
-                                
-                                # Initialize shared_linear_slopes_length
-                                shared_linear_slopes_length = 0.0
-                                
-                                if angle_for_calculation is not None and abs(angle_for_calculation) > 1.0:
-                                    import math
-                                    angle_rad = abs(angle_for_calculation) * (math.pi / 180.0)
-                                    
-                                    # CORRECTED FORMULA: For complementary cuts, the shared material is the linear overlap
-                                    # along the cutting axis (the green X in the user's diagram)
-                                    # Generic formula for ALL profile types: shared_length = depth * tan(angle)
-                                    # This gives the linear projection along the cutting axis for the shared material
-                                    
-                                    if angle_rad > 0.01:
-                                        # Use depth * tan(angle) for all profile types (IPE, HEA, RHS, SHS, circular, etc.)
-                                        shared_linear_slopes_length = estimated_profile_depth * math.tan(angle_rad)
-                                        
-                                        # Safety check: shared length cannot exceed the smaller part length
-                                        max_shared = min(length1, length2) * 0.9  # Max 90% of smaller part
-                                        if shared_linear_slopes_length > max_shared:
-                                            shared_linear_slopes_length = max_shared
-                                            nesting_log(f"[NESTING] Capped shared length to {shared_linear_slopes_length:.1f}mm (90% of smaller part)")
-                                    else:
-                                        shared_linear_slopes_length = 0.0
-                                    
-                                    # Calculate combined length using actual geometric shared length
-                                    # IMPORTANT: Do NOT adjust shared length to fit stock - use only geometric calculation
-                                    combined_length = length1 + length2 - shared_linear_slopes_length
-                                    
-                                    if combined_length < 0:
-                                        # Safety: if shared length is larger than sum, cap it
-                                        max_shared = min(length1, length2) * 0.5
-                                        if shared_linear_slopes_length > max_shared:
-                                            nesting_log(f"[NESTING] Warning: Shared length ({shared_linear_slopes_length:.1f}mm) too large, capping to {max_shared:.1f}mm")
-                                            shared_linear_slopes_length = max_shared
-                                            combined_length = length1 + length2 - shared_linear_slopes_length
-                                    
-                                    nesting_log(f"[NESTING] Complementary slopes: angle={angle_for_calculation:.1f}°, depth={estimated_profile_depth:.1f}mm")
-                                    nesting_log(f"[NESTING]   Part 1: {length1:.1f}mm, Part 2: {length2:.1f}mm")
-                                    nesting_log(f"[NESTING]   Shared: {shared_linear_slopes_length:.1f}mm (depth * tan(angle) = {estimated_profile_depth:.1f} * tan({angle_for_calculation:.1f}°))")
-                                    nesting_log(f"[NESTING]   Combined: {length1:.1f} + {length2:.1f} - {shared_linear_slopes_length:.1f} = {combined_length:.1f}mm")
-                                else:
-                                    # Fallback: use linear sum if angle is not available
-                                    combined_length = length1 + length2
-                                    # shared_linear_slopes_length is already 0.0 from initialization
-                                
-                                angle1_str = f"{angle1_val:.1f}°" if angle1_val is not None else "N/A"
-                                angle2_str = f"{angle2_val:.1f}°" if angle2_val is not None else "N/A"
-                                
-                                # Check ALL available stock lengths to see if this pair fits
-                                # Use minimal tolerance only for floating point rounding errors
-                                # CRITICAL: Parts must fit within stock length - no tolerance for exceeding stock
-                                best_stock_for_pair = None
-                                
-                                # FIXED: Find the LONGEST stock that fits to minimize number of bars
-                                # Prefer longer stock (12M) when pair fits, to minimize number of bars
-                                # Use minimal tolerance (0.1mm) only for floating point rounding errors
-                                tolerance_mm = 0.1  # Minimal tolerance for floating point errors only
-                                
-                                for stock_len in sorted(stock_lengths_list, reverse=True):  # Check longer stocks first (12M before 6M)
-                                    if combined_length <= stock_len + tolerance_mm:
-                                        # Additional strict check: combined_length must not exceed stock_len
-                                        if combined_length > stock_len:
-                                            nesting_log(f"[NESTING] REJECTING pair: combined_length {combined_length:.1f}mm exceeds stock {stock_len:.0f}mm (tolerance {tolerance_mm:.1f}mm is only for rounding)")
-                                            continue
-                                        best_stock_for_pair = stock_len
-                                        waste = stock_len - combined_length
-                                        waste_pct = (waste / stock_len * 100) if stock_len > 0 else 0
-                                        nesting_log(f"[NESTING] Pair fits in {stock_len:.1f}mm stock: {combined_length:.1f}mm <= {stock_len:.1f}mm (waste: {waste:.1f}mm, {waste_pct:.1f}%) - preferring longer stock to minimize bars")
-                                        break  # Use the longest stock that fits
-                                
-                                if best_stock_for_pair:
-                                    # Calculate waste, but ensure it's not negative (due to tolerance)
-                                    waste_for_pair = max(0.0, best_stock_for_pair - combined_length)
-                                    # shared_linear_slopes_length is always initialized (0.0 at minimum)
-                                    saved_material = shared_linear_slopes_length
-                                    nesting_log(f"[NESTING] Found complementary slopes ({pairing_type}): part {part1['product_id']} ({angle1_str}) with part {part2['product_id']} ({angle2_str}) - actual length needed: {combined_length:.1f}mm (saved {saved_material:.1f}mm from shared cut), fits in stock: {best_stock_for_pair:.1f}mm (waste: {waste_for_pair:.1f}mm)")
-                                else:
-                                    nesting_log(f"[NESTING] Found complementary slopes ({pairing_type}): part {part1['product_id']} ({angle1_str}) with part {part2['product_id']} ({angle2_str}) - actual length needed: {combined_length:.1f}mm, doesn't fit in any stock length (max available: {max(stock_lengths_list):.1f}mm)")
-                                
-                                # FIXED: For complementary pairs, use the stock selected by best_stock (prefers shorter)
-                                # Respect the stock selection logic that prefers shorter stock when all parts fit
-                                if best_stock_for_pair:
-                                    # Pair fits in a stock length - use best_stock (which prefers shorter when all fit)
-                                    stock_to_use = best_stock
-                                    if current_length == 0.0:
-                                        # Pattern is empty - use best_stock (already selected to prefer shorter)
-                                        # Only use pair's stock if it's the same as best_stock or if pair doesn't fit in best_stock
-                                        if combined_length <= best_stock:
-                                            # Pair fits in best_stock - use best_stock (prefers shorter)
-                                            nesting_log(f"[NESTING] Using stock {best_stock:.1f}mm for complementary pair (respects shorter stock preference)")
-                                        else:
-                                            # Pair doesn't fit in best_stock - use pair's stock (but this shouldn't happen if best_stock is correct)
-                                            stock_to_use = best_stock_for_pair
-                                            nesting_log(f"[NESTING] WARNING: Pair needs {best_stock_for_pair:.1f}mm but best_stock is {best_stock:.1f}mm")
-                                    else:
-                                        # Pattern has parts - use best_stock (already selected)
-                                        stock_to_use = best_stock
-                                else:
-                                    # Pair doesn't fit in any stock - use best_stock (will be rejected later)
-                                    stock_to_use = best_stock
-                                
-                                # For complementary slopes, prioritize pairing even if it means starting a new pattern
-                                # This is especially important for IPE600, IPE400 and other large profiles
-                                # CRITICAL: NO TOLERANCE - must fit exactly within stock length
-                                tolerance_mm = 0.1  # Minimal tolerance for floating point errors only
-                                
-                                # CRITICAL CHECK: Ensure current_length hasn't already exceeded best_stock
-                                # Maximum optimization: 0mm margin - only use tolerance for floating point errors
-                                if current_length > best_stock + tolerance_mm:
-                                    nesting_log(f"[NESTING] SKIP PAIR: current_length {current_length:.1f}mm already exceeds stock {best_stock:.0f}mm - cannot add more pairs")
-                                    break  # Break out of complementary pair processing
-                                
-                                # STRICT VALIDATION: Check if pair actually fits in stock (no tolerance)
-                                if best_stock_for_pair and combined_length <= best_stock_for_pair + tolerance_mm:
-                                    # Additional validation: ensure pair fits in the stock we're using
-                                    if combined_length > stock_to_use:
-                                        nesting_log(f"[NESTING] REJECTING pair: combined_length {combined_length:.1f}mm exceeds stock_to_use {stock_to_use:.1f}mm")
-                                        continue  # Skip this pair
-                                    
-                                    # The pair fits in a stock bar - ALWAYS prioritize pairing complementary slopes
-                                    # This is critical - never split complementary pairs
-                                    if current_length == 0.0:
-                                        # Pattern is empty - ALWAYS pair complementary parts (this is the most common case)
-                                        nesting_log(f"[NESTING] Pattern is empty - pairing complementary parts in {best_stock_for_pair:.1f}mm stock")
-                                    elif current_length + combined_length <= best_stock + tolerance_mm:
-                                        # Pair fits in current pattern - allow exact fit (0mm margin for maximum optimization)
-                                        # BUT: Ensure that after adding, current_length won't exceed best_stock
-                                        # Use strict check: current_length + combined_length must be <= best_stock (not best_stock + tolerance)
-                                        if current_length + combined_length > best_stock:
-                                            # Even with tolerance, this would exceed stock - reject it
-                                            nesting_log(f"[NESTING] REJECTING pair: current_length {current_length:.1f}mm + combined_length {combined_length:.1f}mm = {current_length + combined_length:.1f}mm > {best_stock:.0f}mm (exceeds stock)")
-                                            continue  # Skip this pair
-                                        nesting_log(f"[NESTING] Complementary pair fits in current pattern, pairing them")
-                                    else:
-                                        # Pair doesn't fit in current pattern - must start new pattern to pair them
-                                        nesting_log(f"[NESTING] Complementary pair doesn't fit in current pattern ({current_length:.1f}mm + {combined_length:.1f}mm > {best_stock:.0f}mm). Starting new pattern to pair them.")
-                                        break
-                                    
-                                    # CRITICAL VALIDATION: Double-check that adding this pair won't exceed stock
-                                    # Use best_stock (the actual stock length for this pattern) not stock_to_use
-                                    length_after_pair = current_length + combined_length
-                                    if length_after_pair > best_stock + tolerance_mm:
-                                        nesting_log(f"[NESTING] REJECTING pair: Would exceed stock ({length_after_pair:.1f}mm > {best_stock:.0f}mm)")
-                                        continue  # Skip this pair
-                                    
-                                    # If we get here, the pair fits and should be added
-                                    nesting_log(f"[NESTING] Both parts fit in stock bar ({best_stock:.0f}mm), pairing them (current: {current_length:.1f}mm + combined: {combined_length:.1f}mm = {length_after_pair:.1f}mm)")
-                                    # Add both parts as a complementary pair
-                                    pattern_parts.append({
-                                        "part": part1,
-                                        "cut_position": cut_position,
-                                        "length": part1["length"],
-                                        "slope_info": {
-                                            "start_angle": part1_start_angle,
-                                            "end_angle": part1_end_angle,
-                                            "start_has_slope": part1_start_slope_any,
-                                            "end_has_slope": part1_end_slope_any,
-                                            "has_slope": part1_start_slope_any or part1_end_slope_any,
-                                            "complementary_pair": True
-                                        }
-                                    })
-                                    # Store the current_length before adding the pair
-                                    length_before_pair = current_length
-                                    
-                                    cut_position += part1["length"]
-                                    
-                                    # For complementary slopes, part2 starts at the shared cut position
-                                    # This means part2's cut_position should account for the shared linear slopes length
-                                    part2_cut_position = cut_position - shared_linear_slopes_length
-                                    
-                                    pattern_parts.append({
-                                        "part": part2,
-                                        "cut_position": part2_cut_position,
-                                        "length": part2["length"],
-                                        "slope_info": {
-                                            "start_angle": part2_start_angle,
-                                            "end_angle": part2_end_angle,
-                                            "start_has_slope": part2_start_slope_any,
-                                            "end_has_slope": part2_end_slope_any,
-                                            "has_slope": part2_start_slope_any or part2_end_slope_any,
-                                            "complementary_pair": True
-                                        }
-                                    })
-                                    # Update cut_position to reflect where we actually are after both parts
-                                    # This is part1 end + part2 length - shared_linear_slopes_length (which equals combined_length)
-                                    cut_position = part2_cut_position + part2["length"]
-                                    
-                                    # Use combined_length directly to update current_length - this ensures accuracy
-                                    # combined_length already accounts for: length1 + length2 - shared_linear_slopes_length
-                                    current_length = length_before_pair + combined_length
-                                    
-                                    # ABSOLUTE STRICT CHECK: current_length must NEVER exceed best_stock
-                                    # Use a very small epsilon to account for floating point precision, but be very strict
-                                    epsilon = 0.01  # Very small epsilon for floating point comparison
-                                    if current_length > best_stock + epsilon:
-                                        # This should never happen if validation is correct, but catch it just in case
-                                        nesting_log(f"[NESTING] ABSOLUTE REJECTION: current_length {current_length:.1f}mm exceeds stock {best_stock:.0f}mm (epsilon: {epsilon:.2f}mm) - removing pair")
-                                        # Remove the parts we just added
-                                        pattern_parts = [pp for pp in pattern_parts if pp.get("part") not in [part1, part2]]
-                                        current_length = length_before_pair
-                                        cut_position = length_before_pair  # Reset cut_position too
-                                        continue  # Skip this pair
-                                    
-                                    # STRICT CHECK: current_length must NEVER exceed best_stock (tolerance only for floating point rounding)
-                                    # If it does, reject immediately
-                                    if current_length > best_stock:
-                                        # This should never happen if validation is correct, but catch it just in case
-                                        nesting_log(f"[NESTING] CRITICAL REJECTION: current_length {current_length:.1f}mm exceeds stock {best_stock:.0f}mm (no tolerance) - removing pair")
-                                        # Remove the parts we just added
-                                        pattern_parts = [pp for pp in pattern_parts if pp.get("part") not in [part1, part2]]
-                                        current_length = length_before_pair
-                                        cut_position = length_before_pair  # Reset cut_position too
-                                        continue  # Skip this pair
-                                    
-                                    # IMMEDIATE CHECK: If current_length exceeds best_stock even with tolerance, reject
-                                    # This should never happen if validation is correct, but catch it just in case
-                                    if current_length > best_stock + tolerance_mm:
-                                        nesting_log(f"[NESTING] IMMEDIATE REJECTION: current_length {current_length:.1f}mm exceeds stock {best_stock:.0f}mm immediately after calculation - removing pair")
-                                        # Remove the parts we just added
-                                        pattern_parts = [pp for pp in pattern_parts if pp.get("part") not in [part1, part2]]
-                                        current_length = length_before_pair
-                                        cut_position = length_before_pair  # Reset cut_position too
-                                        continue  # Skip this pair
-                                    
-                                    # FINAL VALIDATION: Ensure current_length doesn't exceed stock
-                                    # Use best_stock (the actual stock length for this pattern) not stock_to_use
-                                    if current_length > best_stock + tolerance_mm:
-                                        nesting_log(f"[NESTING] ERROR: After adding pair, current_length {current_length:.1f}mm exceeds stock {best_stock:.0f}mm - removing pair")
-                                        # Remove the parts we just added
-                                        pattern_parts = [pp for pp in pattern_parts if pp.get("part") not in [part1, part2]]
-                                        current_length = length_before_pair
-                                        continue  # Skip this pair
-                                    
-                                    # CRITICAL SAFETY CHECK: Double-check current_length is valid after pair addition
-                                    if current_length > best_stock + tolerance_mm:
-                                        nesting_log(f"[NESTING] CRITICAL ERROR: current_length {current_length:.1f}mm exceeds stock {best_stock:.0f}mm after pair validation - this should not happen!")
-                                        # Force break to prevent further additions
-                                        break
-                                    
-                                    total_parts_length += part1["length"] + part2["length"]  # Track individual part lengths (for display)
-                                    
-                                    nesting_log(f"[NESTING] Added complementary pair: length_before = {length_before_pair:.1f}mm, combined_length = {combined_length:.1f}mm, current_length = {current_length:.1f}mm")
-                                    nesting_log(f"[NESTING]   Verification: part1={part1['length']:.1f}mm + part2={part2['length']:.1f}mm - shared={shared_linear_slopes_length:.1f}mm = {combined_length:.1f}mm")
-                                    
-                                    parts_to_remove.extend([part1, part2])
-                                    nesting_log(f"[NESTING] Successfully paired complementary slopes - waste saved by using complementary cuts")
-                                    
-                                    # CRITICAL CHECK: After adding pair, verify current_length is still valid
-                                    # If it exceeds best_stock, break out of outer loop to prevent adding more pairs
-                                    if current_length > best_stock + tolerance_mm:
-                                        nesting_log(f"[NESTING] BREAK OUTER LOOP: After adding pair, current_length {current_length:.1f}mm exceeds stock {best_stock:.0f}mm - stopping complementary pair search")
-                                        break  # Break out of inner loop, and the outer loop will also stop due to the check at the beginning
-                                    
-                                    break  # Found a pair, move to next part
-                                else:
-                                    nesting_log(f"[NESTING] Complementary parts don't fit in any stock length (combined_length={combined_length:.1f}mm, max_stock={max(stock_lengths_list):.1f}mm)")
-                                    # Don't break - continue looking for other pairs that might fit
-                
-                # Step 2: Fill remaining space with other parts (including non-sloped parts)
-                # IMPORTANT: Step 1 already tried to find complementary pairs
-                # Now process ALL remaining parts to ensure complete nesting for IPE500, IPE600, Ø219.1*3, etc.
-                # No skipping - Step 1 handled pairing, Step 2 handles everything else
-                # Only process valid parts that fit in best_stock
-                
-                # CRITICAL FIX: Choose optimal starting part to maximize boundary sharing (flushing)
-                # For parts with straight cuts, find the part that allows the most other parts to share boundaries
-                # This ensures maximum flushing even if the starting part isn't the longest
-                remaining_parts_sorted = [p for p in valid_parts_for_this_stock if p not in parts_to_remove]
-                
-                # If pattern is empty (no parts added yet), choose the best starting part
-                if len(pattern_parts) == 0 and len(remaining_parts_sorted) > 0:
-                    # Only calculate flush score for small lists to avoid O(n²) performance issues
-                    # Try look-ahead: simulate patterns with different starting parts and pick the best
-                    # Use first 20 parts for look-ahead even if list is longer (to make it work for large profiles)
-                    parts_to_consider = remaining_parts_sorted[:20] if len(remaining_parts_sorted) > 20 else remaining_parts_sorted
-                    
-                    if len(parts_to_consider) >= 3:
-                        # LOOK-AHEAD STRATEGY: Try different starting parts and simulate the pattern
-                        # Pick the configuration that results in minimum waste
-                        nesting_log(f"[NESTING] Using look-ahead strategy on {len(parts_to_consider)} parts: trying up to 5 different starting configurations")
-                        
-                        best_configuration = None
-                        best_waste = float('inf')
-                        candidates_to_try = min(5, len(parts_to_consider))  # Try top 5 candidates
-                        
-                        # First, filter out parts with START slopes (they're bad starting parts)
-                        straight_start_parts = [p for p in parts_to_consider if not p.get("start_has_slope", False)]
-                        slope_start_parts = [p for p in parts_to_consider if p.get("start_has_slope", False)]
-                        
-                        # Prioritize trying straight-start parts
-                        candidates = (straight_start_parts[:candidates_to_try] + slope_start_parts)[:candidates_to_try]
-                        
-                        for trial_start_part in candidates:
-                            # Simulate: how many parts can we fit if we start with this part?
-                            simulated_length = trial_start_part["length"]
-                            simulated_parts = [trial_start_part]
-                            simulated_remaining = [p for p in parts_to_consider if p != trial_start_part]
-                            
-                            prev_end_slope = trial_start_part.get("end_has_slope", False)
-                            prev_end_angle = trial_start_part.get("end_angle")
-                            
-                            # CRITICAL: Sort simulated_remaining to prioritize parts that can flush with prev part
-                            can_flush_sim = []
-                            cannot_flush_sim = []
-                            for p in simulated_remaining:
-                                p_start_slope = p.get("start_has_slope", False)
-                                p_start_angle = p.get("start_angle")
-                                can_share = False
-                                if not prev_end_slope and not p_start_slope:
-                                    can_share = True
-                                elif prev_end_slope and p_start_slope:
-                                    if prev_end_angle is not None and p_start_angle is not None:
-                                        angle_diff = abs(abs(prev_end_angle) - abs(p_start_angle))
-                                        if angle_diff <= 2.0:
-                                            can_share = True
-                                if can_share:
-                                    can_flush_sim.append(p)
-                                else:
-                                    cannot_flush_sim.append(p)
-                            
-                            # Prioritize flushable parts, then sort each group by length descending
-                            can_flush_sim.sort(key=lambda x: x["length"], reverse=True)
-                            cannot_flush_sim.sort(key=lambda x: x["length"], reverse=True)
-                            simulated_remaining_sorted = can_flush_sim + cannot_flush_sim
-                            
-                            # Greedily add parts that can flush with previous part
-                            max_parts_to_try = 10
-                            parts_added = 0
-                            while parts_added < max_parts_to_try and simulated_remaining_sorted:
-                                # Re-sort remaining parts to prioritize those that flush with current prev_part
-                                can_flush_now = []
-                                cannot_flush_now = []
-                                for p in simulated_remaining_sorted:
-                                    if p in simulated_parts:
-                                        continue
-                                    p_start_slope = p.get("start_has_slope", False)
-                                    p_start_angle = p.get("start_angle")
-                                    p_end_slope = p.get("end_has_slope", False)
-                                    p_end_angle = p.get("end_angle")
-                                    
-                                    # Check if part can share in current orientation
-                                    can_share = False
-                                    if not prev_end_slope and not p_start_slope:
-                                        can_share = True
-                                    elif prev_end_slope and p_start_slope:
-                                        if prev_end_angle is not None and p_start_angle is not None:
-                                            angle_diff = abs(abs(prev_end_angle) - abs(p_start_angle))
-                                            if angle_diff <= 2.0:
-                                                can_share = True
-                                    
-                                    # If can't share, check if FLIPPING would help
-                                    if not can_share:
-                                        # Check flipped orientation (swap start with end)
-                                        flipped_start_slope = p_end_slope
-                                        flipped_start_angle = p_end_angle
-                                        if not prev_end_slope and not flipped_start_slope:
-                                            can_share = True  # Flipping helps!
-                                        elif prev_end_slope and flipped_start_slope:
-                                            if prev_end_angle is not None and flipped_start_angle is not None:
-                                                angle_diff = abs(abs(prev_end_angle) - abs(flipped_start_angle))
-                                                if angle_diff <= 2.0:
-                                                    can_share = True  # Flipping helps!
-                                    
-                                    if can_share:
-                                        can_flush_now.append(p)
-                                    else:
-                                        cannot_flush_now.append(p)
-                                
-                                # Try flushable parts first
-                                next_candidates = can_flush_now + cannot_flush_now
-                                if not next_candidates:
-                                    break
-                                
-                                next_part = next_candidates[0]
-                                next_start_slope = next_part.get("start_has_slope", False)
-                                
-                                # Calculate kerf
-                                kerf = 3.0  # Default kerf
-                                if next_part in can_flush_now:
-                                    kerf = 0.0  # Can flush, no kerf
-                                
-                                new_length = simulated_length + next_part["length"] + kerf
-                                if new_length <= best_stock:
-                                    simulated_length = new_length
-                                    simulated_parts.append(next_part)
-                                    prev_end_slope = next_part.get("end_has_slope", False)
-                                    prev_end_angle = next_part.get("end_angle")
-                                    parts_added += 1
-                                else:
-                                    break  # Can't fit more parts
-                            
-                            # Calculate waste for this configuration
-                            waste = best_stock - simulated_length
-                            nesting_log(f"[NESTING] Trial start with part (length={trial_start_part['length']:.0f}mm): {len(simulated_parts)} parts, waste={waste:.0f}mm")
-                            
-                            # Pick configuration with minimum waste (or maximum parts if waste is similar)
-                            if waste < best_waste or (abs(waste - best_waste) < 10 and len(simulated_parts) > len(best_configuration) if best_configuration else False):
-                                best_waste = waste
-                                best_configuration = simulated_parts
-                        
-                        # Use the best configuration found - reorder remaining_parts_sorted to follow it
-                        if best_configuration:
-                            best_start_part = best_configuration[0]
-                            nesting_log(f"[NESTING] Look-ahead selected: Start with part (length={best_start_part['length']:.0f}mm), predicted {len(best_configuration)} parts, waste={best_waste:.0f}mm")
-                            
-                            # CRITICAL: Reorder remaining_parts_sorted to follow the best configuration order
-                            # Put the simulated parts in order, then add the rest sorted by length
-                            # Use both id() and length matching for robustness
-                            config_ids = {id(p): p for p in best_configuration}
-                            remaining_not_in_config = []
-                            for p in remaining_parts_sorted:
-                                if id(p) not in config_ids:
-                                    remaining_not_in_config.append(p)
-                            remaining_not_in_config.sort(key=lambda p: p["length"], reverse=True)
-                            remaining_parts_sorted = list(best_configuration) + remaining_not_in_config
-                            nesting_log(f"[NESTING] *** LOOK-AHEAD APPLIED *** Reordered parts: {len(best_configuration)} from optimal config (lengths: {[p['length'] for p in best_configuration[:5]]}...), then {len(remaining_not_in_config)} others by length")
-                        else:
-                            best_start_part = None
-                        
-                        best_flush_score = 100  # Set high score so we don't re-sort below
-                        best_start_part = "LOOKAHEAD_APPLIED"  # Marker to skip re-sorting below
-                    
-                    elif len(remaining_parts_sorted) <= 50:
-                        # Calculate "flush score" for each part as a potential starting part
-                        # Flush score = how many other parts can share boundaries with this part
-                        best_start_part = None
-                        best_flush_score = -1
-                        
-                        for candidate_idx, candidate in enumerate(remaining_parts_sorted):
-                            flush_score = 0
-                            candidate_start_slope = candidate.get("start_has_slope", False)
-                            candidate_start_angle = candidate.get("start_angle")
-                            candidate_end_slope = candidate.get("end_has_slope", False)
-                            candidate_end_angle = candidate.get("end_angle")
-                            
-                            # CRITICAL: Heavily penalize parts with START slope as first part
-                            # A sloped start creates waste at the beginning of the bar
-                            if candidate_start_slope:
-                                # Check if this start slope has a complementary match that could be placed BEFORE it
-                                # (which is impossible since this would be the first part)
-                                # So any start slope on first part = guaranteed waste
-                                flush_score = -1000  # Heavy penalty
-                                nesting_log(f"[NESTING] Candidate part has START slope - penalizing heavily as first part (creates waste)")
-                            else:
-                                # Check how many other parts can share boundary with this candidate's end
-                                for other_idx, other in enumerate(remaining_parts_sorted):
-                                    if candidate_idx == other_idx:
-                                        continue
-                                    
-                                    other_start_slope = other.get("start_has_slope", False)
-                                    other_start_angle = other.get("start_angle")
-                                    
-                                    # Check if they can share boundary
-                                    can_share = False
-                                    if not candidate_end_slope and not other_start_slope:
-                                        # Both straight - can share
-                                        can_share = True
-                                    elif candidate_end_slope and other_start_slope:
-                                        # Both sloped - check if complementary
-                                        if candidate_end_angle is not None and other_start_angle is not None:
-                                            angle_diff = abs(abs(candidate_end_angle) - abs(other_start_angle))
-                                            if angle_diff <= 2.0:
-                                                can_share = True
-                                    
-                                    if can_share:
-                                        flush_score += 1
-                            
-                            # Prefer parts with higher flush score, use length as tiebreaker
-                            if flush_score > best_flush_score or (flush_score == best_flush_score and (best_start_part is None or candidate["length"] > best_start_part["length"])):
-                                best_flush_score = flush_score
-                                best_start_part = candidate
-                        
-                        # Reorder to put best starting part first
-                        if best_start_part is not None and best_flush_score > 0:
-                            remaining_parts_sorted.remove(best_start_part)
-                            remaining_parts_sorted.insert(0, best_start_part)
-                            nesting_log(f"[NESTING] Step 2: Chose optimal starting part (flush_score={best_flush_score}) to maximize boundary sharing")
-                        else:
-                            # Fallback: sort by length descending
-                            remaining_parts_sorted.sort(key=lambda p: p["length"], reverse=True)
-                            nesting_log(f"[NESTING] Step 2: Using length-based sorting (no flush optimization needed)")
-                    else:
-                        # For large lists, skip flush score calculation and just sort by length
-                        remaining_parts_sorted.sort(key=lambda p: p["length"], reverse=True)
-                        nesting_log(f"[NESTING] Step 2: Large part count ({len(remaining_parts_sorted)}), using simple length-based sorting for performance")
-                        best_flush_score = 0  # Mark that we sorted
-                else:
-                    # Pattern already has parts, prioritize parts that can flush with the last part
-                    if len(pattern_parts) > 0 and len(remaining_parts_sorted) > 0:
-                        prev_part = pattern_parts[-1]
-                        prev_slope_info = prev_part.get("slope_info", {})
-                        prev_end_has_slope = prev_slope_info.get("end_has_slope", False)
-                        prev_end_angle = prev_slope_info.get("end_angle")
-                        
-                        # Separate parts that can flush from those that can't
-                        can_flush = []
-                        cannot_flush = []
-                        
-                        for p in remaining_parts_sorted:
-                            curr_start_has_slope = p.get("start_has_slope", False)
-                            curr_start_angle = p.get("start_angle")
-                            
-                            # Check if this part can share boundary with previous part
-                            shares_boundary = False
-                            if not prev_end_has_slope and not curr_start_has_slope:
-                                shares_boundary = True  # Both straight
-                            elif prev_end_has_slope and curr_start_has_slope:
-                                if prev_end_angle is not None and curr_start_angle is not None:
-                                    angle_diff = abs(abs(prev_end_angle) - abs(curr_start_angle))
-                                    if angle_diff <= 2.0:
-                                        shares_boundary = True  # Complementary slopes
-                            
-                            if shares_boundary:
-                                can_flush.append(p)
-                            else:
-                                cannot_flush.append(p)
-                        
-                        # Further separate cannot_flush into those with unpaired end slopes (should go last)
-                        # Parts with unpaired END slopes should be placed last so their slope counts as end waste
-                        cannot_flush_with_unpaired_end = []
-                        cannot_flush_normal = []
-                        
-                        for p in cannot_flush:
-                            p_end_slope = p.get("end_has_slope", False)
-                            p_end_angle = p.get("end_angle")
-                            
-                            if p_end_slope:
-                                # Check if this end slope has a complement in remaining parts
-                                has_complement = False
-                                for other in remaining_parts_sorted:
-                                    if p == other:
-                                        continue
-                                    other_start_slope = other.get("start_has_slope", False)
-                                    other_start_angle = other.get("start_angle")
-                                    if other_start_slope and p_end_angle is not None and other_start_angle is not None:
-                                        angle_diff = abs(abs(p_end_angle) - abs(other_start_angle))
-                                        if angle_diff <= 2.0:
-                                            has_complement = True
-                                            break
-                                
-                                if not has_complement:
-                                    cannot_flush_with_unpaired_end.append(p)
-                                else:
-                                    cannot_flush_normal.append(p)
-                            else:
-                                cannot_flush_normal.append(p)
-                        
-                        # Sort each group by length descending, then prioritize flushable parts
-                        can_flush.sort(key=lambda p: p["length"], reverse=True)
-                        cannot_flush_normal.sort(key=lambda p: p["length"], reverse=True)
-                        cannot_flush_with_unpaired_end.sort(key=lambda p: p["length"], reverse=True)
-                        
-                        # Order: flushable first, then normal non-flushable, then unpaired end slopes last
-                        remaining_parts_sorted = can_flush + cannot_flush_normal + cannot_flush_with_unpaired_end
-                        
-                        nesting_log(f"[NESTING] Step 2: Prioritized {len(can_flush)} flushable, {len(cannot_flush_normal)} normal, {len(cannot_flush_with_unpaired_end)} unpaired-end-slope parts (last)")
-                    else:
-                        # No previous part, just sort by length
-                        remaining_parts_sorted.sort(key=lambda p: p["length"], reverse=True)
-                        nesting_log(f"[NESTING] Step 2: Sorted {len(remaining_parts_sorted)} remaining parts by length descending")
-                
-                for part in remaining_parts_sorted:
-                    if part in parts_to_remove:
-                        continue
-                    
-                    # Process the part - only add if it fits in the stock
-                    # FIXED: Don't add parts that exceed stock length - they should have been filtered earlier
-                    # Only process parts from valid_parts_for_this_stock
-                    if part not in valid_parts_for_this_stock:
-                        # Part was filtered out (exceeds stock) - skip it
-                        continue
-                    
-                    # CRITICAL SAFETY CHECK: Ensure current_length hasn't already exceeded stock
-                    # This prevents adding more parts when current_length is already too high
-                    # Maximum optimization: 0mm margin - only use tolerance for floating point errors
-                    # If current_length exceeds best_stock (even slightly), stop immediately
-                    if current_length > best_stock + tolerance_mm:
-                        nesting_log(f"[NESTING] SAFETY BREAK: current_length {current_length:.1f}mm already exceeds stock {best_stock:.0f}mm (tolerance: {tolerance_mm:.1f}mm) - stopping pattern")
-                        break
-                    
-                    # CRITICAL FIX: For individual parts (not paired), always use full part length
-                    part_length = part["length"]
-                    
-                    # CRITICAL: Check if this part can share boundary with previous part
-                    # If boundaries can't be shared (non-complementary slopes), add kerf
-                    kerf_mm = 0.0  # Default: no kerf if boundaries can be shared
-                    
-                    if len(pattern_parts) > 0:
-                        # Check if previous part's end and current part's start can share boundary
-                        prev_part = pattern_parts[-1]
-                        prev_slope_info = prev_part.get("slope_info", {})
-                        curr_slope_info = {
-                            "start_angle": part.get("start_angle"),
-                            "end_angle": part.get("end_angle"),
-                            "start_has_slope": part.get("start_has_slope", False),
-                            "end_has_slope": part.get("end_has_slope", False)
-                        }
-                        
-                        prev_end_has_slope = prev_slope_info.get("end_has_slope", False)
-                        prev_end_angle = prev_slope_info.get("end_angle")
-                        curr_start_has_slope = curr_slope_info.get("start_has_slope", False)
-                        curr_start_angle = curr_slope_info.get("start_angle")
-                        
-                        # Determine if boundaries can share
-                        can_share = False
-                        
-                        if not prev_end_has_slope and not curr_start_has_slope:
-                            # Both straight - can share
-                            can_share = True
-                        elif prev_end_has_slope and curr_start_has_slope:
-                            # Both sloped - check if complementary
-                            if prev_end_angle is not None and curr_start_angle is not None:
-                                # Check if angles are complementary (opposite signs, similar magnitude)
-                                angle_diff = abs(abs(prev_end_angle) - abs(curr_start_angle))
-                                # If angles are within 2 degrees and have opposite signs, they're complementary
-                                if angle_diff <= 2.0:
-                                    # Check if they have opposite signs (complementary)
-                                    if (prev_end_angle > 0 and curr_start_angle < 0) or (prev_end_angle < 0 and curr_start_angle > 0):
-                                        can_share = True
-                        
-                        # If boundaries can't be shared, CHECK IF FLIPPING THE PART WOULD HELP
-                        if not can_share:
-                            # Try flipping the part: swap start and end
-                            flipped_start_has_slope = curr_slope_info.get("end_has_slope", False)
-                            flipped_start_angle = curr_slope_info.get("end_angle")
-                            
-                            # Check if flipped part CAN share boundary with previous part
-                            can_share_if_flipped = False
-                            if not prev_end_has_slope and not flipped_start_has_slope:
-                                can_share_if_flipped = True  # Both straight
-                            elif prev_end_has_slope and flipped_start_has_slope:
-                                if prev_end_angle is not None and flipped_start_angle is not None:
-                                    angle_diff = abs(abs(prev_end_angle) - abs(flipped_start_angle))
-                                    if angle_diff <= 2.0:
-                                        if (prev_end_angle > 0 and flipped_start_angle < 0) or (prev_end_angle < 0 and flipped_start_angle > 0):
-                                            can_share_if_flipped = True
-                            
-                            # If flipping helps, FLIP THE PART!
-                            if can_share_if_flipped:
-                                nesting_log(f"[NESTING] Flipping part to enable boundary sharing (swap start<->end)")
-                                # Swap start and end properties
-                                part["start_angle"], part["end_angle"] = part.get("end_angle"), part.get("start_angle")
-                                part["start_has_slope"], part["end_has_slope"] = part.get("end_has_slope", False), part.get("start_has_slope", False)
-                                part["flipped"] = True
-                                # Update curr_slope_info for this iteration
-                                curr_slope_info["start_angle"] = part["start_angle"]
-                                curr_slope_info["end_angle"] = part["end_angle"]
-                                curr_slope_info["start_has_slope"] = part["start_has_slope"]
-                                curr_slope_info["end_has_slope"] = part["end_has_slope"]
-                                curr_start_has_slope = part["start_has_slope"]
-                                can_share = True  # Now it can share!
-                                kerf_mm = 0.0
-                            else:
-                                # Can't flip to help, add kerf
-                                kerf_mm = 3.0  # Standard kerf for steel cutting (adjust as needed)
-                                nesting_log(f"[NESTING] Parts cannot share boundary - adding {kerf_mm:.1f}mm kerf")
-                        else:
-                            # Already can share, no kerf needed
-                            kerf_mm = 0.0
-                    else:
-                        # No previous part, no kerf needed
-                        kerf_mm = 0.0
-                    
-                    # STRICT VALIDATION: Check if adding this part (with kerf if needed) would exceed stock
-                    new_length = current_length + part_length + kerf_mm  # Add kerf if boundaries can't be shared
-                    tolerance_mm = 0.1  # Minimal tolerance for floating point errors only
-                    
-                    # VALIDATION: Check if adding this part would exceed stock length
-                    # Use current_length (actual material used) not total_parts_length (sum of individual lengths)
-                    # current_length accounts for shared cuts from complementary slopes
-                    if new_length > best_stock + tolerance_mm:
-                        # Part doesn't fit - skip it and continue checking smaller parts
-                        # CRITICAL: Don't break! Continue trying smaller parts to maximize bar utilization
-                        part_id = part.get("product_id") or part.get("reference") or part.get("element_name") or "unknown"
-                        print(
-                            f"[NESTING] Part {part_id} ({part_length:.1f}mm) + kerf ({kerf_mm:.1f}mm) doesn't fit: "
-                            f"{current_length:.1f}mm + {part_length:.1f}mm + {kerf_mm:.1f}mm = {new_length:.1f}mm "
-                            f"> {best_stock:.0f}mm (tolerance: {tolerance_mm:.1f}mm)"
-                        )
-                        continue  # Try next part instead of breaking
-                    
-                    # Part fits - add it
-                    # Check if part has complementary_pair flag from pre-processing
-                    comp_pair_flag = part.get("slope_info", {}).get("complementary_pair", False)
-                    
-                    pattern_parts.append({
-                        "part": part,
-                        "cut_position": cut_position,
-                        "length": part_length,  # Store full part length
-                        "slope_info": {
-                            "start_angle": part.get("start_angle"),
-                            "end_angle": part.get("end_angle"),
-                            "start_has_slope": part.get("start_has_slope", False),
-                            "end_has_slope": part.get("end_has_slope", False),
-                            "has_slope": part.get("start_has_slope", False) or part.get("end_has_slope", False),
-                            "complementary_pair": comp_pair_flag
-                        }
-                    })
-                    # CRITICAL: Add kerf to current_length if boundaries can't be shared
-                    current_length = new_length  # Includes part_length + kerf_mm
-                    total_parts_length += part_length  # Track individual part length (without kerf)
-                    cut_position += part_length + kerf_mm  # Position includes kerf
-                    parts_to_remove.append(part)
-                    
-                    part_id = part.get("product_id") or part.get("reference") or part.get("element_name") or "unknown"
-                    nesting_log(f"[NESTING] Added part {part_id} ({part_length:.1f}mm) + kerf ({kerf_mm:.1f}mm) to pattern - current_length: {current_length:.1f}mm / {best_stock:.0f}mm, parts in pattern: {len(pattern_parts)}")
-                    
-                    # FINAL CHECK: Ensure current_length hasn't exceeded stock (safety check)
-                    # Use tolerance to allow exact fits (when current_length == best_stock)
-                    tolerance_mm_check = 0.1
-                    if current_length > best_stock + tolerance_mm_check:
-                        part_id = part.get("product_id") or part.get("reference") or part.get("element_name") or "unknown"
-                        nesting_log(f"[NESTING] ERROR: After adding part {part_id}, current_length {current_length:.1f}mm exceeds stock {best_stock:.0f}mm - removing part")
-                        # Remove the part we just added
-                        pattern_parts = [pp for pp in pattern_parts if pp.get("part") != part]
-                        current_length -= (part_length + kerf_mm)
-                        total_parts_length -= part_length
-                        if part in parts_to_remove:
-                            parts_to_remove.remove(part)
-                        break  # Stop adding more parts
-                    elif abs(current_length - best_stock) <= tolerance_mm_check:
-                        # Bar is exactly full (within tolerance) - stop adding more parts but keep this part
-                        part_id = part.get("product_id") or part.get("reference") or part.get("element_name") or "unknown"
-                        nesting_log(f"[NESTING] Bar is exactly full after adding part {part_id} - current_length: {current_length:.1f}mm == {best_stock:.0f}mm (within tolerance), stopping part filling")
-                        break  # Stop adding more parts, but keep the part we just added
-                
-                # Remove used parts
-                for part in parts_to_remove:
-                    if part in remaining_parts:
-                        remaining_parts.remove(part)
-                
-                if not parts_to_remove:
-                    # No parts were processed - this shouldn't happen if stock selection is correct
-                    # Check if there are parts that don't fit
-                    if remaining_parts:
-                        first_part = remaining_parts[0]
-                        if first_part["length"] > best_stock:
-                            nesting_log(f"[NESTING] ERROR: Cannot process part {first_part.get('product_id', 'unknown')} (length: {first_part.get('length', 0):.1f}mm) - exceeds stock {best_stock:.0f}mm")
-                            # Remove it to prevent infinite loop
-                            remaining_parts.remove(first_part)
-                        else:
-                            nesting_log(f"[NESTING] WARNING: No parts processed in iteration despite parts fitting in stock")
-                            # Break to prevent infinite loop
-                            break
-                    else:
-                        # No parts remaining - break normally
-                        break
-                
-                # CRITICAL: Validate pattern before creating it
-                # 1. Must have at least one part
-                # 2. All parts must fit in stock length (individually)
-                # 3. TOTAL length of all parts must not exceed stock length
-                if not pattern_parts:
-                    nesting_log(f"[NESTING] WARNING: Pattern has no parts - skipping pattern creation")
-                    continue
-                
-                # Validate all parts fit in stock (individually)
-                invalid_parts = []
-                for pp in pattern_parts:
-                    part_length = pp.get("length", 0)
-                    if part_length > best_stock:
-                        part_obj = pp.get("part", {})
-                        part_id = part_obj.get("product_id") or part_obj.get("reference") or part_obj.get("element_name") or "unknown"
-                        reference = part_obj.get("reference")
-                        element_name = part_obj.get("element_name")
-                        invalid_parts.append({
-                            "part": part_id,
-                            "reference": reference,
-                            "element_name": element_name,
-                            "part_obj": part_obj,
-                            "length": part_length,
-                            "stock": best_stock
-                        })
-                
-                # CRITICAL: Validate TOTAL length doesn't exceed stock
-                # Use tolerance to allow exact fits (when current_length == best_stock)
-                tolerance_mm_validate = 0.1
-                
-                # Check if pattern has shared boundaries (complementary pairs)
-                # If current_length < total_parts_length, there are shared boundaries that saved material
-                has_shared_boundaries = current_length < total_parts_length - tolerance_mm_validate
-                
-                # PRIMARY VALIDATION: Always check current_length (actual material used)
-                # This is the correct check for patterns with shared boundaries
-                if current_length > best_stock + tolerance_mm_validate:
-                    nesting_log(f"[NESTING] ERROR: Pattern total length {current_length:.1f}mm exceeds stock {best_stock:.0f}mm")
-                    # List all parts in the pattern
-                    part_details = []
-                    for pp in pattern_parts:
-                        part_obj = pp.get("part", {})
-                        part_id = part_obj.get("product_id") or part_obj.get("reference") or part_obj.get("element_name") or "unknown"
-                        part_length = pp.get("length", 0)
-                        part_details.append(f"{part_id} ({part_length:.1f}mm)")
-                    nesting_log(f"[NESTING]   Parts in pattern: {', '.join(part_details)}")
-                    nesting_log(f"[NESTING]   Total current_length: {current_length:.1f}mm")
-                    nesting_log(f"[NESTING]   Total parts_length: {total_parts_length:.1f}mm")
-                    nesting_log(f"[NESTING]   Stock: {best_stock:.0f}mm")
-                    nesting_log(f"[NESTING]   Difference: {current_length - best_stock:.1f}mm")
-                    nesting_log(f"[NESTING] REJECTING this pattern - total length exceeds stock")
-                    
-                    # Add all parts to rejected list
-                    for pp in pattern_parts:
-                        part_obj = pp.get("part", {})
-                        product_id = part_obj.get("product_id")
-                        part_id = product_id or part_obj.get("reference") or part_obj.get("element_name") or "unknown"
-                        reference = part_obj.get("reference")
-                        element_name = part_obj.get("element_name")
-                        part_length = pp.get("length", 0)
-                        rejected_parts.append({
-                            "product_id": product_id,
-                            "part_id": part_id,
-                            "reference": reference,
-                            "element_name": element_name,
-                            "length": part_length,
-                            "stock_length": best_stock,
-                            "reason": f"Pattern total length ({current_length:.1f}mm) exceeds stock ({best_stock:.0f}mm)"
-                        })
-                    
-                    # Remove invalid parts from remaining_parts to prevent infinite loop
-                    for pp in pattern_parts:
-                        part_obj = pp.get("part")
-                        if part_obj and part_obj in remaining_parts:
-                            remaining_parts.remove(part_obj)
-                    continue  # Skip creating this pattern
-                
-                # SECONDARY VALIDATION: Check total_parts_length only if there are NO shared boundaries
-                # This catches the bug where parts are incorrectly combined without shared boundaries
-                # If has_shared_boundaries is True, we already validated current_length above, so skip this check
-                if not has_shared_boundaries and total_parts_length > best_stock + tolerance_mm_validate:
-                    nesting_log(f"[NESTING] ERROR: Pattern total parts length {total_parts_length:.1f}mm exceeds stock {best_stock:.0f}mm (no shared boundaries to reduce material)")
-                    part_details = []
-                    for pp in pattern_parts:
-                        part_obj = pp.get("part", {})
-                        part_id = part_obj.get("product_id") or part_obj.get("reference") or part_obj.get("element_name") or "unknown"
-                        part_length = pp.get("length", 0)
-                        part_details.append(f"{part_id} ({part_length:.1f}mm)")
-                    nesting_log(f"[NESTING]   Parts in pattern: {', '.join(part_details)}")
-                    nesting_log(f"[NESTING]   Total parts_length (sum of all individual parts): {total_parts_length:.1f}mm")
-                    nesting_log(f"[NESTING]   Current_length (no shared savings): {current_length:.1f}mm")
-                    nesting_log(f"[NESTING]   Stock: {best_stock:.0f}mm")
-                    nesting_log(f"[NESTING]   Difference: {total_parts_length - best_stock:.1f}mm")
-                    nesting_log(f"[NESTING] REJECTING this pattern - total parts length exceeds stock (no shared boundaries)")
-                    
-                    # Add all parts to rejected list
-                    for pp in pattern_parts:
-                        part_obj = pp.get("part", {})
-                        product_id = part_obj.get("product_id")
-                        part_id = product_id or part_obj.get("reference") or part_obj.get("element_name") or "unknown"
-                        reference = part_obj.get("reference")
-                        element_name = part_obj.get("element_name")
-                        part_length = pp.get("length", 0)
-                        rejected_parts.append({
-                            "product_id": product_id,
-                            "part_id": part_id,
-                            "reference": reference,
-                            "element_name": element_name,
-                            "length": part_length,
-                            "stock_length": best_stock,
-                            "reason": f"Pattern total parts length ({total_parts_length:.1f}mm) exceeds stock ({best_stock:.0f}mm) - no shared boundaries"
-                        })
-                    
-                    # Remove invalid parts from remaining_parts to prevent infinite loop
-                    for pp in pattern_parts:
-                        part_obj = pp.get("part")
-                        if part_obj and part_obj in remaining_parts:
-                            remaining_parts.remove(part_obj)
-                    continue  # Skip creating this pattern
-                
-                # ADDITIONAL VALIDATION: Check if current_length is unreasonably larger than total_parts_length
-                # This catches calculation errors where kerf is added incorrectly
-                max_expected_kerf = (len(pattern_parts) - 1) * 3.0  # Maximum kerf if NO boundaries can share
-                if current_length > total_parts_length + max_expected_kerf + 10.0:  # Allow 10mm tolerance
-                    nesting_log(f"[NESTING] ERROR: current_length ({current_length:.1f}mm) is unreasonably larger than total_parts_length ({total_parts_length:.1f}mm)")
-                    nesting_log(f"[NESTING]   - Expected max difference (all kerf, no sharing): {max_expected_kerf:.1f}mm")
-                    nesting_log(f"[NESTING]   - Actual difference: {current_length - total_parts_length:.1f}mm")
-                    nesting_log(f"[NESTING]   - This suggests a calculation error - rejecting pattern")
-                    
-                    # Add all parts to rejected list
-                    for pp in pattern_parts:
-                        part_obj = pp.get("part", {})
-                        product_id = part_obj.get("product_id")
-                        part_id = product_id or part_obj.get("reference") or part_obj.get("element_name") or "unknown"
-                        reference = part_obj.get("reference")
-                        element_name = part_obj.get("element_name")
-                        part_length = pp.get("length", 0)
-                        rejected_parts.append({
-                            "product_id": product_id,
-                            "part_id": part_id,
-                            "reference": reference,
-                            "element_name": element_name,
-                            "length": part_length,
-                            "stock_length": best_stock,
-                            "reason": f"Pattern calculation error: current_length ({current_length:.1f}mm) unreasonably exceeds total_parts_length ({total_parts_length:.1f}mm)"
-                        })
-                    
-                    # Remove invalid parts from remaining_parts to prevent infinite loop
-                    for pp in pattern_parts:
-                        part_obj = pp.get("part")
-                        if part_obj and part_obj in remaining_parts:
-                            remaining_parts.remove(part_obj)
-                    continue  # Skip creating this pattern
-                
-                if invalid_parts:
-                    nesting_log(f"[NESTING] ERROR: Pattern contains {len(invalid_parts)} parts that exceed stock length {best_stock:.0f}mm:")
-                    for ip in invalid_parts:
-                        part_obj = ip.get('part_obj', {})
-                        product_id = part_obj.get("product_id") if isinstance(part_obj, dict) else None
-                        nesting_log(f"[NESTING]   - Part {ip['part']}: {ip['length']:.1f}mm > {ip['stock']:.0f}mm")
-                        # Add to rejected parts list
-                        rejected_parts.append({
-                            "product_id": product_id,
-                            "part_id": ip['part'],
-                            "reference": ip.get('reference'),
-                            "element_name": ip.get('element_name'),
-                            "length": ip['length'],
-                            "stock_length": ip['stock'],
-                            "reason": f"Part length ({ip['length']:.1f}mm) exceeds selected stock ({ip['stock']:.0f}mm)"
-                        })
-                    nesting_log(f"[NESTING] REJECTING this pattern - parts exceed stock length")
-                    # Remove invalid parts from remaining_parts to prevent infinite loop
-                    for pp in pattern_parts:
-                        part_obj = pp.get("part")
-                        if part_obj and part_obj in remaining_parts:
-                            remaining_parts.remove(part_obj)
-                    continue  # Skip creating this pattern
-                
-                # Calculate waste exactly: stock length minus actual material used (accounting for shared cuts)
-                # Use current_length (actual material used with shared cut overlap subtracted) for waste calculation
-                # When parts have complementary slopes, the shared cut overlap reduces the actual material needed
-                # If actual material used equals stock length, waste is 0
-                # No tolerances - calculate the exact unused material in the stock bar
-                actual_material_used = min(current_length, best_stock)  # Cap at stock length for oversized parts
-                waste = best_stock - actual_material_used  # Exact calculation: stock minus actual material used (with shared cuts)
-                waste_percentage = (waste / best_stock * 100) if best_stock > 0 else 0
-                
-                nesting_log(f"[NESTING] Pattern waste calculation: best_stock={best_stock:.1f}mm, current_length={current_length:.1f}mm, actual_material_used={actual_material_used:.1f}mm, waste={waste:.1f}mm ({waste_percentage:.2f}%)", flush=True)
-                
-                # DEBUG: Log detailed pattern information to diagnose issues
-                nesting_log(f"[NESTING] Pattern validation details:", flush=True)
-                nesting_log(f"[NESTING]   - Number of parts: {len(pattern_parts)}", flush=True)
-                nesting_log(f"[NESTING]   - Total parts_length (sum of individual parts): {total_parts_length:.1f}mm", flush=True)
-                nesting_log(f"[NESTING]   - Current_length (with kerf/shared savings): {current_length:.1f}mm", flush=True)
-                nesting_log(f"[NESTING]   - Difference: {current_length - total_parts_length:.1f}mm", flush=True)
-                nesting_log(f"[NESTING]   - Stock length: {best_stock:.1f}mm", flush=True)
-                if current_length > total_parts_length:
-                    expected_kerf = (len(pattern_parts) - 1) * 3.0  # Maximum kerf if no boundaries can share
-                    nesting_log(f"[NESTING]   - WARNING: current_length > total_parts_length by {current_length - total_parts_length:.1f}mm", flush=True)
-                    nesting_log(f"[NESTING]   - Expected max kerf (if no sharing): {expected_kerf:.1f}mm", flush=True)
-                    nesting_log(f"[NESTING]   - Actual difference: {current_length - total_parts_length:.1f}mm", flush=True)
-                    if (current_length - total_parts_length) > expected_kerf + 10.0:  # Allow 10mm tolerance
-                        nesting_log(f"[NESTING]   - ERROR: Difference is too large - possible calculation error!", flush=True)
-                
-                cutting_patterns.append({
-                    "stock_length": best_stock,
-                    "parts": pattern_parts,
-                    "waste": waste,
-                    "waste_percentage": waste_percentage
-                })
-                
-                # Track stock usage
-                if best_stock not in stock_lengths_used:
-                    stock_lengths_used[best_stock] = 0
-                stock_lengths_used[best_stock] += 1
-                total_stock_bars += 1
-                total_waste += waste
-            
-            # Calculate totals for this profile
-            # Count actual parts in cutting patterns (not original parts list, as some may be paired)
+            # Get Reference from property sets (this is what shows in the right-click panel)
+            reference = None
             try:
-                total_parts_in_patterns = sum(len(pattern.get("parts", [])) for pattern in cutting_patterns)
-                total_parts_profile = total_parts_in_patterns if total_parts_in_patterns > 0 else len(parts)
-            except (KeyError, TypeError):
-                # Fallback to original parts count if cutting_patterns structure is unexpected
-                total_parts_profile = len(parts)
-            total_length_profile = sum(p["length"] for p in parts)
-            total_waste_profile = sum(pattern.get("waste", 0.0) for pattern in cutting_patterns)
-            total_stock_length_for_profile = sum(pattern.get("stock_length", 0.0) for pattern in cutting_patterns)
-            total_waste_percentage_profile = (total_waste_profile / total_stock_length_for_profile * 100) if total_stock_length_for_profile > 0 else 0
-            
-            profile_nestings.append({
-                "profile_name": profile_name,
-                "total_parts": total_parts_profile,
-                "total_length": total_length_profile,
-                "stock_lengths_used": {str(k): int(v) for k, v in stock_lengths_used.items()},
-                "cutting_patterns": cutting_patterns,
-                "total_waste": total_waste_profile,
-                "total_waste_percentage": total_waste_percentage_profile,
-                "rejected_parts": rejected_parts  # Parts that cannot be nested (exceed stock length)
-            })
+                psets = ifcopenshell.util.element.get_psets(element)
+                # Search through all property sets for "Reference" (case-insensitive)
+                for pset_name, props in psets.items():
+                    props_dict = dict(props)
+                    # Try exact match first
+                    if 'Reference' in props_dict:
+                        ref_value = props_dict['Reference']
+                        if ref_value and str(ref_value).strip() and str(ref_value).upper() not in ['NONE', 'NULL', 'N/A', '']:
+                            reference = str(ref_value).strip()
+                            break
+                    # Try case-insensitive match
+                    for key, value in props_dict.items():
+                        if key.lower() == 'reference':
+                            if value and str(value).strip() and str(value).upper() not in ['NONE', 'NULL', 'N/A', '']:
+                                reference = str(value).strip()
+                                break
+                    if reference:
+                        break
+            except Exception as e:
+                nesting_log("[NESTING] Error getting Reference from property sets for element %s: %s", element.id(), e)
+                pass
+            
+            # Store part with slope information
+            # Use base_profile_name for grouping (merges beam/column/member with same profile)
+            if base_profile_name not in parts_by_profile:
+                parts_by_profile[base_profile_name] = []
+                nesting_log("[NESTING] Created new profile group: %s", base_profile_name)
+            
+            part_data = NestingPart(
+                product_id=element.id(),
+                profile_name=base_profile_name,  # Use base name for nesting grouping
+                original_profile_name=profile_name_from_element,  # Keep original from element for reference
+                element_type=element_type,
+                length=length_mm,
+                assembly_mark=assembly_mark if assembly_mark != "N/A" else None,
+                element_name=element_name,
+                reference=reference,
+                start_angle=float(start_angle) if start_angle is not None else None,
+                end_angle=float(end_angle) if end_angle is not None else None,
+                start_has_slope=bool(start_has_slope),
+                end_has_slope=bool(end_has_slope),
+                start_confidence=float(start_confidence),
+                end_confidence=float(end_confidence)
+                # Note: cut_piece.to_dict() removed to avoid JSON serialization issues with numpy arrays
+            )
             
-            total_parts += total_parts_profile
+            parts_by_profile[base_profile_name].append(part_data)
+        
+        # Log parts found and show merging summary
+        if ENABLE_NESTING_LOGS:
+            nesting_log("[NESTING] Found parts by profile (after merging by base profile name):")
+            for prof_name, prof_parts in parts_by_profile.items():
+                # Count element types in this merged group
+                element_types = {}
+                for part in prof_parts:
+                    elem_type = part.element_type
+                    element_types[elem_type] = element_types.get(elem_type, 0) + 1
+                
+                type_summary = ", ".join([f"{k}: {v}" for k, v in element_types.items()])
+                nesting_log("[NESTING]   %s: %s parts total (merged from: %s)", prof_name, len(prof_parts), type_summary)
+        
+        # Check if we found any parts
+        if not parts_by_profile:
+            raise HTTPException(
+                status_code=400, 
+                detail=f"No parts found for selected profiles: {selected_profiles}. Make sure the profiles exist in the IFC file."
+            )
+        
+        # Generate nesting for each profile
+        profile_nestings = []
+        total_stock_bars = 0
+        total_waste = 0.0
+        total_parts = 0
+        total_stock_length_used = 0.0
+        
+        # Parts are already grouped by profile, so complementary pairs never cross profiles and the
+        # profile depth used for the shared-slope length only needs to be estimated once per group
+        profile_jobs = []
+        for profile_name, parts in parts_by_profile.items():
+            if not parts:
+                nesting_log("[NESTING] Warning: No parts found for profile %s", profile_name)
+                continue
+            # Use CutPieceExtractor's method for generic profile depth estimation
+            # This handles all profile types: IPE, HEA, RHS, SHS, CHS, Pipes (Ø), etc.
+            if extractor:
+                estimated_profile_depth = extractor._get_estimated_profile_depth(profile_name)
+            else:
+                # Fallback: use simple regex-based detection if extractor is not available
+                estimated_profile_depth = estimate_profile_depth_fallback(profile_name)
+            profile_jobs.append((profile_name, parts, estimated_profile_depth, stock_lengths_list, use_column_generation))
+        
+        # Nest profiles in worker processes when there is enough work to pay for the hand-off
+        if NESTING_WORKERS > 1 and len(profile_jobs) > 1 and sum(len(job[1]) for job in profile_jobs) >= _PARALLEL_NESTING_MIN_PARTS:
+            loop = asyncio.get_running_loop()
+            pool = get_nesting_pool()
+            try:
+                profile_results = await asyncio.gather(*(loop.run_in_executor(pool, nest_profile, *job) for job in profile_jobs))
+            except BrokenProcessPool:
+                # A worker died - drop the broken pool so later requests get a new one, and nest here instead
+                nesting_log("[NESTING] Warning: Nesting worker pool broke, nesting in-process")
+                reset_nesting_pool()
+                profile_results = [nest_profile(*job) for job in profile_jobs]
+        else:
+            profile_results = [nest_profile(*job) for job in profile_jobs]
+        
+        for profile_nesting, total_stock_length_for_profile in profile_results:
+            profile_nestings.append(profile_nesting)
+            total_stock_bars += len(profile_nesting["cutting_patterns"])
+            total_waste += profile_nesting["total_waste"]
+            total_parts += profile_nesting["total_parts"]
+            total_stock_length_used += total_stock_length_for_profile
         
         # Calculate summary - average waste percentage
-        total_stock_length_used = sum(
-            float(stock_len) * count
-            for profile in profile_nestings
-            for stock_len, count in profile["stock_lengths_used"].items()
-        )
         average_waste_percentage = (total_waste / total_stock_length_used * 100) if total_stock_length_used > 0 else 0
         
         nesting_report = {
@@ -4349,12 +4799,21 @@ async def generate_nesting(filename: str, stock_lengths: str, profiles: str):
             }
         }
         
-        return JSONResponse(nesting_report)
+        response = ORJSONResponse(nesting_report)
+        if cache_path is not None:
+            # Write to a temp file and rename so a concurrent request never reads a partial report
+            try:
+                tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+                tmp_path.write_bytes(response.body)
+                os.replace(tmp_path, cache_path)
+                prune_nesting_cache()
+            except OSError as e:
+                nesting_log(f"[NESTING] Warning: Could not write nesting cache: {e}")
+        return response
         
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
         error_trace = traceback.format_exc()
         error_msg = str(e)
         nesting_log(f"[NESTING] ===== ERROR OCCURRED =====")
@@ -4372,7 +4831,6 @@ async def generate_nesting(filename: str, stock_lengths: str, profiles: str):
 @app.get("/api/debug-assembly-name/{filename}")
 async def debug_assembly_name(filename: str, product_id: int = None):
     """Debug endpoint to find where assembly names are stored by comparing multiple products."""
-    from urllib.parse import unquote
     decoded_filename = unquote(filename)
     file_path = IFC_DIR / decoded_filename
     
@@ -4423,7 +4881,7 @@ async def debug_assembly_name(filename: str, product_id: int = None):
             
             debug_info["products"].append(product_info)
         
-        return JSONResponse(debug_info)
+        return ORJSONResponse(debug_info)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
@@ -4431,7 +4889,6 @@ async def debug_assembly_name(filename: str, product_id: int = None):
 @app.get("/api/debug-assembly-grouping/{filename}")
 async def debug_assembly_grouping(filename: str, product_id: int = None):
     """Debug endpoint to find where Tekla stores assembly grouping information."""
-    from urllib.parse import unquote
     decoded_filename = unquote(filename)
     file_path = IFC_DIR / decoded_filename
     
@@ -4443,18 +4900,59 @@ async def debug_assembly_grouping(filename: str, product_id: int = None):
         resolved_path = file_path.resolve()
         ifc_file = ifcopenshell.open(str(resolved_path))
         
+        # get_assembly_info() walks the aggregation relationships and property sets,
+        # so remember its result per product for the rest of this request
+        assembly_info_by_id: Dict[int, tuple] = {}
+        
+        def cached_assembly_info(element) -> tuple:
+            info = assembly_info_by_id.get(element.id())
+            if info is None:
+                info = assembly_info_by_id[element.id()] = get_assembly_info(element)
+            return info
+        
+        # Same for the property sets, which are read for the listed assemblies and the requested product
+        psets_by_id: Dict[int, dict] = {}
+        
+        def cached_psets(element) -> dict:
+            psets = psets_by_id.get(element.id())
+            if psets is None:
+                psets = psets_by_id[element.id()] = ifcopenshell.util.element.get_psets(element) or {}
+            return psets
+        
+        def entity_summary(entity) -> dict:
+            """id/type/tag/name of a related entity (all None when the relationship has no entity)."""
+            if entity is None:
+                return {"id": None, "type": None, "tag": None, "name": None}
+            return {
+                "id": entity.id(),
+                "type": entity.is_a(),
+                "tag": getattr(entity, 'Tag', None),
+                "name": getattr(entity, 'Name', None)
+            }
+        
+        # Query each entity type once and reuse the lists for the counts and scans below
+        all_products = ifc_file.by_type("IfcProduct")
+        assemblies = ifc_file.by_type("IfcElementAssembly")
+        all_aggregates = ifc_file.by_type("IfcRelAggregates")
+        
         result = {
             "filename": decoded_filename,
-            "total_products": len(list(ifc_file.by_type("IfcProduct"))),
-            "total_assemblies": len(list(ifc_file.by_type("IfcElementAssembly"))),
-            "total_rel_aggregates": len(list(ifc_file.by_type("IfcRelAggregates"))),
+            "total_products": len(all_products),
+            "total_assemblies": len(assemblies),
+            "total_rel_aggregates": len(all_aggregates),
             "ifc_element_assemblies": [],
             "rel_aggregates": [],
             "product_details": None
         }
         
+        # Map each relating object to its IfcRelAggregates once, instead of rescanning them per assembly
+        aggregates_by_relating: Dict[int, list] = {}
+        for rel in all_aggregates:
+            relating_object = rel.RelatingObject
+            if relating_object is not None:
+                aggregates_by_relating.setdefault(relating_object.id(), []).append(rel)
+        
         # Get all IfcElementAssembly objects
-        assemblies = ifc_file.by_type("IfcElementAssembly")
         for assembly in assemblies[:10]:  # First 10
             assembly_info = {
                 "id": assembly.id(),
@@ -4466,49 +4964,35 @@ async def debug_assembly_grouping(filename: str, product_id: int = None):
             
             # Get property sets
             try:
-                psets = ifcopenshell.util.element.get_psets(assembly)
+                psets = cached_psets(assembly)
                 assembly_info["property_sets"] = {name: dict(props) for name, props in psets.items()}
             except:
                 pass
             
             # Find parts in this assembly
             parts_in_assembly = []
-            for rel in ifc_file.by_type("IfcRelAggregates"):
-                if rel.RelatingObject.id() == assembly.id():
-                    for part in rel.RelatedObjects:
-                        if part.is_a("IfcProduct"):
-                            parts_in_assembly.append({
-                                "id": part.id(),
-                                "type": part.is_a(),
-                                "tag": getattr(part, 'Tag', None),
-                                "name": getattr(part, 'Name', None)
-                            })
+            for rel in aggregates_by_relating.get(assembly.id(), ()):
+                for part in rel.RelatedObjects:
+                    if part.is_a("IfcProduct"):
+                        parts_in_assembly.append({
+                            "id": part.id(),
+                            "type": part.is_a(),
+                            "tag": getattr(part, 'Tag', None),
+                            "name": getattr(part, 'Name', None)
+                        })
             assembly_info["parts"] = parts_in_assembly
             assembly_info["part_count"] = len(parts_in_assembly)
             
             result["ifc_element_assemblies"].append(assembly_info)
         
         # Get all IfcRelAggregates relationships
-        for rel in list(ifc_file.by_type("IfcRelAggregates"))[:20]:  # First 20
+        for rel in all_aggregates[:20]:  # First 20
             rel_info = {
                 "id": rel.id(),
-                "relating_object": {
-                    "id": rel.RelatingObject.id() if rel.RelatingObject else None,
-                    "type": rel.RelatingObject.is_a() if rel.RelatingObject else None,
-                    "tag": getattr(rel.RelatingObject, 'Tag', None) if rel.RelatingObject else None,
-                    "name": getattr(rel.RelatingObject, 'Name', None) if rel.RelatingObject else None
-                },
-                "related_objects": []
+                "relating_object": entity_summary(rel.RelatingObject),
+                "related_objects": [entity_summary(obj) for obj in rel.RelatedObjects]
             }
             
-            for obj in rel.RelatedObjects:
-                rel_info["related_objects"].append({
-                    "id": obj.id(),
-                    "type": obj.is_a(),
-                    "tag": getattr(obj, 'Tag', None),
-                    "name": getattr(obj, 'Name', None)
-                })
-            
             result["rel_aggregates"].append(rel_info)
         
         # If product_id is provided, get detailed info about that product
@@ -4521,7 +5005,7 @@ async def debug_assembly_grouping(filename: str, product_id: int = None):
                     "tag": getattr(product, 'Tag', None),
                     "name": getattr(product, 'Name', None),
                     "description": getattr(product, 'Description', None),
-                    "property_sets": {},
+                    "property_sets_full": {},
                     "relationships": {
                         "decomposes": [],
                         "contained_in_structure": [],
@@ -4533,85 +5017,49 @@ async def debug_assembly_grouping(filename: str, product_id: int = None):
                 
                 # Get all property sets with full details
                 try:
-                    psets = ifcopenshell.util.element.get_psets(product)
-                    # Include all property values, not just keys
-                    product_info["property_sets"] = {name: dict(props) for name, props in psets.items()}
-                    product_info["property_sets_full"] = {}
+                    psets = cached_psets(product)
+                    # Include all property values with their types; the string form is only
+                    # added for values that aren't plain JSON scalars
                     for pset_name, props in psets.items():
-                        product_info["property_sets_full"][pset_name] = {}
+                        pset_values = product_info["property_sets_full"][pset_name] = {}
                         for key, value in props.items():
-                            product_info["property_sets_full"][pset_name][key] = {
-                                "value": value,
-                                "type": type(value).__name__,
-                                "string_repr": str(value) if value is not None else None
-                            }
+                            entry = {"value": value, "type": type(value).__name__}
+                            if not (value is None or isinstance(value, (str, int, float, bool))):
+                                entry["string_repr"] = str(value)
+                            pset_values[key] = entry
                 except Exception as e:
                     product_info["property_sets_error"] = str(e)
                 
                 # Check Decomposes (part belongs to assembly)
-                if hasattr(product, 'Decomposes'):
-                    for rel in product.Decomposes or []:
-                        rel_data = {
-                            "type": rel.is_a(),
-                            "relating_object": {
-                                "id": rel.RelatingObject.id() if rel.RelatingObject else None,
-                                "type": rel.RelatingObject.is_a() if rel.RelatingObject else None,
-                                "tag": getattr(rel.RelatingObject, 'Tag', None) if rel.RelatingObject else None,
-                                "name": getattr(rel.RelatingObject, 'Name', None) if rel.RelatingObject else None
-                            }
-                        }
-                        product_info["relationships"]["decomposes"].append(rel_data)
+                for rel in getattr(product, 'Decomposes', None) or ():
+                    product_info["relationships"]["decomposes"].append({
+                        "type": rel.is_a(),
+                        "relating_object": entity_summary(rel.RelatingObject)
+                    })
                 
                 # Check ContainedInStructure (spatial containment)
-                if hasattr(product, 'ContainedInStructure'):
-                    for rel in product.ContainedInStructure or []:
-                        rel_data = {
-                            "type": rel.is_a(),
-                            "relating_structure": {
-                                "id": rel.RelatingStructure.id() if rel.RelatingStructure else None,
-                                "type": rel.RelatingStructure.is_a() if rel.RelatingStructure else None,
-                                "tag": getattr(rel.RelatingStructure, 'Tag', None) if rel.RelatingStructure else None,
-                                "name": getattr(rel.RelatingStructure, 'Name', None) if rel.RelatingStructure else None
-                            }
-                        }
-                        product_info["relationships"]["contained_in_structure"].append(rel_data)
+                for rel in getattr(product, 'ContainedInStructure', None) or ():
+                    product_info["relationships"]["contained_in_structure"].append({
+                        "type": rel.is_a(),
+                        "relating_structure": entity_summary(rel.RelatingStructure)
+                    })
                 
                 # Check HasAssignments (various assignments)
-                if hasattr(product, 'HasAssignments'):
-                    for assignment in product.HasAssignments or []:
-                        assignment_data = {
-                            "type": assignment.is_a(),
-                            "related_objects": []
-                        }
-                        if hasattr(assignment, 'RelatedObjects'):
-                            for obj in assignment.RelatedObjects or []:
-                                assignment_data["related_objects"].append({
-                                    "id": obj.id(),
-                                    "type": obj.is_a(),
-                                    "tag": getattr(obj, 'Tag', None),
-                                    "name": getattr(obj, 'Name', None)
-                                })
-                        product_info["relationships"]["has_assignments"].append(assignment_data)
+                for assignment in getattr(product, 'HasAssignments', None) or ():
+                    product_info["relationships"]["has_assignments"].append({
+                        "type": assignment.is_a(),
+                        "related_objects": [entity_summary(obj) for obj in getattr(assignment, 'RelatedObjects', None) or ()]
+                    })
                 
                 # Check IsDecomposedBy (this product is an assembly containing parts)
-                if hasattr(product, 'IsDecomposedBy'):
-                    for rel in product.IsDecomposedBy or []:
-                        rel_data = {
-                            "type": rel.is_a(),
-                            "related_objects": []
-                        }
-                        if hasattr(rel, 'RelatedObjects'):
-                            for obj in rel.RelatedObjects or []:
-                                rel_data["related_objects"].append({
-                                    "id": obj.id(),
-                                    "type": obj.is_a(),
-                                    "tag": getattr(obj, 'Tag', None),
-                                    "name": getattr(obj, 'Name', None)
-                                })
-                        product_info["relationships"]["is_decomposed_by"].append(rel_data)
+                for rel in getattr(product, 'IsDecomposedBy', None) or ():
+                    product_info["relationships"]["is_decomposed_by"].append({
+                        "type": rel.is_a(),
+                        "related_objects": [entity_summary(obj) for obj in getattr(rel, 'RelatedObjects', None) or ()]
+                    })
                 
                 # Get assembly info using our function
-                assembly_mark, assembly_id = get_assembly_info(product)
+                assembly_mark, assembly_id = cached_assembly_info(product)
                 product_info["assembly_info"] = {
                     "assembly_mark": assembly_mark,
                     "assembly_id": assembly_id,
@@ -4620,17 +5068,21 @@ async def debug_assembly_grouping(filename: str, product_id: int = None):
                 
                 # Try to find other products with the same assembly mark
                 if assembly_mark and assembly_mark != "N/A":
-                    same_mark_products = []
-                    for other_product in ifc_file.by_type("IfcProduct"):
-                        if other_product.id() != product_id:
-                            other_mark, _ = get_assembly_info(other_product)
-                            if other_mark == assembly_mark:
-                                same_mark_products.append({
-                                    "id": other_product.id(),
-                                    "type": other_product.is_a(),
-                                    "tag": getattr(other_product, 'Tag', None),
-                                    "name": getattr(other_product, 'Name', None)
-                                })
+                    # Index the products by assembly mark in one pass, then look the mark up
+                    products_by_mark: Dict[str, list] = {}
+                    for other_product in all_products:
+                        other_mark, _ = cached_assembly_info(other_product)
+                        products_by_mark.setdefault(other_mark, []).append(other_product)
+                    same_mark_products = [
+                        {
+                            "id": other_product.id(),
+                            "type": other_product.is_a(),
+                            "tag": getattr(other_product, 'Tag', None),
+                            "name": getattr(other_product, 'Name', None)
+                        }
+                        for other_product in products_by_mark.get(assembly_mark, ())
+                        if other_product.id() != product_id
+                    ]
                     product_info["assembly_info"]["products_with_same_mark"] = same_mark_products
                     product_info["assembly_info"]["same_mark_count"] = len(same_mark_products)
                 
@@ -4639,19 +5091,28 @@ async def debug_assembly_grouping(filename: str, product_id: int = None):
             except Exception as e:
                 result["product_details"] = {"error": f"Failed to get product {product_id}: {str(e)}"}
         
-        return JSONResponse(result)
+        return ORJSONResponse(result)
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Debug failed: {str(e)}")
 
 
+# Attributes of the IFC profile definitions (I, L, T, U, C, Z, rectangle, circle and hollow
+# variants) reported by the profile debug endpoint
+_PROFILE_ATTRS = (
+    "ProfileType", "ProfileName", "Position",
+    "OverallWidth", "OverallDepth", "WebThickness", "FlangeThickness", "FilletRadius",
+    "FlangeEdgeRadius", "FlangeSlope", "Depth", "Width", "Thickness", "FlangeWidth",
+    "EdgeRadius", "LegSlope", "WallThickness", "Girth", "InternalFilletRadius",
+    "XDim", "YDim", "InnerFilletRadius", "OuterFilletRadius", "Radius",
+)
+
+
 @app.get("/api/debug-profile/{filename}")
 async def debug_profile_extraction(filename: str):
     """Debug endpoint to see how profile names are extracted from IFC file."""
-    from urllib.parse import unquote
     decoded_filename = unquote(filename)
     file_path = IFC_DIR / decoded_filename
     
@@ -4663,9 +5124,11 @@ async def debug_profile_extraction(filename: str):
         resolved_path = file_path.resolve()
         ifc_file = ifcopenshell.open(str(resolved_path))
         
+        all_products = ifc_file.by_type("IfcProduct")
+        
         # Get a sample of beams/columns/members
         elements = []
-        for element in ifc_file.by_type("IfcProduct"):
+        for element in all_products:
             element_type = element.is_a()
             if element_type in {"IfcBeam", "IfcColumn", "IfcMember"}:
                 elements.append(element)
@@ -4696,6 +5159,9 @@ async def debug_profile_extraction(filename: str):
             try:
                 if hasattr(element, "Representation") and element.Representation:
                     rep_info = []
+                    # Like get_profile_name, stop at the first item that yields a profile name -
+                    # later items and representations are not consulted by the extraction
+                    profile_found = False
                     for rep in element.Representation.Representations or []:
                         rep_item = {
                             "identifier": getattr(rep, "RepresentationIdentifier", None),
@@ -4710,21 +5176,15 @@ async def debug_profile_extraction(filename: str):
                                 if hasattr(item, "SweptArea") and item.SweptArea:
                                     swept = item.SweptArea
                                     item_info["swept_area_type"] = swept.is_a()
-                                    # Get all attributes of the swept area
-                                    swept_attrs = {}
-                                    for attr in dir(swept):
-                                        if not attr.startswith('_') and not callable(getattr(swept, attr, None)):
-                                            try:
-                                                value = getattr(swept, attr, None)
-                                                if value is not None:
-                                                    swept_attrs[attr] = str(value)
-                                            except:
-                                                pass
-                                    item_info["swept_area_attributes"] = swept_attrs
+                                    # Get the profile attributes of the swept area
+                                    item_info["swept_area_attributes"] = {
+                                        attr: str(value) for attr in _PROFILE_ATTRS if (value := getattr(swept, attr, None)) is not None
+                                    }
                                     if hasattr(swept, "ProfileType"):
                                         item_info["profile_type"] = str(swept.ProfileType)
                                     if hasattr(swept, "ProfileName"):
                                         item_info["profile_name"] = str(swept.ProfileName)
+                                        profile_found = bool(swept.ProfileName)
                             elif item.is_a("IfcBooleanClippingResult"):
                                 # Traverse FirstOperand to find the actual geometry
                                 if hasattr(item, "FirstOperand"):
@@ -4734,399 +5194,416 @@ async def debug_profile_extraction(filename: str):
                                         if hasattr(first_op, "SweptArea") and first_op.SweptArea:
                                             swept = first_op.SweptArea
                                             item_info["nested_swept_area_type"] = swept.is_a()
-                                            # Get all attributes
-                                            swept_attrs = {}
-                                            for attr in dir(swept):
-                                                if not attr.startswith('_') and not callable(getattr(swept, attr, None)):
-                                                    try:
-                                                        value = getattr(swept, attr, None)
-                                                        if value is not None:
-                                                            swept_attrs[attr] = str(value)
-                                                    except:
-                                                        pass
-                                            item_info["nested_swept_area_attributes"] = swept_attrs
+                                            # Get the profile attributes
+                                            item_info["nested_swept_area_attributes"] = {
+                                                attr: str(value) for attr in _PROFILE_ATTRS if (value := getattr(swept, attr, None)) is not None
+                                            }
                                             if hasattr(swept, "ProfileName"):
                                                 item_info["nested_profile_name"] = str(swept.ProfileName)
+                                                profile_found = bool(swept.ProfileName)
                                             if hasattr(swept, "ProfileType"):
                                                 item_info["nested_profile_type"] = str(swept.ProfileType)
                             rep_item["items"].append(item_info)
+                            if profile_found:
+                                break
                         rep_info.append(rep_item)
+                        if profile_found:
+                            break
                     element_info["representation_info"] = rep_info
             except Exception as e:
                 element_info["representation_error"] = str(e)
             
             debug_info.append(element_info)
         
-        return JSONResponse({
-            "total_elements": len(list(ifc_file.by_type("IfcProduct"))),
+        return ORJSONResponse({
+            "total_elements": len(all_products),
             "sample_elements": debug_info
         })
     except Exception as e:
-        import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Debug failed: {str(e)}")
 
 
-@app.get("/api/assembly-parts/{filename}")
-async def get_assembly_parts(filename: str, product_id: int = None, assembly_mark: str = None, assembly_id: int = None):
-    """Get all product IDs that belong to the same assembly."""
-    print(f"\n{'='*60}")
-    print(f"[ASSEMBLY-PARTS] ENDPOINT CALLED!")
-    print(f"[ASSEMBLY-PARTS] filename={filename}")
-    print(f"[ASSEMBLY-PARTS] product_id={product_id}")
-    print(f"[ASSEMBLY-PARTS] assembly_mark={assembly_mark}")
-    print(f"[ASSEMBLY-PARTS] assembly_id={assembly_id}")
-    print(f"{'='*60}\n")
-    
-    from urllib.parse import unquote
-    decoded_filename = unquote(filename)
-    file_path = IFC_DIR / decoded_filename
+# Property value heuristics shared by the assembly name lookups
+_EMPTY_PROPERTY_VALUES = frozenset(['NONE', 'NULL', 'N/A', ''])
+_GUID_RE = re.compile(r'ID(?=.*-).{19}', re.DOTALL)  # starts with "ID", contains a dash, longer than 20 chars
+_PART_REF_RE = re.compile(r'[Bb]\d{1,3}\Z')  # part references like "b31"
+_ASSEMBLY_KEY_RE = re.compile(r'assembly|mark|group', re.IGNORECASE)
+_ASSEMBLY_NAME_KEY_RE = re.compile(r'assembly|mark|group|name', re.IGNORECASE)
+
+
+def extract_assembly_name_from_psets(psets: Dict[str, dict]) -> str | None:
+    """First assembly/mark/group property value that looks like an assembly name (not a GUID or part ref).
     
-    print(f"[ASSEMBLY-PARTS] Decoded filename: {decoded_filename}")
-    print(f"[ASSEMBLY-PARTS] File path: {file_path}")
-    print(f"[ASSEMBLY-PARTS] File exists: {file_path.exists()}")
+    Used by get_assembly_parts to group products by the assembly name found for the clicked product.
+    """
+    for props in psets.values():
+        for key, value in props.items():
+            # Only keys that suggest an assembly name are candidates
+            if not value or not _ASSEMBLY_KEY_RE.search(key):
+                continue
+            value_str = str(value).strip()
+            # Skip N/A, empty values, GUIDs and part references (like "b31")
+            if (len(value_str) > 20 or value_str.upper() in _EMPTY_PROPERTY_VALUES
+                    or _GUID_RE.match(value_str) or _PART_REF_RE.match(value_str)):
+                continue
+            return value_str
+    return None
+
+
+def aggregated_product_ids(assembly) -> tuple:
+    """Ids of the IfcProduct parts aggregated by assembly, following IsDecomposedBy (no file scan).
     
-    if not file_path.exists():
-        print(f"[ASSEMBLY-PARTS] ERROR: File not found!")
-        raise HTTPException(status_code=404, detail="IFC file not found")
+    Each IfcRelAggregates is filtered once into a tuple; non-product related objects are skipped.
+    """
+    part_ids = ()
+    for rel in getattr(assembly, 'IsDecomposedBy', None) or ():
+        if rel.is_a("IfcRelAggregates"):
+            part_ids += tuple(part.id() for part in rel.RelatedObjects if part.is_a("IfcProduct"))
+    return part_ids
+
+
+def iter_assembly_part_ids(ifc_file, product_id: int = None, assembly_mark: str = None, assembly_id: int = None):
+    """Yield the ids of the products in the same assembly, each once, as soon as they are found.
     
-    try:
-        print(f"[ASSEMBLY-PARTS] Opening IFC file...")
-        # Resolve path to absolute for Windows compatibility
-        resolved_path = file_path.resolve()
-        ifc_file = ifcopenshell.open(str(resolved_path))
-        print(f"[ASSEMBLY-PARTS] IFC file opened successfully")
-        product_ids = []
-        
-        print(f"[ASSEMBLY-PARTS] Request: product_id={product_id}, assembly_mark={assembly_mark}, assembly_id={assembly_id}")
-        
-        # If assembly_id is provided, find all parts in that assembly
-        if assembly_id is not None:
-            try:
-                assembly = ifc_file.by_id(assembly_id)
-                print(f"[ASSEMBLY-PARTS] Found assembly object: {assembly.is_a() if assembly else 'None'}")
-                if assembly and assembly.is_a('IfcElementAssembly'):
-                    # Find all parts aggregated by this assembly
-                    for rel in ifc_file.by_type("IfcRelAggregates"):
-                        if rel.RelatingObject.id() == assembly_id:
-                            print(f"[ASSEMBLY-PARTS] Found IfcRelAggregates with {len(rel.RelatedObjects)} parts")
-                            for part in rel.RelatedObjects:
-                                if part.is_a("IfcProduct"):
-                                    product_ids.append(part.id())
-            except Exception as e:
-                print(f"[ASSEMBLY-PARTS] Error with assembly_id: {e}")
-        
-        # If product_id is provided, find the assembly it belongs to
-        elif product_id is not None:
-            try:
-                product = ifc_file.by_id(product_id)
-                print(f"[ASSEMBLY-PARTS] Found product: {product.is_a() if product else 'None'}")
-                
-                # First, check if there are any IfcElementAssembly objects in the file
-                assemblies = ifc_file.by_type("IfcElementAssembly")
-                print(f"[ASSEMBLY-PARTS] Found {len(assemblies)} IfcElementAssembly objects in file")
-                
-                # Find the assembly this product belongs to via IfcRelAggregates
-                if hasattr(product, 'Decomposes'):
-                    print(f"[ASSEMBLY-PARTS] Product has Decomposes attribute, checking relationships...")
-                    decomposes_list = product.Decomposes or []
-                    print(f"[ASSEMBLY-PARTS] Found {len(decomposes_list)} Decomposes relationships")
+    Backs both get_assembly_parts and its NDJSON stream; the lookup order is assembly_id, then
+    product_id (aggregation, then assembly name), then assembly_mark.
+    """
+    product_ids: Set[int] = set()  # A part reached through several relationships is only reported once
+    
+    def new_ids(*ids):
+        for new_id in ids:
+            if new_id not in product_ids:
+                product_ids.add(new_id)
+                yield new_id
+    
+    # Property sets are read for the clicked product, the sampled products and then every product
+    # in the assembly-name scan - memoize them for this request so no product is walked twice
+    psets_by_id: Dict[int, dict] = {}
+    
+    def cached_psets(element) -> dict:
+        psets = psets_by_id.get(element.id())
+        if psets is None:
+            psets = psets_by_id[element.id()] = ifcopenshell.util.element.get_psets(element) or {}
+        return psets
+    
+    assembly_log("[ASSEMBLY-PARTS] Request: product_id=%s, assembly_mark=%s, assembly_id=%s", product_id, assembly_mark, assembly_id)
+    
+    # If assembly_id is provided, find all parts in that assembly
+    if assembly_id is not None:
+        try:
+            assembly = ifc_file.by_id(assembly_id)
+            assembly_log("[ASSEMBLY-PARTS] Found assembly object: %s", assembly.is_a() if assembly else 'None')
+            if assembly and assembly.is_a('IfcElementAssembly'):
+                # Find all parts aggregated by this assembly (IsDecomposedBy is the inverse of RelatingObject)
+                part_ids = aggregated_product_ids(assembly)
+                assembly_log("[ASSEMBLY-PARTS] Found %s parts in assembly %s", len(part_ids), assembly_id)
+                yield from new_ids(*part_ids)
+        except Exception as e:
+            print(f"[ASSEMBLY-PARTS] Error with assembly_id: {e}")
+    
+    # If product_id is provided, find the assembly it belongs to
+    elif product_id is not None:
+        try:
+            product = ifc_file.by_id(product_id)
+            assembly_log("[ASSEMBLY-PARTS] Found product: %s", product.is_a() if product else 'None')
+            
+            # Find the assembly this product belongs to via IfcRelAggregates - Decomposes is the inverse of
+            # RelatedObjects, so the product's own relationships are enough and no assembly scan is needed
+            for rel in getattr(product, 'Decomposes', None) or ():
+                if not rel.is_a('IfcRelAggregates') or not rel.RelatingObject:
+                    continue
+                assembly = rel.RelatingObject
+                part_ids = aggregated_product_ids(assembly)
+                assembly_log("[ASSEMBLY-PARTS] Found %s parts in assembly %s (%s) via IfcRelAggregates", len(part_ids), assembly.id(), assembly.is_a())
+                yield from new_ids(*part_ids)
+                break
+            
+            # Check Tekla-specific property sets for assembly grouping
+            # Look for the actual assembly name (like "B1", "B2") not the GUID
+            if len(product_ids) == 0:
+                assembly_log("[ASSEMBLY-PARTS] Checking Tekla property sets for actual assembly name...")
+                try:
+                    psets = cached_psets(product)
                     
-                    for rel in decomposes_list:
-                        print(f"[ASSEMBLY-PARTS] Checking relationship: {rel.is_a()}")
-                        if rel.is_a('IfcRelAggregates'):
-                            assembly = rel.RelatingObject
-                            print(f"[ASSEMBLY-PARTS] Found assembly via IfcRelAggregates: {assembly.is_a() if assembly else 'None'}, ID: {assembly.id() if assembly else 'None'}")
-                            if assembly:
-                                assembly_id = assembly.id()
-                                # Now find all parts in this assembly
-                                for rel2 in ifc_file.by_type("IfcRelAggregates"):
-                                    if rel2.RelatingObject.id() == assembly_id:
-                                        print(f"[ASSEMBLY-PARTS] Found {len(rel2.RelatedObjects)} parts in assembly {assembly_id}")
-                                        for part in rel2.RelatedObjects:
-                                            if part.is_a("IfcProduct"):
-                                                product_ids.append(part.id())
-                                break
-                    else:
-                        print(f"[ASSEMBLY-PARTS] No IfcRelAggregates found in Decomposes")
-                else:
-                    print(f"[ASSEMBLY-PARTS] Product does not have Decomposes attribute")
-                
-                # If no assembly found via relationships, try to find by checking all assemblies
-                # and see which one contains this product
-                if len(product_ids) == 0 and len(assemblies) > 0:
-                    print(f"[ASSEMBLY-PARTS] Checking all {len(assemblies)} assemblies to find which contains product {product_id}...")
-                    for assembly in assemblies:
-                        # Check if this product is part of this assembly
-                        for rel in ifc_file.by_type("IfcRelAggregates"):
-                            if rel.RelatingObject.id() == assembly.id():
-                                related_ids = [p.id() for p in rel.RelatedObjects if p.is_a("IfcProduct")]
-                                if product_id in related_ids:
-                                    print(f"[ASSEMBLY-PARTS] Found product {product_id} in assembly {assembly.id()} ({assembly.is_a()})")
-                                    # Get all parts in this assembly
-                                    for part in rel.RelatedObjects:
-                                        if part.is_a("IfcProduct"):
-                                            product_ids.append(part.id())
-                                    print(f"[ASSEMBLY-PARTS] Assembly {assembly.id()} contains {len(product_ids)} parts")
-                                    break
-                        if len(product_ids) > 0:
-                            break
+                    # Look for assembly name in various property sets
+                    # We need to find the REAL assembly name (like "B1"), not the GUID
+                    assembly_name = None
                     
-                # Check Tekla-specific property sets for assembly grouping
-                # Look for the actual assembly name (like "B1", "B2") not the GUID
-                if len(product_ids) == 0:
-                    print(f"[ASSEMBLY-PARTS] Checking Tekla property sets for actual assembly name...")
-                    try:
-                        psets = ifcopenshell.util.element.get_psets(product)
-                        
-                        # Look for assembly name in various property sets
-                        # We need to find the REAL assembly name (like "B1"), not the GUID
-                        assembly_name = None
-                        
-                        # First, print all property sets to see what's available
-                        print(f"[ASSEMBLY-PARTS] All property sets for product {product_id}:")
+                    # First, print all property sets to see what's available
+                    if ENABLE_ASSEMBLY_LOGS:
+                        assembly_log("[ASSEMBLY-PARTS] All property sets for product %s:", product_id)
                         for pset_name, props in psets.items():
-                            print(f"[ASSEMBLY-PARTS]   {pset_name}: {list(props.keys())}")
+                            assembly_log("[ASSEMBLY-PARTS]   %s: %s", pset_name, list(props.keys()))
+                    
+                    # Check all property sets for assembly-related fields
+                    # Look for values that look like assembly names (B1, B2, etc.) not GUIDs
+                    # Also check ALL property values, not just keys with "assembly" in them
+                    all_property_values = []
+                    
+                    for pset_name, props in psets.items():
+                        for key, value in props.items():
+                            if value is None:
+                                continue
+                            value_str = str(value).strip()
+                            if value_str:
+                                # Skip GUIDs, N/A, empty values
+                                if value_str.upper() in _EMPTY_PROPERTY_VALUES:
+                                    continue
+                                # Skip GUIDs (start with "ID" and have dashes and are long)
+                                if _GUID_RE.match(value_str):
+                                    continue
+                                # Skip if it's clearly a part reference (like "b31")
+                                if _PART_REF_RE.match(value_str):
+                                    continue
+                                # Skip numeric-only values
+                                if value_str.isdigit():
+                                    continue
+                                # Skip very long values (likely not assembly names)
+                                if len(value_str) > 50:
+                                    continue
+                                
+                                all_property_values.append((pset_name, key, value_str))
+                                
+                                # Check if this key suggests it's an assembly name
+                                if _ASSEMBLY_NAME_KEY_RE.search(key):
+                                    # This might be the assembly name
+                                    # Check if it looks like an assembly name (B1, B2, etc. or longer names)
+                                    if len(value_str) >= 1 and len(value_str) <= 20:
+                                        # Prefer values that look like assembly names (B1, B2, etc.)
+                                        if (value_str[0].isalpha() and len(value_str) <= 10) or value_str.upper().startswith('B'):
+                                            assembly_name = value_str
+                                            assembly_log("[ASSEMBLY-PARTS] Found potential assembly name in %s.%s: %s", pset_name, key, assembly_name)
+                                            break
+                        if assembly_name:
+                            break
+                    
+                    # Also check Name and Tag fields directly (might contain assembly name)
+                    if not assembly_name:
+                        name = getattr(product, 'Name', None)
+                        if name:
+                            name_str = str(name).strip()
+                            # Check if Name looks like an assembly name (not a GUID, not empty)
+                            if (name_str and name_str.upper() not in ['NONE', 'NULL', 'N/A', 'BEAM', 'COLUMN', 'MEMBER', 'PLATE'] and
+                                not name_str.startswith('ID') and len(name_str) <= 20):
+                                # Check if it's not just the element type
+                                if name_str[0].isalpha():
+                                    assembly_name = name_str
+                                    assembly_log("[ASSEMBLY-PARTS] Found potential assembly name in Name field: %s", assembly_name)
+                    
+                    # If still not found, check if there's a pattern in other property values
+                    # Maybe the assembly name is in a field we haven't checked yet
+                    if not assembly_name:
+                        if ENABLE_ASSEMBLY_LOGS:
+                            assembly_log("[ASSEMBLY-PARTS] No clear assembly name found. All property values:")
+                            for pset_name, key, value_str in all_property_values:
+                                assembly_log("[ASSEMBLY-PARTS]   %s.%s = %s", pset_name, key, value_str)
                         
-                        # Check all property sets for assembly-related fields
-                        # Look for values that look like assembly names (B1, B2, etc.) not GUIDs
-                        # Also check ALL property values, not just keys with "assembly" in them
-                        all_property_values = []
+                        # Try to find assembly name by checking other products with similar properties
+                        # Maybe the assembly name is stored in a way that requires cross-referencing
+                        assembly_log("[ASSEMBLY-PARTS] Checking other products to find assembly pattern...")
                         
+                        # Only our own values that look like assembly names can be matched, so collect them once
+                        # as (pset, key, value) triples and test each sample value with a single set lookup
+                        name_like_values = set()
                         for pset_name, props in psets.items():
                             for key, value in props.items():
-                                if value is not None and str(value).strip():
-                                    value_str = str(value).strip()
-                                    # Skip GUIDs, N/A, empty values
-                                    if value_str.upper() in ['NONE', 'NULL', 'N/A', '']:
-                                        continue
-                                    # Skip GUIDs (start with "ID" and have dashes and are long)
-                                    if value_str.startswith('ID') and '-' in value_str and len(value_str) > 20:
-                                        continue
-                                    # Skip if it's clearly a part reference (like "b31")
-                                    if value_str.lower().startswith('b') and len(value_str) <= 4 and value_str[1:].isdigit():
-                                        continue
-                                    # Skip numeric-only values
-                                    if value_str.isdigit():
-                                        continue
-                                    # Skip very long values (likely not assembly names)
-                                    if len(value_str) > 50:
-                                        continue
-                                    
-                                    all_property_values.append((pset_name, key, value_str))
-                                    
-                                    # Check if this key suggests it's an assembly name
-                                    key_lower = key.lower()
-                                    if any(word in key_lower for word in ['assembly', 'mark', 'group', 'name']):
-                                        # This might be the assembly name
-                                        # Check if it looks like an assembly name (B1, B2, etc. or longer names)
-                                        if len(value_str) >= 1 and len(value_str) <= 20:
-                                            # Prefer values that look like assembly names (B1, B2, etc.)
-                                            if (value_str[0].isalpha() and len(value_str) <= 10) or value_str.upper().startswith('B'):
-                                                assembly_name = value_str
-                                                print(f"[ASSEMBLY-PARTS] Found potential assembly name in {pset_name}.{key}: {assembly_name}")
-                                                break
-                            if assembly_name:
-                                break
+                                value_str = str(value).strip()
+                                if (value_str and value_str[0].isalpha() and len(value_str) <= 10 and
+                                        not value_str.startswith('ID') and not _PART_REF_RE.match(value_str)):
+                                    name_like_values.add((pset_name, key, value_str))
                         
-                        # Also check Name and Tag fields directly (might contain assembly name)
-                        if not assembly_name:
-                            name = getattr(product, 'Name', None)
-                            if name:
-                                name_str = str(name).strip()
-                                # Check if Name looks like an assembly name (not a GUID, not empty)
-                                if (name_str and name_str.upper() not in ['NONE', 'NULL', 'N/A', 'BEAM', 'COLUMN', 'MEMBER', 'PLATE'] and
-                                    not name_str.startswith('ID') and len(name_str) <= 20):
-                                    # Check if it's not just the element type
-                                    if name_str[0].isalpha():
-                                        assembly_name = name_str
-                                        print(f"[ASSEMBLY-PARTS] Found potential assembly name in Name field: {assembly_name}")
+                        # Sample a few other products to see if there's a common field
+                        # by_type per exact type keeps the file's type-grouped order without visiting other products
+                        sample_products = []
+                        if name_like_values:
+                            for sample_type in ("IfcBeam", "IfcColumn", "IfcMember"):
+                                for other_product in cached_by_type(ifc_file, sample_type, include_subtypes=False):
+                                    if other_product.id() != product_id:
+                                        sample_products.append(other_product)
+                                        if len(sample_products) >= 5:
+                                            break
+                                if len(sample_products) >= 5:
+                                    break
                         
-                        # If still not found, check if there's a pattern in other property values
-                        # Maybe the assembly name is in a field we haven't checked yet
-                        if not assembly_name:
-                            print(f"[ASSEMBLY-PARTS] No clear assembly name found. All property values:")
-                            for pset_name, key, value_str in all_property_values:
-                                print(f"[ASSEMBLY-PARTS]   {pset_name}.{key} = {value_str}")
-                            
-                            # Try to find assembly name by checking other products with similar properties
-                            # Maybe the assembly name is stored in a way that requires cross-referencing
-                            print(f"[ASSEMBLY-PARTS] Checking other products to find assembly pattern...")
-                            
-                            # Sample a few other products to see if there's a common field
-                            sample_products = []
-                            for other_product in ifc_file.by_type("IfcProduct"):
-                                if other_product.id() != product_id and other_product.is_a() in ["IfcBeam", "IfcColumn", "IfcMember"]:
-                                    sample_products.append(other_product)
-                                    if len(sample_products) >= 5:
-                                        break
-                            
-                            # Compare property sets to find common assembly-related values
-                            for sample_product in sample_products:
-                                try:
-                                    sample_psets = ifcopenshell.util.element.get_psets(sample_product)
-                                    # Check if there's a field that might contain assembly name
-                                    for pset_name, props in sample_psets.items():
-                                        for key, value in props.items():
-                                            if value and str(value).strip():
-                                                value_str = str(value).strip()
-                                                # Look for values that look like assembly names
-                                                if (value_str[0].isalpha() and len(value_str) <= 10 and 
-                                                    not value_str.startswith('ID') and 
-                                                    not (value_str.lower().startswith('b') and len(value_str) <= 4 and value_str[1:].isdigit())):
-                                                    # This might be an assembly name - check if it exists in our product too
-                                                    if pset_name in psets and key in psets[pset_name]:
-                                                        if str(psets[pset_name][key]).strip() == value_str:
-                                                            assembly_name = value_str
-                                                            print(f"[ASSEMBLY-PARTS] Found potential assembly name by comparing with product {sample_product.id()}: {assembly_name} in {pset_name}.{key}")
-                                                            break
-                                        if assembly_name:
+                        # Compare property sets to find common assembly-related values
+                        for sample_product in sample_products:
+                            try:
+                                sample_psets = cached_psets(sample_product)
+                                # A sample value equal to one of our name-like values in the same field might be the assembly name
+                                for pset_name, props in sample_psets.items():
+                                    for key, value in props.items():
+                                        if not value:
+                                            continue
+                                        value_str = str(value).strip()
+                                        if (pset_name, key, value_str) in name_like_values:
+                                            assembly_name = value_str
+                                            assembly_log("[ASSEMBLY-PARTS] Found potential assembly name by comparing with product %s: %s in %s.%s", sample_product.id(), assembly_name, pset_name, key)
                                             break
                                     if assembly_name:
                                         break
-                                except:
-                                    pass
-                        
-                        # If still not found, check if there's a pattern in the GUID
-                        # Maybe the assembly name is encoded somewhere else
-                        if not assembly_name:
-                            print(f"[ASSEMBLY-PARTS] No clear assembly name found in property sets")
-                            print(f"[ASSEMBLY-PARTS] Tag: {getattr(product, 'Tag', None)}")
-                            print(f"[ASSEMBLY-PARTS] Name: {getattr(product, 'Name', None)}")
-                            
-                            # Try to find assembly name by checking if there's an IfcElementAssembly
-                            # that might have a name, even if not linked via relationships
-                            # This is a last resort
-                            tag = getattr(product, 'Tag', None)
-                            if tag:
-                                tag_str = str(tag).strip()
-                                # If tag is a GUID, we can't use it
-                                # But maybe we can find the assembly by searching for assembly objects
-                                # that might reference this part somehow
+                                if assembly_name:
+                                    break
+                            except:
                                 pass
+                
+                    # If still not found, check if there's a pattern in the GUID
+                    # Maybe the assembly name is encoded somewhere else
+                    if not assembly_name:
+                        assembly_log("[ASSEMBLY-PARTS] No clear assembly name found in property sets")
+                        assembly_log("[ASSEMBLY-PARTS] Tag: %s", getattr(product, 'Tag', None))
+                        assembly_log("[ASSEMBLY-PARTS] Name: %s", getattr(product, 'Name', None))
                         
-                        # Group by assembly name if found
-                        if assembly_name:
-                            print(f"[ASSEMBLY-PARTS] Grouping by assembly name: {assembly_name}")
-                            all_products = ifc_file.by_type("IfcProduct")
+                        # Try to find assembly name by checking if there's an IfcElementAssembly
+                        # that might have a name, even if not linked via relationships
+                        # This is a last resort
+                        tag = getattr(product, 'Tag', None)
+                        if tag:
+                            tag_str = str(tag).strip()
+                            # If tag is a GUID, we can't use it
+                            # But maybe we can find the assembly by searching for assembly objects
+                            # that might reference this part somehow
+                            pass
+                    
+                    # Group by assembly name if found
+                    if assembly_name:
+                        assembly_log("[ASSEMBLY-PARTS] Grouping by assembly name: %s", assembly_name)
+                        # Only physical elements carry assembly properties - skip spatial structure, grids, annotations
+                        all_products = cached_by_type(ifc_file, "IfcElement")
+                        
+                        for other_product in all_products:
+                            if other_product.id() == product_id:
+                                continue  # Skip the clicked product
                             
-                            for other_product in all_products:
-                                if other_product.id() == product_id:
-                                    continue  # Skip the clicked product
-                                
-                                try:
-                                    other_psets = ifcopenshell.util.element.get_psets(other_product)
-                                    
-                                    # Check if this product has the same assembly name
-                                    # Use the same logic as we used to find the assembly_name
-                                    other_assembly_name = None
-                                    
-                                    for other_pset_name, other_props in other_psets.items():
-                                        for key, value in other_props.items():
-                                            if value and str(value).strip():
-                                                value_str = str(value).strip()
-                                                # Skip GUIDs, N/A, empty values
-                                                if value_str.upper() in ['NONE', 'NULL', 'N/A', '']:
-                                                    continue
-                                                # Skip GUIDs
-                                                if value_str.startswith('ID') and '-' in value_str and len(value_str) > 20:
-                                                    continue
-                                                # Skip part references (like "b31")
-                                                if value_str.lower().startswith('b') and len(value_str) <= 4 and value_str[1:].isdigit():
-                                                    continue
-                                                
-                                                # Check if this key suggests it's an assembly name
-                                                key_lower = key.lower()
-                                                if any(word in key_lower for word in ['assembly', 'mark', 'group']):
-                                                    if len(value_str) >= 1 and len(value_str) <= 20:
-                                                        other_assembly_name = value_str
-                                                        break
-                                        if other_assembly_name:
-                                            break
-                                    
-                                    # If assembly names match, add to group
-                                    if other_assembly_name and other_assembly_name == assembly_name:
-                                        product_ids.append(other_product.id())
-                                        print(f"[ASSEMBLY-PARTS] Found product {other_product.id()} ({other_product.is_a()}) with same assembly name: {assembly_name}")
+                            try:
+                                # Check if this product has the same assembly name
+                                other_assembly_name = extract_assembly_name_from_psets(cached_psets(other_product))
                                 
-                                except Exception as e:
-                                    print(f"[ASSEMBLY-PARTS] Error checking product {other_product.id()}: {e}")
+                                # If assembly names match, add to group
+                                if other_assembly_name and other_assembly_name == assembly_name:
+                                    yield from new_ids(other_product.id())
                             
-                            if len(product_ids) > 0:
-                                print(f"[ASSEMBLY-PARTS] Grouped {len(product_ids)} products by assembly name: {assembly_name}")
-                                product_ids.append(product_id)  # Include the clicked product
-                                print(f"[ASSEMBLY-PARTS] Total products in assembly: {len(product_ids)}")
-                            else:
-                                print(f"[ASSEMBLY-PARTS] No other products found with assembly name: {assembly_name}")
-                                # Still add the clicked product
-                                product_ids.append(product_id)
+                            except Exception as e:
+                                print(f"[ASSEMBLY-PARTS] Error checking product {other_product.id()}: {e}")
+                        
+                        if len(product_ids) > 0:
+                            assembly_log("[ASSEMBLY-PARTS] Grouped %s products by assembly name: %s", len(product_ids), assembly_name)
+                            yield from new_ids(product_id)  # Include the clicked product
+                            assembly_log("[ASSEMBLY-PARTS] Total products in assembly: %s", len(product_ids))
                         else:
-                            print(f"[ASSEMBLY-PARTS] Could not find assembly name (only found GUIDs)")
-                            print(f"[ASSEMBLY-PARTS] IFC file may not contain proper assembly names, or they are stored in a format we don't recognize.")
-                            print(f"[ASSEMBLY-PARTS] Returning only the clicked part {product_id}.")
-                            product_ids.append(product_id)
-                    
-                    except Exception as e:
-                        import traceback
-                        print(f"[ASSEMBLY-PARTS] Error checking property sets: {e}")
-                        traceback.print_exc()
-                
-                # Last resort: Since assembly marks are unique GUIDs and no relationships exist,
-                # we cannot determine which parts belong to the same assembly.
-                # Return only the clicked part as a fallback.
-                if len(product_ids) == 0:
-                    print(f"[ASSEMBLY-PARTS] WARNING: No assembly relationships found in IFC file.")
-                    print(f"[ASSEMBLY-PARTS] IFC file appears to lack IfcRelAggregates relationships.")
-                    print(f"[ASSEMBLY-PARTS] Each part has a unique assembly mark (GUID), so grouping is not possible.")
-                    print(f"[ASSEMBLY-PARTS] Returning only the clicked part {product_id}.")
-                    product_ids.append(product_id)  # Return only the clicked part
-                    
-            except Exception as e:
-                import traceback
-                print(f"[ASSEMBLY-PARTS] Error finding assembly for product {product_id}: {e}")
-                traceback.print_exc()
-        
-        # If assembly_mark is provided, find all products with that mark
-        elif assembly_mark:
-            print(f"[ASSEMBLY-PARTS] Searching by assembly_mark: {assembly_mark}")
-            # This is a fallback - find all products with the same assembly mark
-            # But this might not work if marks are unique GUIDs
-            products = ifc_file.by_type("IfcProduct")
-            for product in products:
-                mark, _ = get_assembly_info(product)
-                if mark == assembly_mark:
-                    product_ids.append(product.id())
-            print(f"[ASSEMBLY-PARTS] Found {len(product_ids)} products with assembly_mark {assembly_mark}")
-        
-        print(f"[ASSEMBLY-PARTS] Returning {len(product_ids)} product IDs: {product_ids[:10]}...")  # Show first 10
-        
-        return JSONResponse({
+                            assembly_log("[ASSEMBLY-PARTS] No other products found with assembly name: %s", assembly_name)
+                            # Still add the clicked product
+                            yield from new_ids(product_id)
+                    else:
+                        assembly_log("[ASSEMBLY-PARTS] Could not find assembly name (only found GUIDs)")
+                        assembly_log("[ASSEMBLY-PARTS] IFC file may not contain proper assembly names, or they are stored in a format we don't recognize.")
+                        assembly_log("[ASSEMBLY-PARTS] Returning only the clicked part %s.", product_id)
+                        yield from new_ids(product_id)
+                
+                except Exception as e:
+                    print(f"[ASSEMBLY-PARTS] Error checking property sets: {e}")
+                    traceback.print_exc()
+            
+            # Last resort: Since assembly marks are unique GUIDs and no relationships exist,
+            # we cannot determine which parts belong to the same assembly.
+            # Return only the clicked part as a fallback.
+            if len(product_ids) == 0:
+                assembly_log("[ASSEMBLY-PARTS] WARNING: No assembly relationships found in IFC file.")
+                assembly_log("[ASSEMBLY-PARTS] IFC file appears to lack IfcRelAggregates relationships.")
+                assembly_log("[ASSEMBLY-PARTS] Each part has a unique assembly mark (GUID), so grouping is not possible.")
+                assembly_log("[ASSEMBLY-PARTS] Returning only the clicked part %s.", product_id)
+                yield from new_ids(product_id)  # Return only the clicked part
+                
+        except Exception as e:
+            print(f"[ASSEMBLY-PARTS] Error finding assembly for product {product_id}: {e}")
+            traceback.print_exc()
+    
+    # If assembly_mark is provided, find all products with that mark
+    elif assembly_mark:
+        assembly_log("[ASSEMBLY-PARTS] Searching by assembly_mark: %s", assembly_mark)
+        # This is a fallback - find all products with the same assembly mark
+        # But this might not work if marks are unique GUIDs
+        products = cached_by_type(ifc_file, "IfcProduct")
+        for product in products:
+            mark, _ = get_assembly_info(product)
+            if mark == assembly_mark:
+                yield from new_ids(product.id())
+        assembly_log("[ASSEMBLY-PARTS] Found %s products with assembly_mark %s", len(product_ids), assembly_mark)
+
+
+@app.get("/api/assembly-parts/{filename}")
+async def get_assembly_parts(filename: str, product_id: int = None, assembly_mark: str = None, assembly_id: int = None):
+    """Get all product IDs that belong to the same assembly."""
+    decoded_filename = unquote(filename)
+    file_path = resolve_ifc_path(decoded_filename)
+    
+    assembly_log("[ASSEMBLY-PARTS] Decoded filename: %s", decoded_filename)
+    assembly_log("[ASSEMBLY-PARTS] File path: %s", file_path)
+    
+    # A missing file surfaces from open_ifc's stat, which also keys its cache - no separate exists() check
+    try:
+        # Parsing the file and the assembly-name scan are CPU-bound - run them in the threadpool
+        # so other requests keep being served meanwhile
+        assembly_log("[ASSEMBLY-PARTS] Opening IFC file...")
+        ifc_file = await asyncio.to_thread(open_ifc, file_path)
+        assembly_log("[ASSEMBLY-PARTS] IFC file opened successfully")
+        product_ids = await asyncio.to_thread(sorted, iter_assembly_part_ids(ifc_file, product_id, assembly_mark, assembly_id))
+        assembly_log("[ASSEMBLY-PARTS] Returning %s product IDs: %s...", len(product_ids), product_ids[:10])  # Show first 10
+        
+        return ORJSONResponse({
             "product_ids": product_ids,
             "count": len(product_ids)
         })
+    except FileNotFoundError:
+        print(f"[ASSEMBLY-PARTS] ERROR: File not found!")
+        raise HTTPException(status_code=404, detail="IFC file not found")
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Failed to get assembly parts: {str(e)}")
 
 
+@app.get("/api/assembly-parts/{filename}/stream")
+async def stream_assembly_parts(filename: str, product_id: int = None, assembly_mark: str = None, assembly_id: int = None):
+    """Stream the same product IDs as get_assembly_parts as NDJSON, one {"product_id": id} line each.
+    
+    IDs are flushed as soon as they are found, so a viewer can highlight the aggregated parts
+    while the assembly-name scan over the rest of the file is still running.
+    """
+    decoded_filename = unquote(filename)
+    file_path = resolve_ifc_path(decoded_filename)
+    
+    try:
+        ifc_file = await asyncio.to_thread(open_ifc, file_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="IFC file not found")
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Failed to get assembly parts: {str(e)}")
+    
+    def ndjson_lines():
+        for part_id in iter_assembly_part_ids(ifc_file, product_id, assembly_mark, assembly_id):
+            line = {"product_id": part_id}
+            yield (orjson.dumps(line) if HAS_ORJSON else json.dumps(line).encode()) + b"\n"
+    
+    # A sync iterator is run in Starlette's threadpool, so the scan does not block the event loop
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+
 @app.get("/api/element-full/{element_id}")
 async def get_element_full(element_id: int, filename: str):
     """Get full element data for a specific product or assembly."""
-    from urllib.parse import unquote
     decoded_filename = unquote(filename)
-    file_path = IFC_DIR / decoded_filename
-    
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="IFC file not found")
+    file_path = resolve_ifc_path(decoded_filename)
     
     try:
         print(f"[ELEMENT-FULL] Opening IFC file: {file_path}")
-        # Resolve path to absolute for Windows compatibility
-        resolved_path = file_path.resolve()
-        ifc_file = ifcopenshell.open(str(resolved_path))
+        # Parse in the threadpool so a cold open does not stall the event loop
+        try:
+            ifc_file = await asyncio.to_thread(open_ifc, file_path)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="IFC file not found")
         print(f"[ELEMENT-FULL] IFC file opened successfully, looking for entity ID: {element_id}")
         
         # Try to get entity by ID
@@ -5158,22 +5635,23 @@ async def get_element_full(element_id: int, filename: str):
         # If this is an assembly (IfcElementAssembly), get its parts
         if element_type == "IfcElementAssembly":
             try:
-                # Find all products that are aggregated by this assembly
-                for rel in ifc_file.by_type("IfcRelAggregates"):
-                    if rel.RelatingObject.id() == element_id:
-                        for related_obj in rel.RelatedObjects:
-                            if related_obj.is_a("IfcProduct"):
-                                part_info = {
-                                    "id": related_obj.id(),
-                                    "type": related_obj.is_a(),
-                                    "tag": getattr(related_obj, 'Tag', None) or '',
-                                    "name": getattr(related_obj, 'Name', None) or ''
-                                }
-                                relationships["parts"].append(part_info)
+                # Find all products that are aggregated by this assembly (inverse attribute, no file scan)
+                for rel in entity.IsDecomposedBy or ():
+                    if not rel.is_a("IfcRelAggregates"):
+                        continue
+                    for related_obj in rel.RelatedObjects:
+                        if related_obj.is_a("IfcProduct"):
+                            part_info = {
+                                "id": related_obj.id(),
+                                "type": related_obj.is_a(),
+                                "tag": getattr(related_obj, 'Tag', None) or '',
+                                "name": getattr(related_obj, 'Name', None) or ''
+                            }
+                            relationships["parts"].append(part_info)
             except Exception as e:
                 print(f"[ELEMENT-FULL] Error getting assembly parts: {e}")
         
-        return JSONResponse({
+        return ORJSONResponse({
             "basic_attributes": basic_attributes,
             "property_sets": property_sets,
             "relationships": relationships,
@@ -5183,7 +5661,6 @@ async def get_element_full(element_id: int, filename: str):
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Failed to get element data: {str(e)}")
 
@@ -5197,7 +5674,6 @@ async def get_dashboard_details(filename: str):
     - plates: List of grouped plate parts with quantity
     - assemblies: List of assemblies with their parts
     """
-    from urllib.parse import unquote
     decoded_filename = unquote(filename)
     file_path = IFC_DIR / decoded_filename
     
@@ -5901,7 +6377,6 @@ async def get_dashboard_details(filename: str):
         })
         
     except Exception as e:
-        import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Failed to get dashboard details: {str(e)}")
 
@@ -5913,7 +6388,6 @@ async def get_shipment_assemblies(filename: str):
     Each assembly instance gets its own row, even if they have the same assembly_mark.
     Returns list of assemblies with: assembly_mark, main_profile, length, weight, ids
     """
-    from urllib.parse import unquote
     decoded_filename = unquote(filename)
     file_path = IFC_DIR / decoded_filename
     
@@ -6075,7 +6549,6 @@ async def get_shipment_assemblies(filename: str):
         })
         
     except Exception as e:
-        import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Failed to get shipment assemblies: {str(e)}")
 
@@ -6092,7 +6565,6 @@ async def get_management_assemblies(filename: str):
     Each assembly instance gets its own row with status tracking.
     Returns list of assemblies with: assembly_mark, main_profile, length, weight, ids, completed, shipped
     """
-    from urllib.parse import unquote
     decoded_filename = unquote(filename)
     file_path = IFC_DIR / decoded_filename
     
@@ -6245,7 +6717,6 @@ async def get_management_assemblies(filename: str):
         })
         
     except Exception as e:
-        import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Failed to get management assemblies: {str(e)}")
 
@@ -6253,7 +6724,6 @@ async def get_management_assemblies(filename: str):
 @app.post("/api/management-assemblies/{filename}/toggle-completed")
 async def toggle_completed(filename: str, request: Request):
     """Toggle the completed status of an assembly."""
-    from urllib.parse import unquote
     decoded_filename = unquote(filename)
     
     try:
@@ -6289,7 +6759,6 @@ async def toggle_completed(filename: str, request: Request):
         })
         
     except Exception as e:
-        import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Failed to toggle completed: {str(e)}")
 
@@ -6297,7 +6766,6 @@ async def toggle_completed(filename: str, request: Request):
 @app.post("/api/management-assemblies/{filename}/toggle-shipped")
 async def toggle_shipped(filename: str, request: Request):
     """Toggle the shipped status of an assembly."""
-    from urllib.parse import unquote
     decoded_filename = unquote(filename)
     
     try:
@@ -6328,7 +6796,6 @@ async def toggle_shipped(filename: str, request: Request):
         })
         
     except Exception as e:
-        import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Failed to toggle shipped: {str(e)}")
 
@@ -6616,7 +7083,6 @@ async def generate_plate_nesting(filename: str, request: Request):
         })
         
     except Exception as e:
-        import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Failed to generate nesting: {str(e)}")
 
@@ -6625,7 +7091,6 @@ async def generate_plate_nesting(filename: str, request: Request):
 async def get_plate_geometry(filename: str, element_id: int):
     """Get the actual 2D geometry of a specific plate including holes. Returns SVG path data for visualization."""
     try:
-        from urllib.parse import unquote
         from plate_geometry_extractor import extract_plate_2d_geometry
         
         decoded_filename = unquote(filename)
@@ -6650,14 +7115,13 @@ async def get_plate_geometry(filename: str, element_id: int):
             return JSONResponse({"success": True, "element_id": element_id, "name": element.Name or "Unknown", "has_geometry": False, "message": "Could not extract geometry, use bounding box"})
         
         svg_path = plate_geom.get_svg_path()
-        num_holes = len(list(plate_geom.polygon.interiors)) if plate_geom.polygon else 0
+        num_holes = len(plate_geom.polygon.interiors) if plate_geom.polygon else 0
         
         return JSONResponse({"success": True, "element_id": element_id, "name": plate_geom.name, "thickness": plate_geom.thickness, "width": plate_geom.width, "length": plate_geom.length, "area": plate_geom.area, "bounding_box": plate_geom.bounding_box, "svg_path": svg_path, "has_holes": num_holes > 0, "num_holes": num_holes, "has_geometry": True})
         
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Failed to extract geometry: {str(e)}")
 
@@ -6671,7 +7135,6 @@ async def generate_plate_nesting_with_geometry(filename: str, request: Request):
     Results in 15-30% better material utilization compared to bounding box method.
     """
     try:
-        from urllib.parse import unquote
         from plate_geometry_extractor import extract_all_plate_geometries, create_bounding_box_geometry
         from polygon_nesting import nest_plates_on_multiple_stocks, calculate_nesting_statistics
         
@@ -6785,7 +7248,6 @@ async def generate_plate_nesting_with_geometry(filename: str, request: Request):
         })
         
     except Exception as e:
-        import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Failed to generate geometry-based nesting: {str(e)}")
 
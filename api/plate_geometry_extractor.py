@@ -5,14 +5,47 @@ Extracts actual 2D plate shapes from IFC 3D geometry.
 
 import ifcopenshell
 import ifcopenshell.geom
+import ifcopenshell.util.shape
 import numpy as np
+import shapely
 from shapely.geometry import Polygon, MultiPolygon
 from shapely.ops import unary_union
 from scipy.spatial import ConvexHull
 from typing import Optional, Tuple, List
+import os
 import traceback
 
 
+# Per-plate/per-face trace output; opt in with GEOM_LOGS=1 (errors and summaries always print)
+ENABLE_GEOM_LOGS = os.environ.get("GEOM_LOGS", "0").strip().lower() not in ("0", "false", "no", "off")
+
+
+def geom_log(msg, *args):
+    """Print a [GEOM] trace line only if ENABLE_GEOM_LOGS is True; %-style args are formatted lazily."""
+    if ENABLE_GEOM_LOGS:
+        print(msg % args if args else msg)
+
+
+_default_settings = None
+
+
+def get_default_settings():
+    """Plate geometry settings (world coordinates, welded vertices), created on first use and shared."""
+    global _default_settings
+    if _default_settings is None:
+        settings = ifcopenshell.geom.settings()
+        settings.set(settings.USE_WORLD_COORDS, True)
+        settings.set(settings.WELD_VERTICES, True)
+        _default_settings = settings
+    return _default_settings
+
+
+def svg_subpath(coords: np.ndarray, offset_x=0, offset_y=0) -> str:
+    """Closed SVG subpath ("M x,y L x,y ... Z") through an Nx2 coordinate array, offsets applied in one step."""
+    points = (coords + (offset_x, offset_y)).tolist()
+    return "M " + " L ".join([f"{x:.2f},{y:.2f}" for x, y in points]) + " Z"
+
+
 class PlateGeometry:
     """Represents a plate with its actual 2D geometry."""
     
@@ -25,6 +58,7 @@ class PlateGeometry:
         self.length = 0.0
         self.area = 0.0
         self.bounding_box = (0, 0, 0, 0)  # (min_x, min_y, max_x, max_y)
+        self._svg_rings: Optional[List[np.ndarray]] = None  # Offset-free exterior + hole coordinates
         
     def set_geometry(self, polygon: Polygon):
         """Set the 2D polygon geometry for this plate."""
@@ -32,6 +66,7 @@ class PlateGeometry:
             return
             
         self.polygon = polygon
+        self._svg_rings = None
         self.area = polygon.area
         bounds = polygon.bounds  # (minx, miny, maxx, maxy)
         self.bounding_box = bounds
@@ -43,33 +78,17 @@ class PlateGeometry:
         if not self.polygon or self.polygon.is_empty:
             return ""
         
-        # Exterior boundary
-        exterior = self.polygon.exterior
-        coords = list(exterior.coords)
+        # Ring coordinates are read from the polygon once; each placement only shifts them
+        if self._svg_rings is None:
+            exterior = np.asarray(self.polygon.exterior.coords)
+            holes = [np.asarray(interior.coords) for interior in self.polygon.interiors]
+            self._svg_rings = [exterior] + [coords for coords in holes if len(coords)] if len(exterior) else []
         
-        if not coords:
+        if not self._svg_rings:
             return ""
         
-        # Start path
-        path_parts = [f"M {coords[0][0] + offset_x:.2f},{coords[0][1] + offset_y:.2f}"]
-        
-        # Line to each point
-        for x, y in coords[1:]:
-            path_parts.append(f"L {x + offset_x:.2f},{y + offset_y:.2f}")
-        
-        # Close path
-        path_parts.append("Z")
-        
-        # Add holes if any
-        for interior in self.polygon.interiors:
-            hole_coords = list(interior.coords)
-            if hole_coords:
-                path_parts.append(f"M {hole_coords[0][0] + offset_x:.2f},{hole_coords[0][1] + offset_y:.2f}")
-                for x, y in hole_coords[1:]:
-                    path_parts.append(f"L {x + offset_x:.2f},{y + offset_y:.2f}")
-                path_parts.append("Z")
-        
-        return " ".join(path_parts)
+        # Closed subpath for the exterior, then one for each hole (if any)
+        return " ".join(svg_subpath(coords, offset_x, offset_y) for coords in self._svg_rings)
     
     def to_dict(self):
         """Convert to dictionary for JSON serialization."""
@@ -82,7 +101,7 @@ class PlateGeometry:
             'area': round(self.area, 2),
             'bounding_box': self.bounding_box,
             'has_geometry': self.polygon is not None,
-            'has_holes': len(list(self.polygon.interiors)) > 0 if self.polygon else False
+            'has_holes': len(self.polygon.interiors) > 0 if self.polygon else False
         }
 
 
@@ -105,11 +124,9 @@ def extract_plate_2d_geometry(element, settings=None) -> Optional[PlateGeometry]
         # Get thickness from properties
         thickness = extract_thickness(element)
         
-        # Create geometry settings if not provided
+        # Use the shared geometry settings if not provided
         if settings is None:
-            settings = ifcopenshell.geom.settings()
-            settings.set(settings.USE_WORLD_COORDS, True)
-            settings.set(settings.WELD_VERTICES, True)
+            settings = get_default_settings()
         
         # Create shape from IFC geometry
         try:
@@ -121,16 +138,42 @@ def extract_plate_2d_geometry(element, settings=None) -> Optional[PlateGeometry]
         if not shape:
             return None
         
+        return plate_geometry_from_shape(element, shape, element_name, thickness)
+        
+    except Exception as e:
+        print(f"[GEOM] Error extracting geometry for element {element.id() if hasattr(element, 'id') else 'unknown'}: {e}")
+        traceback.print_exc()
+        return None
+
+
+def plate_geometry_from_shape(element, shape, element_name: str = None, thickness: str = None) -> Optional[PlateGeometry]:
+    """
+    Build the 2D plate geometry from an already triangulated shape (world coordinates).
+    
+    Args:
+        element: IFC element (IfcPlate)
+        shape: Shape from ifcopenshell.geom.create_shape or a geometry iterator
+        element_name: Plate name (read from the element if not given)
+        thickness: Plate thickness (read from the properties if not given)
+        
+    Returns:
+        PlateGeometry object or None if the projection fails
+    """
+    try:
+        element_id = element.id()
+        if element_name is None:
+            element_name = getattr(element, 'Name', None) or f'Plate_{element_id}'
+        if thickness is None:
+            thickness = extract_thickness(element)
+        
+        # Read-only Nx3 / Mx3 views straight over the triangulation buffers (no Python tuple round-trip)
         geometry = shape.geometry
-        verts = geometry.verts
-        faces = geometry.faces
+        vertices = ifcopenshell.util.shape.get_vertices(geometry)
+        faces = ifcopenshell.util.shape.get_faces(geometry)
         
-        if len(verts) < 9:  # Need at least 3 vertices (3 coords each)
+        if len(vertices) < 3:  # Need at least 3 vertices
             return None
         
-        # Convert vertices to numpy array
-        vertices = np.array(verts).reshape(-1, 3)
-        
         # Convert to mm if in meters
         max_coord = np.max(np.abs(vertices))
         if max_coord < 1000.0:  # Likely in meters
@@ -142,12 +185,12 @@ def extract_plate_2d_geometry(element, settings=None) -> Optional[PlateGeometry]
         dimensions = bbox_max - bbox_min
         thickness_axis = np.argmin(dimensions)
         
-        print(f"[GEOM] Plate {element_id} dims: X={dimensions[0]:.1f}, Y={dimensions[1]:.1f}, Z={dimensions[2]:.1f}, thickness_axis={thickness_axis}")
+        geom_log("[GEOM] Plate %s dims: X=%.1f, Y=%.1f, Z=%.1f, thickness_axis=%s",
+                 element_id, dimensions[0], dimensions[1], dimensions[2], thickness_axis)
         
         # Project using faces for accurate geometry with holes
-        if len(faces) >= 3:
-            faces_array = np.array(faces).reshape(-1, 3)
-            polygon = project_with_faces_aligned(vertices, faces_array, thickness_axis)
+        if len(faces) >= 1:
+            polygon = project_with_faces_aligned(vertices, faces, thickness_axis)
         else:
             polygon = project_to_aligned_plane(vertices, thickness_axis)
         
@@ -155,10 +198,8 @@ def extract_plate_2d_geometry(element, settings=None) -> Optional[PlateGeometry]
             plate_geom = PlateGeometry(element_id, element_name, thickness)
             plate_geom.set_geometry(polygon)
             
-            print(f"[GEOM] Extracted geometry for {element_name}: "
-                  f"{plate_geom.width:.1f}x{plate_geom.length:.1f}mm, "
-                  f"area={plate_geom.area:.0f}mm², "
-                  f"holes={len(list(polygon.interiors))}")
+            geom_log("[GEOM] Extracted geometry for %s: %.1fx%.1fmm, area=%.0fmm², holes=%d",
+                     element_name, plate_geom.width, plate_geom.length, plate_geom.area, len(polygon.interiors))
             
             return plate_geom
         else:
@@ -171,6 +212,45 @@ def extract_plate_2d_geometry(element, settings=None) -> Optional[PlateGeometry]
         return None
 
 
+SMALL_HULL_MAX_POINTS = 16  # Up to this many points, the monotone chain beats qhull's set-up cost
+
+
+def convex_hull_2d(points: np.ndarray) -> np.ndarray:
+    """
+    Convex hull vertices of 2D points, counter-clockwise.
+    
+    Most plates are simple boxes with only a handful of distinct projected points, so small
+    inputs use Andrew's monotone chain; larger ones go to qhull via ConvexHull.
+    
+    Args:
+        points: Nx2 array of 2D points (duplicates allowed)
+        
+    Returns:
+        Kx2 array of hull vertices
+    """
+    if len(points) > SMALL_HULL_MAX_POINTS:
+        return points[ConvexHull(points).vertices]
+    
+    sorted_points = sorted(set(map(tuple, points.tolist())))
+    
+    def half_hull(chain_points):
+        chain = []
+        for x, y in chain_points:
+            # Pop while the last turn is clockwise or straight (collinear points are not hull vertices)
+            while len(chain) >= 2 and ((chain[-1][0] - chain[-2][0]) * (y - chain[-2][1]) -
+                                       (chain[-1][1] - chain[-2][1]) * (x - chain[-2][0])) <= 0:
+                chain.pop()
+            chain.append((x, y))
+        return chain
+    
+    lower = half_hull(sorted_points)
+    upper = half_hull(reversed(sorted_points))
+    hull = lower[:-1] + upper[:-1]
+    if len(hull) < 3:
+        raise ValueError(f"Convex hull of {len(sorted_points)} distinct points is degenerate")
+    return np.array(hull)
+
+
 def project_to_2d_plane(vertices: np.ndarray) -> Optional[Polygon]:
     """
     Project 3D vertices onto their main 2D plane using PCA.
@@ -190,35 +270,17 @@ def project_to_2d_plane(vertices: np.ndarray) -> Optional[Polygon]:
         centered = vertices - centroid
         
         # PCA to find principal axes
-        cov = np.cov(centered.T)
-        eigenvalues, eigenvectors = np.linalg.eig(cov)
-        
-        # Sort by eigenvalue (largest first)
-        idx = eigenvalues.argsort()[::-1]
-        eigenvalues = eigenvalues[idx]
-        eigenvectors = eigenvectors[:, idx]
-        
-        # Use the two largest eigenvectors as the plane basis
-        u_axis = eigenvectors[:, 0]
-        v_axis = eigenvectors[:, 1]
-        
-        # Project all vertices onto the 2D plane
-        u_coords = np.dot(centered, u_axis)
-        v_coords = np.dot(centered, v_axis)
-        
-        # Create 2D points
-        points_2d = np.column_stack([u_coords, v_coords])
+        # Scatter matrix of the centered points - the eigenvectors of the covariance without
+        # np.cov's copies and 1/(N-1) scaling; symmetric, so eigh applies (eigenvalues ascending)
+        cov = centered.T @ centered
+        eigenvalues, eigenvectors = np.linalg.eigh(cov)
         
-        # Remove duplicate points
-        unique_points = np.unique(points_2d, axis=0)
+        # Project all vertices onto the plane of the two largest eigenvectors in one matmul
+        points_2d = centered @ eigenvectors[:, [2, 1]]
         
-        if len(unique_points) < 3:
-            return None
-        
-        # Get convex hull
+        # Get convex hull (duplicate vertices shared between faces are fine)
         try:
-            hull = ConvexHull(unique_points)
-            boundary_points = unique_points[hull.vertices]
+            boundary_points = convex_hull_2d(points_2d)
             
             # Create polygon
             polygon = Polygon(boundary_points)
@@ -226,10 +288,10 @@ def project_to_2d_plane(vertices: np.ndarray) -> Optional[Polygon]:
             # Simplify slightly to remove tiny artifacts
             polygon = polygon.simplify(0.5, preserve_topology=True)
             
-            # Buffer slightly to clean up geometry
-            polygon = polygon.buffer(0.1)
+            # Repair without reshaping (a buffer would round the corners and add 0.1mm all round)
+            polygon = shapely.make_valid(polygon)
             
-            if polygon.is_valid and not polygon.is_empty:
+            if polygon.geom_type == 'Polygon' and polygon.is_valid and not polygon.is_empty:
                 return polygon
             else:
                 return None
@@ -238,7 +300,7 @@ def project_to_2d_plane(vertices: np.ndarray) -> Optional[Polygon]:
             print(f"[GEOM] ConvexHull error: {hull_error}")
             # Fallback: try creating polygon directly from points
             try:
-                polygon = Polygon(unique_points)
+                polygon = Polygon(points_2d)
                 if polygon.is_valid:
                     return polygon.simplify(0.5, preserve_topology=True)
             except:
@@ -278,8 +340,7 @@ def project_to_aligned_plane(vertices: np.ndarray, thickness_axis: int) -> Optio
             return None
         
         # Use convex hull as fallback
-        hull = ConvexHull(unique_points)
-        boundary_points = unique_points[hull.vertices]
+        boundary_points = convex_hull_2d(unique_points)
         polygon = Polygon(boundary_points)
         
         if polygon.is_valid:
@@ -316,40 +377,47 @@ def project_with_faces_aligned(vertices: np.ndarray, faces: np.ndarray, thicknes
         else:  # Remove Z, keep X-Y
             points_2d = vertices[:, [0, 1]]
         
-        print(f"[GEOM] Projecting {len(faces)} faces to 2D")
-        
-        # Convert each triangular face to a polygon
-        face_polygons = []
-        for face in faces:
-            try:
-                tri_points = points_2d[face]
-                
-                # Check if triangle has area
-                p1, p2, p3 = tri_points[0], tri_points[1], tri_points[2]
-                area = 0.5 * abs((p2[0] - p1[0]) * (p3[1] - p1[1]) - (p3[0] - p1[0]) * (p2[1] - p1[1]))
-                
-                if area > 0.01:  # Skip degenerate triangles
-                    tri_poly = ShapelyPolygon(tri_points)
-                    if tri_poly.is_valid:
-                        face_polygons.append(tri_poly)
-            except:
-                continue
-        
-        if not face_polygons:
+        geom_log("[GEOM] Projecting %d faces to 2D", len(faces))
+        
+        # Plain rectangular plates (the common case) project every vertex onto a corner of their
+        # bounding box and use all four corners - return that box directly instead of merging the
+        # triangles (a right-triangle gusset also has only corner vertices, but just three of them)
+        min_xy = points_2d.min(axis=0)
+        max_xy = points_2d.max(axis=0)
+        if (max_xy - min_xy).min() > 0.01:
+            at_min = np.isclose(points_2d, min_xy, rtol=0, atol=1e-6)
+            at_max = np.isclose(points_2d, max_xy, rtol=0, atol=1e-6)
+            corner = at_max[:, 0] * 1 + at_max[:, 1] * 2  # 0-3 per vertex, valid where every vertex is at a corner
+            if (at_min | at_max).all() and np.unique(corner).size == 4:
+                geom_log("[GEOM] Rectangular plate, using its bounding box")
+                return ShapelyPolygon([(min_xy[0], min_xy[1]), (max_xy[0], min_xy[1]),
+                                       (max_xy[0], max_xy[1]), (min_xy[0], max_xy[1])])
+        
+        # Triangle areas for all faces at once - (M, 3, 2) corner array, no per-face Python arithmetic
+        triangles = points_2d[faces]
+        edge1 = triangles[:, 1] - triangles[:, 0]
+        edge2 = triangles[:, 2] - triangles[:, 0]
+        areas = 0.5 * np.abs(edge1[:, 0] * edge2[:, 1] - edge2[:, 0] * edge1[:, 1])
+        
+        # Convert the triangular faces with area to polygons in one vectorized call (skip degenerate triangles)
+        face_polygons = shapely.polygons(triangles[areas > 0.01])
+        face_polygons = face_polygons[shapely.is_valid(face_polygons)]
+        
+        if not len(face_polygons):
             print(f"[GEOM] No valid face polygons, using fallback")
             return project_to_aligned_plane(vertices, thickness_axis)
         
-        print(f"[GEOM] Created {len(face_polygons)} valid face polygons")
+        geom_log("[GEOM] Created %d valid face polygons", len(face_polygons))
         
         # Merge all triangles into one polygon (automatically detects holes)
         merged = unary_union(face_polygons)
         
-        print(f"[GEOM] Merged result type: {merged.geom_type}")
+        geom_log("[GEOM] Merged result type: %s", merged.geom_type)
         
         # Handle different result types
         if merged.geom_type == 'Polygon':
-            num_holes = len(list(merged.interiors))
-            print(f"[GEOM] Single polygon with {num_holes} holes, area={merged.area:.0f}")
+            num_holes = len(merged.interiors)
+            geom_log("[GEOM] Single polygon with %d holes, area=%.0f", num_holes, merged.area)
             return merged
             
         elif merged.geom_type == 'MultiPolygon':
@@ -365,10 +433,10 @@ def project_with_faces_aligned(vertices: np.ndarray, faces: np.ndarray, thicknes
                     holes.append(list(poly.exterior.coords))
             
             if holes:
-                print(f"[GEOM] MultiPolygon: using largest with {len(holes)} holes")
+                geom_log("[GEOM] MultiPolygon: using largest with %d holes", len(holes))
                 return ShapelyPolygon(outer.exterior.coords, holes=holes)
             else:
-                print(f"[GEOM] MultiPolygon: using largest polygon only")
+                geom_log("[GEOM] MultiPolygon: using largest polygon only")
                 return outer
         else:
             print(f"[GEOM] Unexpected type {merged.geom_type}, using fallback")
@@ -419,6 +487,36 @@ def extract_thickness(element) -> str:
     return "N/A"
 
 
+def create_plate_shapes(ifc_file, plates, settings) -> dict:
+    """
+    Triangulate plates with ifcopenshell's geometry iterator, which runs on all cores.
+    
+    Args:
+        ifc_file: Opened IFC file object
+        plates: IfcPlate elements to triangulate
+        settings: Geometry settings
+        
+    Returns:
+        Dict of element ID -> shape (plates the iterator could not process are missing)
+    """
+    shapes = {}
+    if not plates:
+        return shapes
+    
+    try:
+        iterator = ifcopenshell.geom.iterator(settings, ifc_file, os.cpu_count() or 1, include=plates)
+        if iterator.initialize():
+            while True:
+                shape = iterator.get()
+                shapes[shape.id] = shape
+                if not iterator.next():
+                    break
+    except Exception as e:
+        print(f"[GEOM] Geometry iterator failed, creating remaining plate shapes one by one: {e}")
+    
+    return shapes
+
+
 def extract_all_plate_geometries(ifc_file, selected_element_ids=None) -> List[PlateGeometry]:
     """
     Extract geometry for all plates in an IFC file.
@@ -433,21 +531,24 @@ def extract_all_plate_geometries(ifc_file, selected_element_ids=None) -> List[Pl
     print(f"[GEOM] Starting plate geometry extraction...")
     
     geometries = []
-    settings = ifcopenshell.geom.settings()
-    settings.set(settings.USE_WORLD_COORDS, True)
-    settings.set(settings.WELD_VERTICES, True)
+    settings = get_default_settings()
     
     plates = ifc_file.by_type("IfcPlate")
     print(f"[GEOM] Found {len(plates)} plates in IFC file")
     
+    # Skip plates outside the selection
+    if selected_element_ids is not None:
+        plates = [element for element in plates if element.id() in selected_element_ids]
+    
+    shapes = create_plate_shapes(ifc_file, plates, settings)
+    
     for element in plates:
-        element_id = element.id()
-        
-        # Skip if we have a selection and this isn't in it
-        if selected_element_ids is not None and element_id not in selected_element_ids:
-            continue
-        
-        plate_geom = extract_plate_2d_geometry(element, settings)
+        shape = shapes.get(element.id())
+        if shape is not None:
+            plate_geom = plate_geometry_from_shape(element, shape)
+        else:
+            # Not produced by the iterator - retry on its own (reports the shape error)
+            plate_geom = extract_plate_2d_geometry(element, settings)
         
         if plate_geom:
             geometries.append(plate_geom)
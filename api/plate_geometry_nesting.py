@@ -5,6 +5,7 @@ Extracts real plate shapes (not just bounding boxes) and nests them efficiently.
 
 import ifcopenshell
 import ifcopenshell.geom
+import ifcopenshell.util.shape
 import numpy as np
 from shapely.geometry import Polygon, Point, MultiPoint
 from shapely.ops import unary_union
@@ -87,16 +88,14 @@ def extract_plate_2d_geometry(element, ifc_file) -> Optional[PlateGeometry]:
         if not shape:
             return None
         
+        # Read-only Nx3 / Mx3 views straight over the triangulation buffers (no Python tuple round-trip)
         geometry = shape.geometry
-        verts = geometry.verts
-        faces = geometry.faces
+        vertices = ifcopenshell.util.shape.get_vertices(geometry)
+        faces = ifcopenshell.util.shape.get_faces(geometry)
         
-        if len(verts) < 9:  # Need at least 3 vertices (3D)
+        if len(vertices) < 3:  # Need at least 3 vertices (3D)
             return None
         
-        # Convert vertices to numpy array
-        vertices = np.array(verts).reshape(-1, 3)
-        
         # Convert to mm if needed
         max_coord = np.max(np.abs(vertices))
         if max_coord < 1000.0:  # Likely in meters
@@ -107,19 +106,17 @@ def extract_plate_2d_geometry(element, ifc_file) -> Optional[PlateGeometry]:
         centered = vertices - centroid
         
         # PCA to find principal axes
-        cov = np.cov(centered.T)
-        eigenvalues, eigenvectors = np.linalg.eig(cov)
-        
-        # Sort by eigenvalue (largest = main plane)
-        idx = eigenvalues.argsort()[::-1]
-        eigenvectors = eigenvectors[:, idx]
+        # Scatter matrix of the centered points - the eigenvectors of the covariance without
+        # np.cov's copies and 1/(N-1) scaling; symmetric, so eigh applies (eigenvalues ascending)
+        cov = centered.T @ centered
+        eigenvalues, eigenvectors = np.linalg.eigh(cov)
         
         # The smallest eigenvalue corresponds to the normal of the plate
-        normal = eigenvectors[:, 2]
+        normal = eigenvectors[:, 0]
         
         # Create coordinate system for projection
         # Use the two largest eigenvectors as the plane basis
-        u_axis = eigenvectors[:, 0]
+        u_axis = eigenvectors[:, 2]
         v_axis = eigenvectors[:, 1]
         
         # Project all vertices onto the 2D plane
@@ -353,7 +350,7 @@ def nest_plates_with_geometry(
                     'rotation': placed['rotation'],
                     'svg_path': plate.get_svg_path(placed['x'], placed['y']),
                     'actual_area': plate.area,
-                    'has_complex_geometry': plate.polygon is not None and len(list(plate.polygon.interiors)) > 0
+                    'has_complex_geometry': plate.polygon is not None and len(plate.polygon.interiors) > 0
                 })
             
             results['cutting_plans'].append(cutting_plan)
@@ -16,6 +16,7 @@ class NestingResult:
         self.stock_length = stock_length
         self.stock_index = stock_index
         self.placed_plates: List[Dict] = []
+        self.placed_area = 0.0  # Running sum of placed plate areas
         self.utilization = 0.0
         
     def add_plate(self, plate: PlateGeometry, x: float, y: float, rotation: int = 0):
@@ -26,6 +27,7 @@ class NestingResult:
             'y': y,
             'rotation': rotation
         })
+        self.placed_area += plate.area
         
     def calculate_utilization(self):
         """Calculate material utilization percentage."""
@@ -33,7 +35,7 @@ class NestingResult:
             self.utilization = 0.0
             return
             
-        total_plate_area = sum(p['plate'].area for p in self.placed_plates)
+        total_plate_area = self.placed_area
         stock_area = self.stock_width * self.stock_length
         
         if stock_area > 0:
@@ -43,33 +45,36 @@ class NestingResult:
     
     def to_dict(self) -> Dict:
         """Convert to dictionary for JSON serialization."""
+        plates = []
+        for p in self.placed_plates:
+            plate = p['plate']
+            x, y = p['x'], p['y']
+            polygon = plate.polygon
+            plates.append({
+                'x': x,
+                'y': y,
+                'width': plate.width,
+                'height': plate.length,
+                'name': plate.name,
+                'thickness': plate.thickness,
+                'id': str(plate.element_id),
+                'rotation': p['rotation'],
+                'svg_path': plate.get_svg_path(x, y),
+                'actual_area': plate.area,
+                'has_complex_geometry': len(polygon.interiors) > 0 if polygon else False
+            })
         return {
             'stock_width': self.stock_width,
             'stock_length': self.stock_length,
             'stock_index': self.stock_index,
             'stock_name': f"Stock {self.stock_index + 1}",
             'utilization': round(self.utilization, 2),
-            'plates': [
-                {
-                    'x': p['x'],
-                    'y': p['y'],
-                    'width': p['plate'].width,
-                    'height': p['plate'].length,
-                    'name': p['plate'].name,
-                    'thickness': p['plate'].thickness,
-                    'id': str(p['plate'].element_id),
-                    'rotation': p['rotation'],
-                    'svg_path': p['plate'].get_svg_path(p['x'], p['y']),
-                    'actual_area': p['plate'].area,
-                    'has_complex_geometry': len(list(p['plate'].polygon.interiors)) > 0 if p['plate'].polygon else False
-                }
-                for p in self.placed_plates
-            ]
+            'plates': plates
         }
 
 
 def greedy_nesting(plates: List[PlateGeometry], stock_width: float, 
-                   stock_length: float, gap: float = 5.0) -> NestingResult:
+                   stock_length: float, gap: float = 5.0, pre_sorted: bool = False) -> NestingResult:
     """
     Simple greedy nesting algorithm.
     Places plates one by one using first-fit decreasing strategy.
@@ -79,6 +84,7 @@ def greedy_nesting(plates: List[PlateGeometry], stock_width: float,
         stock_width: Stock sheet width in mm
         stock_length: Stock sheet length in mm
         gap: Minimum gap between plates in mm
+        pre_sorted: Plates are already sorted by area (largest first)
         
     Returns:
         NestingResult with placed plates
@@ -89,7 +95,14 @@ def greedy_nesting(plates: List[PlateGeometry], stock_width: float,
         return result
     
     # Sort plates by area (largest first)
-    sorted_plates = sorted(plates, key=lambda p: p.area, reverse=True)
+    sorted_plates = plates if pre_sorted else sorted(plates, key=lambda p: p.area, reverse=True)
+    
+    # A plate taller than the sheet minus both margins can neither be placed nor open a new row,
+    # so it never changes the layout - drop all of them with one vectorized test
+    plate_heights = np.fromiter((p.length for p in sorted_plates), dtype=float, count=len(sorted_plates))
+    fits_height = (gap + plate_heights) + gap <= stock_length  # Same rounding as the first-row test below
+    if not fits_height.all():
+        sorted_plates = [plate for plate, fits in zip(sorted_plates, fits_height.tolist()) if fits]
     
     # Simple row-based placement
     current_x = gap
@@ -162,7 +175,8 @@ def nest_plates_on_multiple_stocks(
     for thickness, thickness_plates in plates_by_thickness.items():
         print(f"\n[NESTING] === Processing thickness {thickness} ({len(thickness_plates)} plates) ===")
         
-        remaining_plates = thickness_plates.copy()
+        # Sorted by area once - removing placed plates keeps the rest in order for every stock trial
+        remaining_plates = sorted(thickness_plates, key=lambda p: p.area, reverse=True)
         thickness_sheet_count = 0
         
         while remaining_plates and thickness_sheet_count < max_sheets:
@@ -174,7 +188,8 @@ def nest_plates_on_multiple_stocks(
                 result = greedy_nesting(
                     remaining_plates,
                     stock['width'],
-                    stock['length']
+                    stock['length'],
+                    pre_sorted=True
                 )
                 
                 # Keep the result that fits the most plates
@@ -245,26 +260,21 @@ def calculate_nesting_statistics(
             'geometry_based': True
         }
     
-    nested_plates = sum(len(r.placed_plates) for r in results)
-    unnested_plates = total_plates - nested_plates
-    
-    total_stock_area = sum(r.stock_width * r.stock_length for r in results)
-    total_used_area = sum(
-        sum(p['plate'].area for p in r.placed_plates)
-        for r in results
-    )
-    
-    overall_utilization = (total_used_area / total_stock_area * 100) if total_stock_area > 0 else 0.0
-    waste_area = total_stock_area - total_used_area
-    
-    # Calculate tonnage (weight) for plates
+    # Tonnage (weight) for plates
     # Steel density: 7850 kg/m³ = 0.00000785 kg/mm³
     STEEL_DENSITY = 0.00000785  # kg/mm³
     
-    # Calculate weight for nested plates
+    # One pass over the sheets: stock area, placed area (kept on each result by add_plate)
+    # and the nested plate weights
+    nested_plates = 0
+    total_stock_area = 0
+    total_used_area = 0
     total_plate_weight = 0.0
     thickness_values = []
     for result in results:
+        nested_plates += len(result.placed_plates)
+        total_stock_area += result.stock_width * result.stock_length
+        total_used_area += result.placed_area
         for plate_entry in result.placed_plates:
             plate = plate_entry['plate']
             # Area is already in mm², thickness is in mm
@@ -272,6 +282,10 @@ def calculate_nesting_statistics(
             weight_kg = volume_mm3 * STEEL_DENSITY
             total_plate_weight += weight_kg
             thickness_values.append(plate.thickness)
+    unnested_plates = total_plates - nested_plates
+    
+    overall_utilization = (total_used_area / total_stock_area * 100) if total_stock_area > 0 else 0.0
+    waste_area = total_stock_area - total_used_area
     
     # Calculate waste weight
     avg_thickness = sum(thickness_values) / len(thickness_values) if thickness_values else 10.0